@@ -0,0 +1 @@
+"""Benchmarks sin red de sync/ (ver bench/run.py)."""
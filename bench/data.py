@@ -0,0 +1,74 @@
+"""
+Datos sintéticos para los benchmarks: remitos con la forma de la API Remitos y un CSV
+de mano de obra con la forma de Costos_MM_YYYY.CSV. Todo es determinístico (seed fija)
+para que dos corridas sean comparables.
+"""
+from __future__ import annotations
+
+import json
+import random
+from datetime import date, timedelta
+from typing import Dict, Iterator, List
+
+TIPOS = ("RM", "RC", "DV")
+SERIES = ("A", "B")
+LABOR_HEADERS = ["idObr", "Obra", "Legajo", "Nombre", "Categoria", "Horas", "Jornal", "Importe"]
+
+
+def _fechas(from_date: str, to_date: str) -> List[date]:
+    start, end = date.fromisoformat(from_date), date.fromisoformat(to_date)
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def generate_documentos(n: int, from_date: str, to_date: str, obras: int = 200, seed: int = 1) -> List[dict]:
+    """n documentos repartidos en partes iguales entre los días del rango."""
+    rnd = random.Random(seed)
+    fechas = _fechas(from_date, to_date)
+    docs = []
+    for i in range(n):
+        fecha = fechas[i * len(fechas) // n]
+        obra = rnd.randrange(obras)
+        docs.append({
+            "FECHA": f"{fecha.isoformat()}T00:00:00",
+            "TIPDOCUM": TIPOS[i % len(TIPOS)],
+            "SERIEDOCUM": SERIES[i % len(SERIES)],
+            "NRODOCUM": str(i + 1).zfill(8),
+            "CUENTA": f"{1000 + obra}",
+            "DESCCUENTA": f"Obra {obra}",
+            "DIRCUENTA": f"Calle {obra} {rnd.randrange(1, 5000)}",
+            "TOTAL": round(rnd.uniform(100, 500000), 2),
+            "MONEDA": rnd.choice((1, 1, 1, 2)),
+        })
+    return docs
+
+
+def documentos_by_day(docs: List[dict]) -> Dict[str, List[bytes]]:
+    """Documentos ya serializados agrupados por día (lo que sirve el servidor fake)."""
+    out: Dict[str, List[bytes]] = {}
+    for d in docs:
+        out.setdefault(d["FECHA"][:10], []).append(json.dumps(d).encode("utf-8"))
+    return out
+
+
+def iter_labor_csv(rows: int, obras: int = 200, seed: int = 1) -> Iterator[bytes]:
+    """CSV de mano de obra (UTF-8 con BOM, como lo exporta el sistema) en bloques de líneas."""
+    rnd = random.Random(seed)
+    yield ("﻿" + ",".join(LABOR_HEADERS) + "\r\n").encode("utf-8")
+    block = []
+    for i in range(rows):
+        obra = rnd.randrange(obras)
+        horas = rnd.randrange(1, 200)
+        jornal = rnd.randrange(8000, 30000)
+        block.append(
+            f"{1000 + obra},\"Obra {obra}, etapa {obra % 4}\",{i + 1},Operario {i + 1},"
+            f"Of{rnd.randrange(1, 4)},{horas},{jornal},{horas * jornal / 8:.2f}\r\n"
+        )
+        if len(block) == 10000:
+            yield "".join(block).encode("utf-8")
+            block = []
+    if block:
+        yield "".join(block).encode("utf-8")
+
+
+def generate_labor_csv(rows: int, obras: int = 200, seed: int = 1) -> bytes:
+    return b"".join(iter_labor_csv(rows, obras, seed))
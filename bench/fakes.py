@@ -0,0 +1,382 @@
+"""
+Reemplazos locales de los servicios externos, para medir sin red:
+- FakeRemitosServer: servidor HTTP que responde como la API Remitos (fromDate/toDate).
+- FakeDriveService: la parte de Drive v3 que usa sync/ (files().list, changes(),
+  files().get_media compatible con MediaIoBaseDownload).
+- FakeSheetsClient: la parte de gspread que usa sync/ (open_by_key, worksheet, get,
+  append_rows, batch_update, values_batch_get/update...).
+Cada fake cuenta sus llamadas por método y puede simular latencia por llamada.
+"""
+from __future__ import annotations
+
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs, urlparse
+
+
+class _CallCounter:
+    def __init__(self, latency: float = 0.0):
+        self.calls: Counter = Counter()
+        self.latency = latency
+        self._lock = threading.Lock()
+
+    def _hit(self, method: str) -> None:
+        with self._lock:
+            self.calls[method] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+
+# --- Remitos ---
+
+
+class FakeRemitosServer(_CallCounter):
+    """Sirve documentos pre-serializados por día; corre en un hilo daemon."""
+
+    def __init__(self, by_day: Dict[str, List[bytes]], latency: float = 0.0):
+        super().__init__(latency)
+        self.by_day = by_day
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                fake._hit("GET")
+                q = parse_qs(urlparse(self.path).query)
+                body = fake._body(q["fromDate"][0], q["toDate"][0])
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    def _body(self, from_date: str, to_date: str) -> bytes:
+        # Fechas ISO: el orden de strings es el orden cronológico
+        parts = [d for day in sorted(self.by_day) if from_date <= day <= to_date for d in self.by_day[day]]
+        return b'{"documentos":[' + b",".join(parts) + b"]}"
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_port}/api/Remitos"
+
+    def start(self) -> "FakeRemitosServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+# --- Drive ---
+
+
+class _Executable:
+    def __init__(self, counter: _CallCounter, method: str, payload: dict):
+        self._counter = counter
+        self._method = method
+        self._payload = payload
+
+    def execute(self, **kwargs) -> dict:
+        self._counter._hit(self._method)
+        return self._payload
+
+
+class _MediaHttp:
+    """Responde los requests con Range que hace MediaIoBaseDownload."""
+
+    def __init__(self, counter: _CallCounter, content: bytes):
+        self._counter = counter
+        self._content = content
+
+    def request(self, uri, method="GET", headers=None, **kwargs):
+        import httplib2
+
+        self._counter._hit("get_media")
+        total = len(self._content)
+        start, end = (int(p) for p in headers["range"].split("=", 1)[1].split("-"))
+        chunk = self._content[start:end + 1]
+        resp = httplib2.Response({
+            "status": 206,
+            "content-range": f"bytes {start}-{start + len(chunk) - 1}/{total}",
+        })
+        return resp, chunk
+
+
+class _MediaRequest:
+    def __init__(self, counter: _CallCounter, file_id: str, content: bytes):
+        self.uri = f"https://fake.drive/files/{file_id}?alt=media"
+        self.headers: Dict[str, str] = {}
+        self.http = _MediaHttp(counter, content)
+
+
+class _FakeFiles:
+    def __init__(self, drive: "FakeDriveService"):
+        self._drive = drive
+
+    def list(self, q: str = "", **kwargs) -> _Executable:
+        folder = re.match(r"'([^']*)' in parents", q)
+        files = [
+            self._drive.metadata(f["id"])
+            for f in self._drive.files_by_id.values()
+            if (folder is None or folder.group(1) in f["parents"]) and not f["trashed"]
+        ]
+        files.sort(key=lambda f: f["modifiedTime"], reverse=True)
+        return _Executable(self._drive, "files.list", {"files": files})
+
+    def get_media(self, fileId: str, **kwargs) -> _MediaRequest:
+        return _MediaRequest(self._drive, fileId, self._drive.files_by_id[fileId]["content"])
+
+
+class FakeDriveService(_CallCounter):
+    def __init__(self, latency: float = 0.0):
+        super().__init__(latency)
+        self.files_by_id: Dict[str, dict] = {}
+        self.log: List[str] = []
+
+    def add_file(
+        self,
+        file_id: str,
+        name: str,
+        content: bytes,
+        modified_time: str = "2026-01-01T00:00:00.000Z",
+        folder_id: str = "bench",
+    ) -> dict:
+        import hashlib
+
+        info = {
+            "id": file_id,
+            "name": name,
+            "mimeType": "text/csv",
+            "modifiedTime": modified_time,
+            "md5Checksum": hashlib.md5(content).hexdigest(),
+            "parents": [folder_id],
+            "trashed": False,
+            "content": content,
+        }
+        self.files_by_id[file_id] = info
+        self.log.append(file_id)
+        return info
+
+    def remove_file(self, file_id: str, trashed: bool = False) -> None:
+        """Borra el archivo (o lo manda a la papelera); el changes feed lo informa."""
+        if trashed:
+            self.files_by_id[file_id]["trashed"] = True
+        else:
+            del self.files_by_id[file_id]
+        self.log.append(file_id)
+
+    def metadata(self, file_id: str) -> dict:
+        return {k: v for k, v in self.files_by_id[file_id].items() if k != "content"}
+
+    def files(self) -> _FakeFiles:
+        return _FakeFiles(self)
+
+    def changes(self) -> "_FakeChanges":
+        return _FakeChanges(self)
+
+
+class _FakeChanges:
+    """Changes feed: el token es la cantidad de cambios registrados."""
+
+    def __init__(self, drive: FakeDriveService):
+        self._drive = drive
+
+    def getStartPageToken(self, **kwargs) -> _Executable:
+        return _Executable(self._drive, "changes.getStartPageToken", {"startPageToken": str(len(self._drive.log))})
+
+    def list(self, pageToken: str, **kwargs) -> _Executable:
+        changes = [
+            {"fileId": file_id, "removed": False, "file": self._drive.metadata(file_id)}
+            if file_id in self._drive.files_by_id
+            else {"fileId": file_id, "removed": True}
+            for file_id in self._drive.log[int(pageToken):]
+        ]
+        payload = {"changes": changes, "newStartPageToken": str(len(self._drive.log))}
+        return _Executable(self._drive, "changes.list", payload)
+
+
+# --- Sheets (gspread) ---
+
+_A1 = re.compile(r"([A-Z]+)(\d*)(?::([A-Z]+)(\d*))?$")
+
+
+def _col(letters: str) -> int:
+    n = 0
+    for c in letters:
+        n = n * 26 + ord(c) - 64
+    return n
+
+
+def _parse_range(rng: str):
+    """'A2:D' → (col1, row1, col2, row2 o None), 1-based."""
+    c1, r1, c2, r2 = _A1.match(rng).groups()
+    return _col(c1), int(r1 or 1), _col(c2 or c1), int(r2) if r2 else None
+
+
+def _split_title(rng: str):
+    title, _, cells = rng.rpartition("!")
+    return title.strip("'").replace("''", "'"), cells
+
+
+class FakeWorksheet:
+    def __init__(self, doc: "FakeSpreadsheet", title: str, sheet_id: int, rows: int = 1000):
+        self._doc = doc
+        self.title = title
+        self.id = sheet_id
+        self.row_count = rows
+        self.values: List[list] = []
+
+    def row_values(self, row: int, **kwargs) -> list:
+        self._doc._hit("row_values")
+        return list(self.values[row - 1]) if len(self.values) >= row else []
+
+    def col_values(self, col: int, **kwargs) -> list:
+        self._doc._hit("values_get")
+        return [r[col - 1] if len(r) >= col else "" for r in self.values]
+
+    def _read(self, rng: str) -> List[list]:
+        c1, r1, c2, r2 = _parse_range(rng)
+        last = min(r2 or len(self.values), len(self.values))
+        return [self.values[i][c1 - 1:c2] for i in range(r1 - 1, last)]
+
+    def get(self, rng: str, **kwargs) -> List[list]:
+        self._doc._hit("values_get")
+        return self._read(rng)
+
+    def append_row(self, row: list, **kwargs) -> None:
+        self._doc._hit("append_row")
+        self.values.append(list(row))
+
+    def append_rows(self, rows: List[list], **kwargs) -> None:
+        self._doc._hit("append_rows")
+        self.values.extend(list(r) for r in rows)
+
+    def clear(self) -> None:
+        self._doc._hit("clear")
+        self.values = []
+
+    def _write(self, rng: str, rows: List[list]) -> None:
+        c1, r1, _, _ = _parse_range(rng)
+        for j, row in enumerate(rows):
+            while len(self.values) < r1 + j:
+                self.values.append([])
+            current = self.values[r1 - 1 + j]
+            current.extend([""] * (c1 - 1 + len(row) - len(current)))
+            current[c1 - 1:c1 - 1 + len(row)] = list(row)
+
+    def batch_update(self, data: List[dict], **kwargs) -> None:
+        self._doc._hit("values_batch_update")
+        for d in data:
+            self._write(d["range"], d["values"])
+
+
+class FakeSpreadsheet:
+    def __init__(self, client: "FakeSheetsClient", key: str, title: Optional[str] = None):
+        self._client = client
+        self.id = key
+        self.title = title or key
+        self.sheets: Dict[str, FakeWorksheet] = {}
+
+    def _hit(self, method: str) -> None:
+        self._client._hit(method)
+
+    def _by_id(self, sheet_id: int) -> FakeWorksheet:
+        return next(w for w in self.sheets.values() if w.id == sheet_id)
+
+    def _add(self, title: str, rows: int = 1000, sheet_id: Optional[int] = None) -> FakeWorksheet:
+        if sheet_id is None:
+            sheet_id = max((w.id for w in self.sheets.values()), default=-1) + 1
+        ws = FakeWorksheet(self, title, sheet_id, rows)
+        self.sheets[title] = ws
+        return ws
+
+    def worksheet(self, title: str) -> FakeWorksheet:
+        import gspread
+
+        self._hit("fetch_sheet_metadata")
+        if title not in self.sheets:
+            raise gspread.WorksheetNotFound(title)
+        return self.sheets[title]
+
+    def worksheets(self) -> List[FakeWorksheet]:
+        self._hit("fetch_sheet_metadata")
+        return list(self.sheets.values())
+
+    def add_worksheet(self, title: str, rows: int = 1000, cols: int = 26, **kwargs) -> FakeWorksheet:
+        self._hit("batch_update")
+        return self._add(title, rows)
+
+    def fetch_sheet_metadata(self, *args, **kwargs) -> dict:
+        self._hit("fetch_sheet_metadata")
+        return {
+            "sheets": [
+                {"properties": {"title": w.title, "sheetId": w.id, "gridProperties": {"rowCount": w.row_count}}}
+                for w in self.sheets.values()
+            ]
+        }
+
+    def batch_update(self, body: dict) -> dict:
+        self._hit("batch_update")
+        for request in body.get("requests", []):
+            if "addSheet" in request:
+                props = request["addSheet"]["properties"]
+                self._add(props["title"], props.get("gridProperties", {}).get("rowCount", 1000), props.get("sheetId"))
+            elif "deleteDimension" in request:
+                rng = request["deleteDimension"]["range"]
+                del self._by_id(rng["sheetId"]).values[rng["startIndex"]:rng["endIndex"]]
+            elif "appendDimension" in request:
+                self._by_id(request["appendDimension"]["sheetId"]).row_count += request["appendDimension"]["length"]
+        return {"replies": []}
+
+    def values_batch_get(self, ranges: List[str], params: Optional[dict] = None) -> dict:
+        self._hit("values_batch_get")
+        out = []
+        for rng in ranges:
+            title, cells = _split_title(rng)
+            out.append({"range": rng, "values": self.sheets[title]._read(cells)})
+        return {"valueRanges": out}
+
+    def values_batch_update(self, body: dict) -> dict:
+        self._hit("values_batch_update")
+        for d in body["data"]:
+            title, cells = _split_title(d["range"])
+            self.sheets[title]._write(cells, d["values"])
+        return {}
+
+
+class FakeSheetsClient(_CallCounter):
+    def __init__(self, latency: float = 0.0):
+        super().__init__(latency)
+        self.docs: Dict[str, FakeSpreadsheet] = {}
+
+    def open_by_key(self, key: str) -> FakeSpreadsheet:
+        self._hit("fetch_sheet_metadata")
+        return self.docs.setdefault(key, FakeSpreadsheet(self, key))
+
+    def open(self, title: str, folder_id: Optional[str] = None) -> FakeSpreadsheet:
+        import gspread
+
+        self._hit("files.list")
+        for doc in self.docs.values():
+            if doc.title == title:
+                return doc
+        raise gspread.SpreadsheetNotFound(title)
+
+    def create(self, title: str, folder_id: Optional[str] = None) -> FakeSpreadsheet:
+        self._hit("create")
+        doc = self.docs[f"created-{len(self.docs)}"] = FakeSpreadsheet(self, f"created-{len(self.docs)}", title)
+        doc._add("Sheet1")
+        return doc
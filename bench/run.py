@@ -0,0 +1,180 @@
+"""
+Benchmarks sin red de los syncs: API Remitos, Drive y Sheets se reemplazan por los
+fakes de bench/fakes.py y los datos salen de bench/data.py (determinísticos).
+Mide tiempo, filas por segundo, pico de memoria (tracemalloc) y llamadas a cada API.
+
+Uso:
+  python -m bench.run                                   # 100k remitos, CSV de 500k filas
+  python -m bench.run --remitos 20000 --labor-rows 50000 --only materiales
+  python -m bench.run --latency-ms 50 --json out.json   # latencia simulada por llamada
+
+El estado local va a un directorio temporal y el limitador de escrituras de Sheets se
+desactiva (salvo --writes-per-minute) para medir el código y no la cuota.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, Dict, List, Optional
+
+from .data import documentos_by_day, generate_documentos, generate_labor_csv
+from .fakes import FakeDriveService, FakeRemitosServer, FakeSheetsClient
+
+BENCHMARKS = ("to_rows", "materiales", "mano_obra")
+FROM_DATE, TO_DATE = "2026-01-01", "2026-01-31"
+
+
+def _measure(fn: Callable[[], object], memory: bool) -> dict:
+    if memory:
+        tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        value = fn()
+    finally:
+        seconds = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1] if memory else None
+        if memory:
+            tracemalloc.stop()
+    out = {"seconds": round(seconds, 3), "value": value}
+    if peak is not None:
+        out["peak_mb"] = round(peak / 1024 / 1024, 1)
+    return out
+
+
+def _calls_since(fakes: Dict[str, object], before: Dict[str, dict]) -> Dict[str, dict]:
+    out = {}
+    for name, fake in fakes.items():
+        diff = {k: v - before[name].get(k, 0) for k, v in fake.calls.items()}
+        diff = {k: v for k, v in diff.items() if v}
+        if diff:
+            out[name] = diff
+    return out
+
+
+def _snapshot(fakes: Dict[str, object]) -> Dict[str, dict]:
+    return {name: dict(fake.calls) for name, fake in fakes.items()}
+
+
+def _record(name: str, rows: int, measured: dict, calls: Dict[str, dict]) -> dict:
+    value = measured.pop("value")
+    entry = {"benchmark": name, "rows": rows, **measured}
+    entry["rows_per_second"] = round(rows / measured["seconds"]) if measured["seconds"] else None
+    entry["api_calls"] = calls
+    if isinstance(value, dict):
+        if not value.get("ok", True):
+            entry["error"] = value.get("error")
+        if "metrics" in value:
+            entry["stages"] = value["metrics"]["stages"]
+    return entry
+
+
+def run(
+    remitos: int,
+    labor_rows: int,
+    only: Optional[List[str]] = None,
+    latency: float = 0.0,
+    memory: bool = True,
+) -> List[dict]:
+    """Corre los benchmarks pedidos y devuelve un registro por benchmark."""
+    selected = only or list(BENCHMARKS)
+    results = []
+    docs = generate_documentos(remitos, FROM_DATE, TO_DATE) if remitos else []
+
+    server = FakeRemitosServer(documentos_by_day(docs), latency=latency).start()
+    drive = FakeDriveService(latency=latency)
+    sheets = FakeSheetsClient(latency=latency)
+    fakes = {"remitos": server, "drive": drive, "sheets": sheets}
+    # sync.config lee el entorno al importarse: configurar antes de importar sync
+    os.environ["REMITOS_API_URL"] = server.url
+    os.environ["REMITOS_BEARER_TOKEN"] = "bench"
+
+    from sync.google_clients import use_clients
+    from sync.mano_obra import sync_mano_obra
+    from sync.materiales import documentos_to_rows, sync_materiales
+
+    use_clients(credentials=object(), drive_service=drive, gspread_client=sheets)
+    run_id = str(int(time.time()))
+    try:
+        if "to_rows" in selected:
+            measured = _measure(lambda: documentos_to_rows(docs), memory)
+            results.append(_record("documentos_to_rows", len(docs), measured, {}))
+
+        if "materiales" in selected:
+            # Cada corrida usa un sheet_id nuevo: el estado local arranca vacío
+            sheet_id = f"bench-materiales-{run_id}"
+            for name, incremental in (("sync_materiales", False), ("sync_materiales (incremental)", True)):
+                before = _snapshot(fakes)
+                measured = _measure(
+                    lambda: sync_materiales(FROM_DATE, TO_DATE, sheet_id=sheet_id, incremental=incremental),
+                    memory,
+                )
+                results.append(_record(name, len(docs), measured, _calls_since(fakes, before)))
+
+        if "mano_obra" in selected:
+            content = generate_labor_csv(labor_rows)
+            sheet_id = f"bench-mano-obra-{run_id}"
+            # Segunda corrida: el mismo mes re-subido con una fila corregida al final
+            corrected = content + b'9999,"Obra correccion",0,Ajuste,Of1,1,1,1.00\r\n'
+            for name, body, modified in (
+                ("sync_mano_obra", content, "2026-02-01T00:00:00.000Z"),
+                ("sync_mano_obra (re-subida)", corrected, "2026-02-02T00:00:00.000Z"),
+            ):
+                drive.add_file("bench-csv", "Costos_01_2026.CSV", body, modified)
+                before = _snapshot(fakes)
+                measured = _measure(lambda: sync_mano_obra(sheet_id=sheet_id, folder_id="bench"), memory)
+                results.append(_record(name, labor_rows, measured, _calls_since(fakes, before)))
+    finally:
+        server.stop()
+    return results
+
+
+def _print_table(results: List[dict]) -> None:
+    print(f"{'benchmark':<32}{'filas':>10}{'seg':>10}{'filas/s':>12}{'pico MB':>10}  llamadas")
+    for r in results:
+        calls = ", ".join(
+            f"{api}.{method}={n}" for api, methods in r["api_calls"].items() for method, n in sorted(methods.items())
+        )
+        peak = r.get("peak_mb", "-")
+        print(f"{r['benchmark']:<32}{r['rows']:>10}{r['seconds']:>10}{r['rows_per_second'] or '-':>12}{peak:>10}  {calls}")
+        if r.get("error"):
+            print(f"{'':<32}error: {r['error']}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmarks sin red de los syncs de materiales y mano de obra")
+    parser.add_argument("--remitos", type=int, default=100_000, help="Documentos de la API Remitos")
+    parser.add_argument("--labor-rows", type=int, default=500_000, help="Filas del CSV de mano de obra")
+    parser.add_argument("--only", choices=BENCHMARKS, action="append", help="Correr solo este benchmark (repetible)")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Latencia simulada por llamada a cada API")
+    parser.add_argument("--writes-per-minute", type=int, default=1_000_000, help="Cuota de escrituras de Sheets")
+    parser.add_argument("--no-memory", action="store_true", help="Sin tracemalloc (tiempos más fieles)")
+    parser.add_argument("--json", metavar="PATH", help="Guardar los resultados en JSON")
+    args = parser.parse_args(argv)
+
+    state_dir = tempfile.mkdtemp(prefix="pluril-bench-")
+    os.environ["SYNC_STATE_PATH"] = os.path.join(state_dir, "state.sqlite3")
+    os.environ["COSTOS_SNAPSHOT_PATH"] = os.path.join(state_dir, "costos_snapshot.sqlite3")
+    os.environ["SYNC_CHECKPOINT_DIR"] = os.path.join(state_dir, "checkpoints")
+    os.environ["SHEETS_WRITES_PER_MINUTE"] = str(args.writes_per_minute)
+
+    results = run(
+        args.remitos,
+        args.labor_rows,
+        only=args.only,
+        latency=args.latency_ms / 1000,
+        memory=not args.no_memory,
+    )
+    _print_table(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+    return 0 if not any(r.get("error") for r in results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
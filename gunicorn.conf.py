@@ -0,0 +1,21 @@
+"""
+Configuración de Gunicorn (Procfile: gunicorn -c gunicorn.conf.py main:app).
+Cada worker hace el warm-up (sync.warmup) antes de atender requests, así el primer
+/sync después de un deploy no paga imports, construcción de clientes ni token OAuth.
+"""
+import os
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+# Un solo worker: los jobs de sync viven en memoria del proceso (ver sync/jobs.py)
+workers = 1
+threads = 4
+
+
+def post_worker_init(worker):
+    from sync.config import SYNC_WARMUP
+
+    if SYNC_WARMUP:
+        from sync.warmup import warm_up
+
+        report = warm_up()
+        worker.log.info("Warm-up en %.2fs (errores: %s)", report["total_seconds"], report["errors"] or "ninguno")
@@ -1,12 +1,15 @@
 """
 App Flask para Railway: expone un endpoint que ejecuta la sincronización
-(materiales + mano de obra). El cron se puede configurar después para llamar a este endpoint.
+(materiales + mano de obra, para cada target de SYNC_TARGETS_FILE). El cron se puede
+configurar después para llamar a este endpoint.
+El sync corre como job en segundo plano: POST /sync devuelve un job_id y
+GET /sync/<job_id> informa progreso y resultado.
+GET /metrics expone tiempos por etapa, bytes, filas y llamadas a APIs (Prometheus).
+GET /health/deep prueba Remitos, Drive y los Sheets (sondas livianas, resultado cacheado).
+GET /costos consulta los costos desde el snapshot local, sin usar la cuota de Google.
 """
 import os
-import sys
-import traceback
-from flask import Flask, jsonify, request
-from datetime import datetime
+from flask import Flask, Response, jsonify, request
 
 app = Flask(__name__)
 
@@ -14,56 +17,203 @@ app = Flask(__name__)
 SYNC_SECRET = os.environ.get("SYNC_SECRET", "")
 
 
-def _run_sync():
-    from sync.materiales import run_sync_materiales_month
-    from sync.mano_obra import sync_mano_obra
-    from sync.config import SHEET_ID_MATERIALES, SHEET_ID_MANO_OBRA, SKIP_MATERIALES_SYNC
-
-    now = datetime.utcnow()
-    result_m = {"ok": False, "rows_written": 0, "error": "no ejecutado"}
-    result_l = {"ok": False, "rows_written": 0, "error": "no ejecutado"}
-
-    if not SKIP_MATERIALES_SYNC:
-        try:
-            result_m = run_sync_materiales_month(now.year, now.month, sheet_id=SHEET_ID_MATERIALES)
-        except Exception as e:
-            result_m = {"ok": False, "rows_written": 0, "error": str(e)}
-    else:
-        result_m = {"ok": False, "rows_written": 0, "error": "omitido (SKIP_MATERIALES_SYNC=1): servidor Remitos requiere TLS 1.2+"}
-
-    try:
-        result_l = sync_mano_obra(sheet_id=SHEET_ID_MANO_OBRA)
-    except Exception as e:
-        result_l = {"ok": False, "rows_written": 0, "error": str(e), "file_name": ""}
+def _run_sync(progress=None):
+    from sync.config import SYNC_TARGETS_FILE
+    from sync.targets import DEFAULT_TARGET, load_targets, run_targets
 
+    # Todas las (target, fuente) en paralelo sobre un pool acotado, cada una con su deadline
+    if SYNC_TARGETS_FILE:
+        return run_targets(load_targets(), progress=progress)
+    # Un solo target (configuración por variables de entorno): progreso y respuesta de siempre
+    on_done = None
+    if progress is not None:
+        on_done = lambda name, status: progress(name.split("/", 1)[1], status)
+    out = run_targets(load_targets(), progress=on_done)
+    result = out["targets"][DEFAULT_TARGET]
     return {
-        "materiales": result_m,
-        "mano_obra": result_l,
+        "materiales": result["materiales"],
+        "mano_obra": result["mano_obra"],
     }
 
 
 @app.route("/health")
 def health():
-    return jsonify({"status": "ok"})
+    from sync import warmup
+
+    out = {"status": "ok"}
+    if warmup.last_report is not None:
+        out["warmup"] = warmup.last_report
+    return jsonify(out)
+
+
+@app.route("/health/deep")
+def health_deep():
+    """
+    Sondas livianas a Remitos, Drive y los Sheets de cada target, en paralelo y con
+    timeout; el resultado se reusa HEALTH_CACHE_SECONDS (?refresh=1 lo ignora).
+    200 si todas responden, 503 si alguna falla.
+    """
+    from sync import health
+
+    if not _authorized():
+        return jsonify({"error": "Unauthorized"}), 401
+    refresh = request.args.get("refresh", "").strip().lower() in ("1", "true", "yes")
+    out = health.deep_check(force=refresh)
+    return jsonify(out), 200 if out["ok"] else 503
+
+
+@app.route("/metrics")
+def metrics():
+    from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+    import sync.metrics  # noqa: F401  (registra las métricas aunque no haya corrido ningún sync)
+
+    return Response(generate_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
+
+def _authorized() -> bool:
+    if not SYNC_SECRET:
+        return True
+    auth = request.headers.get("X-Sync-Secret") or request.args.get("secret")
+    return auth == SYNC_SECRET
+
+
+def _conflict(e):
+    """409 con el job que está escribiendo las mismas hojas."""
+    return jsonify({"error": str(e), "job_id": e.job.id, "status_url": f"/sync/{e.job.id}"}), 409
 
 
 @app.route("/sync", methods=["POST", "GET"])
 def sync():
-    if SYNC_SECRET:
-        auth = request.headers.get("X-Sync-Secret") or request.args.get("secret")
-        if auth != SYNC_SECRET:
-            return jsonify({"error": "Unauthorized"}), 401
+    from sync.jobs import JobConflict, runner
+    from sync.targets import load_targets, sheet_ids
+
+    if not _authorized():
+        return jsonify({"error": "Unauthorized"}), 401
     try:
-        out = _run_sync()
-        return jsonify(out)
-    except Exception as e:
-        tb = traceback.format_exc()
-        msg = str(e).strip() or repr(e) or f"{type(e).__name__}"
-        print("Sync failed:", msg, file=sys.stderr)
-        print(tb, file=sys.stderr)
-        return jsonify({"error": msg, "traceback": tb}), 500
+        sheets = sheet_ids(load_targets())
+    except ValueError:
+        sheets = []  # configuración inválida: el job informa el error
+    try:
+        job, created = runner.submit("default", lambda job: _run_sync(progress=job.set_progress), sheets)
+    except JobConflict as e:
+        return _conflict(e)
+    # ?wait=1 mantiene el comportamiento anterior: esperar y devolver el resultado
+    if request.args.get("wait", "").strip().lower() in ("1", "true", "yes"):
+        job.wait()
+        out = job.to_dict()
+        if out["status"] == "error":
+            return jsonify({"error": out["error"], "job_id": job.id}), 500
+        return jsonify(out["result"])
+    out = job.to_dict()
+    out["joined"] = not created
+    out["status_url"] = f"/sync/{job.id}"
+    return jsonify(out), 202
+
+
+@app.route("/sync/<job_id>", methods=["GET"])
+def sync_status(job_id):
+    from sync.jobs import runner
+
+    if not _authorized():
+        return jsonify({"error": "Unauthorized"}), 401
+    job = runner.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job no encontrado"}), 404
+    return jsonify(job.to_dict())
+
+
+@app.route("/costos", methods=["GET"])
+def costos():
+    """
+    Costos desde el snapshot local (sin pasar por Google):
+    ?fuente=&obra=A,B&periodo=MM/YYYY|desde=&hasta=&moneda=&sheet_id=&group_by=obra,periodo&limit=&offset=
+    Responde con ETag (versión del snapshot + consulta); If-None-Match igual → 304.
+    """
+    import hashlib
+
+    from sync import snapshot
+
+    if not _authorized():
+        return jsonify({"error": "Unauthorized"}), 401
+    args = request.args
+    split = lambda name: [v.strip() for raw in args.getlist(name) for v in raw.split(",") if v.strip()]
+    query = {k: sorted(args.getlist(k)) for k in sorted(args) if k != "secret"}
+    version = snapshot.version()
+    etag = f"{version}-{hashlib.sha1(repr(query).encode('utf-8')).hexdigest()[:12]}"
+    if request.if_none_match.contains(etag):
+        resp = Response(status=304)
+        resp.set_etag(etag)
+        return resp
+    try:
+        limit = min(max(int(args.get("limit", 1000)), 1), 10000)
+        offset = max(int(args.get("offset", 0)), 0)
+        out = snapshot.query(
+            fuente=args.get("fuente") or None,
+            obras=split("obra") or None,
+            desde=args.get("periodo") or args.get("desde") or None,
+            hasta=args.get("periodo") or args.get("hasta") or None,
+            moneda=args.get("moneda") or None,
+            sheet_id=args.get("sheet_id") or None,
+            group_by=split("group_by") or None,
+            limit=limit,
+            offset=offset,
+        )
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    out["version"] = version
+    resp = jsonify(out)
+    resp.set_etag(etag)
+    resp.headers["Cache-Control"] = "no-cache"
+    return resp
+
+
+@app.route("/backfill", methods=["POST"])
+def backfill():
+    """Backfill de un rango de meses: ?from=YYYY-MM&to=YYYY-MM[&only=...&force=1&restart=1&target=...]."""
+    from sync.backfill import SOURCES, backfill as run_backfill, month_range
+    from sync.jobs import JobConflict, runner
+    from sync.targets import get_target, sheet_ids
+
+    if not _authorized():
+        return jsonify({"error": "Unauthorized"}), 401
+    from_month = request.args.get("from", "")
+    to_month = request.args.get("to", "") or from_month
+    target = request.args.get("target") or None
+    try:
+        month_range(from_month, to_month)
+        tgt = get_target(target)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    only = request.args.get("only")
+    if only and only not in SOURCES:
+        return jsonify({"error": f"only='{only}' inválido: usar {' o '.join(SOURCES)}"}), 400
+    sources = [only] if only else SOURCES
+    flag = lambda name: request.args.get(name, "").strip().lower() in ("1", "true", "yes")
+    force, restart = flag("force"), flag("restart")
+    try:
+        job, created = runner.submit(
+            f"backfill:{tgt['name']}:{from_month}:{to_month}",
+            lambda job: run_backfill(
+                from_month, to_month, sources=sources, force=force, restart=restart, progress=job.set_progress,
+                target=target,
+            ),
+            sheet_ids([tgt], sources),
+        )
+    except JobConflict as e:
+        return _conflict(e)
+    out = job.to_dict()
+    out["joined"] = not created
+    out["status_url"] = f"/sync/{job.id}"
+    return jsonify(out), 202
 
 
 if __name__ == "__main__":
+    from sync.config import SYNC_WARMUP
+
+    if SYNC_WARMUP:
+        from sync.warmup import warm_up
+
+        warm_up()
     port = int(os.environ.get("PORT", 5000))
     app.run(host="0.0.0.0", port=port)
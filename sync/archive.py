@@ -0,0 +1,329 @@
+"""
+Retención en las hojas principales: los meses anteriores a los últimos
+SHEETS_RETENTION_MONTHS se mueven de "Materiales" / "Mano de obra" a un spreadsheet de
+archivo por año ("<spreadsheet> - Archivo YYYY", en SHEETS_ARCHIVE_FOLDER_ID), para que
+las lecturas del sync y de AppSheet no crezcan con la historia.
+Por corrida se lee la columna A de la hoja (fecha o periodo) para elegir los meses, se
+leen esas filas en un solo values_batch_get, se añaden al archivo de cada año y recién
+después se borran de la hoja en un solo batch_update. Se mueven meses completos.
+Copiar es idempotente: antes de añadir se borran del archivo las filas con la misma clave
+(TipoDoc + Serie + NroDoc en materiales, periodo en mano de obra), así una corrida cortada
+entre la copia y el borrado no duplica nada en la siguiente.
+
+Uso (sin deadline; p. ej. la primera vez, con toda la historia):
+  python -m sync.archive --months 24
+  python -m sync.archive --only mano_obra --target sucursal-norte
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import sys
+import threading
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Callable, Dict, List, Optional, Tuple
+
+from . import cells, metrics
+from .config import (
+    SHEETS_ARCHIVE_FOLDER_ID,
+    SHEETS_ARCHIVE_INTERVAL_HOURS,
+    SHEETS_ARCHIVE_MAX_ROWS,
+    SHEETS_RETENTION_MONTHS,
+)
+from .google_clients import get_archive_client, get_gspread_client
+from .partitions import a1_title
+from .runner import check_cancelled
+from .sheets_writer import contiguous_ranges, delete_rows_request, sheets_writer, spreadsheet_lock
+from .state import delete_row_fingerprints, get_meta, set_meta
+
+SOURCES = ("materiales", "mano_obra")
+
+_ISO_MONTH = re.compile(r"(\d{4})-(\d{2})")
+_SLASH_MONTH = re.compile(r"(?:\d{1,2}/)?(\d{1,2})/(\d{4})$")
+
+
+def month_of(value) -> str:
+    """'YYYY-MM' de una celda de fecha o periodo (serial, YYYY-MM-DD, DD/MM/YYYY, MM/YYYY); "" si no es."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if value < 1:
+            return ""
+        return (date(1899, 12, 30) + timedelta(days=int(value))).strftime("%Y-%m")
+    s = str(value or "").strip()
+    m = _ISO_MONTH.match(s)
+    if m:
+        year, month = m.group(1), int(m.group(2))
+    else:
+        m = _SLASH_MONTH.match(s)
+        if not m:
+            return ""
+        year, month = m.group(2), int(m.group(1))
+    return f"{year}-{month:02d}" if 1 <= month <= 12 else ""
+
+
+def cutoff_month(months: int, today: Optional[date] = None) -> str:
+    """Primer mes que se queda en la hoja ('YYYY-MM'): los últimos `months` contando el actual."""
+    today = today or date.today()
+    index = today.year * 12 + today.month - 1 - (max(months, 1) - 1)
+    return f"{index // 12}-{index % 12 + 1:02d}"
+
+
+def archived_through(source: str, sheet_id: str) -> str:
+    """Último mes ('YYYY-MM') archivado de la hoja principal de la fuente; "" si ninguno."""
+    return get_meta(f"archived_through:{source}:{sheet_id}") or ""
+
+
+def first_kept_month(source: str, sheet_id: str) -> str:
+    """
+    Primer mes ('YYYY-MM') que el sync escribe en la hoja principal: el siguiente al último
+    archivado y, con SHEETS_RETENTION_MONTHS, no antes del corte. "" si no hay límite.
+    """
+    months = []
+    archived = archived_through(source, sheet_id)
+    if archived:
+        index = int(archived[:4]) * 12 + int(archived[5:7])  # mes siguiente
+        months.append(f"{index // 12}-{index % 12 + 1:02d}")
+    if SHEETS_RETENTION_MONTHS > 0:
+        months.append(cutoff_month(SHEETS_RETENTION_MONTHS))
+    return max(months, default="")
+
+
+def _text_columns(source: str, headers: List[str]) -> List[int]:
+    """Columnas de identificadores de la hoja principal (siempre texto en el archivo)."""
+    if source == "materiales":
+        from .materiales import TEXT_COLUMNS
+
+        return list(TEXT_COLUMNS)
+    from .mano_obra import text_columns
+
+    return [i + 1 for i in text_columns(headers[1:])]  # columna A = Periodo
+
+
+def _spec(source: str) -> Tuple[str, str, Callable[[list], object]]:
+    """(hoja, rango de la clave, clave de una fila) de cada fuente."""
+    if source == "materiales":
+        from .materiales import SHEET_NAME_MATERIALES, _row_key
+
+        return SHEET_NAME_MATERIALES, "A2:D", lambda values: _row_key(list(values) + [""] * (4 - len(values)))
+    if source == "mano_obra":
+        from .mano_obra import SHEET_NAME_MANO_OBRA
+
+        return SHEET_NAME_MANO_OBRA, "A2:A", lambda values: month_of(values[0] if values else "")
+    raise ValueError(f"Fuente inválida '{source}' (usar {', '.join(SOURCES)})")
+
+
+def _read_rows(doc, title: str, row_numbers: List[int], width: int) -> List[list]:
+    """Valores de esas filas de la hoja, en un solo values_batch_get (un rango por tramo contiguo)."""
+    import gspread
+
+    ranges = contiguous_ranges(row_numbers)
+    last = gspread.utils.rowcol_to_a1(1, max(width, 1)).rstrip("0123456789")
+    with metrics.stage("sheet_read"):
+        metrics.api_call("sheets", "values_batch_get")
+        resp = doc.values_batch_get(
+            [f"{a1_title(title)}!A{start}:{last}{end}" for start, end in ranges],
+            # Las fechas como texto formateado: al copiarlas se vuelven a tipar (sync.cells)
+            params={"valueRenderOption": "UNFORMATTED_VALUE", "dateTimeRenderOption": "FORMATTED_STRING"},
+        )
+    rows: List[list] = []
+    for (start, end), value_range in zip(ranges, resp.get("valueRanges", [])):
+        values = value_range.get("values", [])
+        rows.extend(list(values[i]) if i < len(values) else [] for i in range(end - start + 1))
+    metrics.add_rows(len(rows))
+    return rows
+
+
+def _archive_sheet(client, source: str, sheet_id: str, doc_title: str, title: str, headers: List[str], year: str):
+    """(spreadsheet, hoja) de archivo de ese año; los crea si no existen."""
+    import gspread
+
+    meta_key = f"archive_sheet:{source}:{sheet_id}:{year}"
+    archive_title = f"{doc_title} - Archivo {year}"
+    archive = None
+    archive_id = get_meta(meta_key)
+    if archive_id:
+        try:
+            metrics.api_call("sheets", "open_by_key")
+            archive = client.open_by_key(archive_id)
+        except gspread.SpreadsheetNotFound:
+            archive = None  # lo borraron: se busca por nombre o se crea de nuevo
+    if archive is None:
+        try:
+            metrics.api_call("drive", "files.list")
+            archive = client.open(archive_title, folder_id=SHEETS_ARCHIVE_FOLDER_ID or None)
+        except gspread.SpreadsheetNotFound:
+            # Único lugar que escribe en Drive: el resto de los clientes son de solo lectura
+            archive = sheets_writer.call(
+                get_archive_client().create, archive_title, folder_id=SHEETS_ARCHIVE_FOLDER_ID or None
+            )
+        set_meta(meta_key, archive.id)
+    try:
+        metrics.api_call("sheets", "worksheet")
+        sheet = archive.worksheet(title)
+    except gspread.WorksheetNotFound:
+        sheet = sheets_writer.call(archive.add_worksheet, title=title, rows=1000, cols=len(headers))
+    metrics.api_call("sheets", "row_values")
+    if not sheet.row_values(1):
+        sheets_writer.call(sheet.append_row, headers, value_input_option="RAW")
+    return archive, sheet
+
+
+@metrics.instrumented("archivo")
+def archive_old_periods(
+    source: str,
+    sheet_id: str,
+    months: int = SHEETS_RETENTION_MONTHS,
+    max_rows: int = SHEETS_ARCHIVE_MAX_ROWS,
+    cancel: Optional[threading.Event] = None,
+    today: Optional[date] = None,
+) -> dict:
+    """
+    Mueve al archivo de cada año los meses de la hoja principal de `source` anteriores a
+    los últimos `months`, del más viejo al más nuevo y hasta `max_rows` filas (siempre al
+    menos un mes completo; max_rows <= 0 = sin tope). Toma el lock de escritura del
+    spreadsheet (los números de fila cambian): /sync lo llama al terminar la fuente.
+    Retorna {"ok", "rows_archived", "cutoff", "months", "pending_months", "archives"}.
+    """
+    import gspread
+
+    title, key_range, key_of = _spec(source)
+    cutoff = cutoff_month(months, today)
+    result = {"ok": True, "rows_archived": 0, "cutoff": cutoff, "months": [], "pending_months": 0}
+
+    with spreadsheet_lock(sheet_id):
+        with metrics.stage("sheet_read"):
+            client = get_gspread_client()
+            metrics.api_call("sheets", "open_by_key")
+            doc = client.open_by_key(sheet_id)
+            try:
+                metrics.api_call("sheets", "worksheet")
+                sheet = doc.worksheet(title)
+            except gspread.WorksheetNotFound:
+                return result
+            metrics.api_call("sheets", "row_values")
+            headers = sheet.row_values(1)
+            metrics.api_call("sheets", "values_get")
+            column = sheet.get("A2:A", value_render_option="UNFORMATTED_VALUE", date_time_render_option="SERIAL_NUMBER")
+        by_month: Dict[str, List[int]] = defaultdict(list)
+        for i, values in enumerate(column):
+            month = month_of(values[0] if values else "")
+            if month and month < cutoff:
+                by_month[month].append(i + 2)  # fila 1 = headers
+
+        selected: List[str] = []
+        count = 0
+        for month in sorted(by_month):
+            if selected and max_rows > 0 and count + len(by_month[month]) > max_rows:
+                break
+            selected.append(month)
+            count += len(by_month[month])
+        result["months"] = selected
+        result["pending_months"] = len(by_month) - len(selected)
+        if not selected:
+            return result
+
+        by_year: Dict[str, List[int]] = defaultdict(list)
+        for month in selected:
+            by_year[month[:4]].extend(by_month[month])
+        archives = {}
+        for year in sorted(by_year):
+            check_cancelled(cancel)
+            rows = _read_rows(doc, title, sorted(by_year[year]), len(headers))
+            types = cells.ColumnTypes.infer(islice(rows, cells.SAMPLE_ROWS), _text_columns(source, headers))
+            rows = [types.convert(r) for r in rows]
+            archive, target = _archive_sheet(client, source, sheet_id, doc.title, title, headers, year)
+
+            # Lo que una corrida anterior ya copió de estas filas se reemplaza
+            keys = {key_of(r) for r in rows}
+            with metrics.stage("sheet_read"):
+                metrics.api_call("sheets", "values_get")
+                existing = target.get(key_range, value_render_option="UNFORMATTED_VALUE", date_time_render_option="SERIAL_NUMBER")
+            stale = [i + 2 for i, values in enumerate(existing) if values and key_of(values) in keys]
+            if stale:
+                requests_body = [
+                    delete_rows_request(target.id, start, end) for start, end in reversed(contiguous_ranges(stale))
+                ]
+                sheets_writer.call(archive.batch_update, {"requests": requests_body})
+            sheets_writer.append_rows(target, rows, value_input_option="RAW", cancel=cancel)
+            cells.apply_date_formats(archive, target.id, types.date_patterns())
+            archives[year] = {"spreadsheet_id": archive.id, "rows": len(rows), "rows_replaced": len(stale)}
+
+        # Con todo copiado, se borra de la hoja principal en un solo batch_update
+        archived = sorted(n for numbers in by_year.values() for n in numbers)
+        requests_body = [delete_rows_request(sheet.id, start, end) for start, end in reversed(contiguous_ranges(archived))]
+        sheets_writer.call(doc.batch_update, {"requests": requests_body})
+        if source == "materiales":
+            # El sync no vuelve a escribir en la hoja los meses archivados (first_kept_month)
+            through_key = f"archived_through:{source}:{sheet_id}"
+            through = get_meta(through_key)
+            if through is None or selected[-1] > through:
+                set_meta(through_key, selected[-1])
+        if source == "mano_obra":
+            # Si el CSV de un mes archivado cambia, el sync lo vuelve a escribir completo en la
+            # hoja y el archivado siguiente reemplaza ese mes en el archivo
+            delete_row_fingerprints(sheet_id, [f"{m[5:]}/{m[:4]}" for m in selected])
+            # Las filas subieron: los tramos guardados por periodo ya no valen
+            from .mano_obra import SheetLayout
+
+            SheetLayout.forget(sheet_id)
+        result["rows_archived"] = len(archived)
+        result["archives"] = archives
+        return result
+
+
+def after_sync(source: str, sheet_id: str, result: dict, cancel: Optional[threading.Event] = None) -> dict:
+    """
+    Archivado automático al terminar bien el sync de una fuente (con SHEETS_RETENTION_MONTHS
+    y como mucho cada SHEETS_ARCHIVE_INTERVAL_HOURS); agrega "archive" al resultado.
+    Si falla, el sync no falla: se reintenta en la próxima corrida.
+    """
+    if SHEETS_RETENTION_MONTHS <= 0 or not result.get("ok"):
+        return result
+    last_key = f"archive_last:{source}:{sheet_id}"
+    last = get_meta(last_key)
+    if last and datetime.utcnow() - datetime.fromisoformat(last) < timedelta(hours=SHEETS_ARCHIVE_INTERVAL_HOURS):
+        return result
+    try:
+        archived = archive_old_periods(source, sheet_id, cancel=cancel)
+    except Exception as e:
+        result["archive"] = {"ok": False, "rows_archived": 0, "error": str(e) or repr(e)}
+        return result
+    # Con meses pendientes (tope de filas) la próxima corrida sigue sin esperar el intervalo
+    if not archived["pending_months"]:
+        set_meta(last_key, datetime.utcnow().isoformat(timespec="seconds"))
+    result["archive"] = archived
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    from .targets import get_target
+
+    parser = argparse.ArgumentParser(description="Mueve los meses viejos de las hojas principales al archivo anual")
+    parser.add_argument("--months", type=int, default=SHEETS_RETENTION_MONTHS, help="Meses que quedan en la hoja (contando el actual)")
+    parser.add_argument("--max-rows", type=int, default=0, help="Tope de filas por fuente (0 = sin tope)")
+    parser.add_argument("--only", choices=SOURCES, help="Archivar una sola fuente")
+    parser.add_argument("--target", help="Target de SYNC_TARGETS_FILE (default: el primero)")
+    args = parser.parse_args(argv)
+    if args.months <= 0:
+        parser.error("--months (o SHEETS_RETENTION_MONTHS) debe ser mayor a 0")
+    try:
+        target = get_target(args.target)
+    except ValueError as e:
+        parser.error(str(e))
+
+    out: Dict[str, dict] = {}
+    for source in [args.only] if args.only else SOURCES:
+        if target[source] is None:
+            continue
+        try:
+            out[source] = archive_old_periods(source, target[source]["sheet_id"], args.months, args.max_rows)
+        except Exception as e:
+            out[source] = {"ok": False, "rows_archived": 0, "error": str(e) or repr(e)}
+    print(json.dumps(out, indent=2, ensure_ascii=False, default=str))
+    return 0 if all(r.get("ok") for r in out.values()) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
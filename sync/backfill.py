@@ -0,0 +1,179 @@
+"""
+Backfill de varios meses: remitos de materiales y cada Costos_MM_YYYY.CSV del rango,
+procesados en paralelo (BACKFILL_MAX_WORKERS). Los fetches de los meses corren a la vez;
+las escrituras a un mismo spreadsheet se turnan (sheets_writer.spreadsheet_lock) porque
+el upsert y el delta ubican filas por número. Todas pasan además por el limitador
+compartido (sync.ratelimit) para no superar la cuota por minuto, y el avance se guarda
+en el estado local: si se interrumpe, volver a correr el mismo rango retoma solo lo
+pendiente.
+
+Uso:
+  python -m sync.backfill 2025-01 2025-12
+  python -m sync.backfill 2025-01 2025-12 --only mano_obra --force
+  python -m sync.backfill 2025-01 2025-12 --target sucursal-norte
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+from .config import BACKFILL_MAX_WORKERS, SKIP_MATERIALES_SYNC
+from .state import clear_backfill, get_backfill_items, save_backfill_item
+from .targets import DEFAULT_TARGET, get_target
+
+SOURCES = ("materiales", "mano_obra")
+
+
+def parse_month(value: str) -> Tuple[int, int]:
+    """'YYYY-MM' → (año, mes)."""
+    try:
+        year, month = (int(p) for p in value.strip().split("-"))
+    except ValueError:
+        raise ValueError(f"Mes inválido '{value}': usar YYYY-MM")
+    if not 1 <= month <= 12:
+        raise ValueError(f"Mes inválido '{value}': usar YYYY-MM")
+    return year, month
+
+
+def month_range(from_month: str, to_month: str) -> List[Tuple[int, int]]:
+    """Meses (año, mes) de from_month a to_month inclusive."""
+    start, end = parse_month(from_month), parse_month(to_month)
+    if start > end:
+        raise ValueError(f"Rango inválido: {from_month} es posterior a {to_month}")
+    months = []
+    year, month = start
+    while (year, month) <= end:
+        months.append((year, month))
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def backfill(
+    from_month: str,
+    to_month: str,
+    sources: Iterable[str] = SOURCES,
+    force: bool = False,
+    restart: bool = False,
+    progress: Optional[Callable[[str, object], None]] = None,
+    max_workers: int = BACKFILL_MAX_WORKERS,
+    target: Optional[str] = None,
+) -> dict:
+    """
+    Sincroniza cada mes del rango para las fuentes pedidas.
+    Materiales reemplaza el rango completo de cada mes (sin modo incremental).
+    Mano de obra usa el CSV de cada mes; force=True lo reescribe aunque el manifiesto
+    diga que no cambió (p. ej. después de vaciar la hoja).
+    restart=True descarta el avance guardado del mismo rango.
+    target: nombre del target de SYNC_TARGETS_FILE (None: el primero / "default").
+    Retorna {"ok", "run_id", "rows_written", "resumed", "items": {item: resultado}}.
+    """
+    from .materiales import run_sync_materiales_month
+    from .mano_obra import list_csv_files_in_folder, sync_mano_obra
+
+    months = month_range(from_month, to_month)
+    sources = [s for s in sources if s in SOURCES]
+    tgt = get_target(target)
+    m, mo = tgt["materiales"], tgt["mano_obra"]
+    run_id = f"{from_month}:{to_month}"
+    if tgt["name"] != DEFAULT_TARGET:
+        run_id = f"{tgt['name']}:{run_id}"
+    if restart:
+        clear_backfill(run_id)
+    saved = get_backfill_items(run_id)
+
+    items: List[Tuple[str, Callable[[], dict]]] = []
+    results: Dict[str, dict] = {}
+    if "materiales" in sources and m is not None and not SKIP_MATERIALES_SYNC:
+        for year, month in months:
+            items.append((
+                f"materiales:{year}-{month:02d}",
+                lambda y=year, mes=month: run_sync_materiales_month(
+                    y, mes, sheet_id=m["sheet_id"], incremental=False, api_url=m["api_url"], token=m["token"]
+                ),
+            ))
+    if "mano_obra" in sources and mo is not None:
+        # Un solo listado de Drive; si hay varios CSV del mismo mes queda el más reciente
+        by_month: Dict[Tuple[int, int], dict] = {}
+        for f in list_csv_files_in_folder(mo["folder_id"]):
+            by_month.setdefault((f["year"], f["month"]), f)
+        for year, month in months:
+            name = f"mano_obra:{year}-{month:02d}"
+            info = by_month.get((year, month))
+            if info is None:
+                results[name] = {"ok": True, "rows_written": 0, "file_name": "", "skipped": True}
+                continue
+            items.append((
+                name,
+                lambda f=info: sync_mano_obra(sheet_id=mo["sheet_id"], force=force, file_info=f),
+            ))
+
+    resumed = 0
+    pending = []
+    for name, fn in items:
+        if saved.get(name, {}).get("status") == "done":
+            results[name] = saved[name]["result"]
+            resumed += 1
+        else:
+            pending.append((name, fn))
+    if progress is not None:
+        progress("pendientes", len(pending))
+
+    if pending:
+        with ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="backfill") as ex:
+            futures = {ex.submit(fn): name for name, fn in pending}
+            for future in as_completed(futures):
+                name = futures[future]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"ok": False, "rows_written": 0, "error": str(e) or repr(e)}
+                status = "done" if result.get("ok") else "error"
+                save_backfill_item(run_id, name, status, result)
+                results[name] = result
+                if progress is not None:
+                    progress(name, status)
+
+    return {
+        "ok": all(r.get("ok") for r in results.values()),
+        "run_id": run_id,
+        "rows_written": sum(r.get("rows_written") or 0 for r in results.values()),
+        "resumed": resumed,
+        "items": dict(sorted(results.items())),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Backfill de materiales y mano de obra por rango de meses")
+    parser.add_argument("from_month", help="Primer mes (YYYY-MM)")
+    parser.add_argument("to_month", help="Último mes (YYYY-MM)")
+    parser.add_argument("--only", choices=SOURCES, help="Procesar una sola fuente")
+    parser.add_argument("--force", action="store_true", help="Reescribir CSVs aunque no hayan cambiado")
+    parser.add_argument("--restart", action="store_true", help="Ignorar el avance guardado de este rango")
+    parser.add_argument("--workers", type=int, default=BACKFILL_MAX_WORKERS, help="Meses en paralelo")
+    parser.add_argument("--target", help="Target de SYNC_TARGETS_FILE (default: el primero)")
+    args = parser.parse_args(argv)
+    try:
+        month_range(args.from_month, args.to_month)
+        get_target(args.target)
+    except ValueError as e:
+        parser.error(str(e))
+
+    out = backfill(
+        args.from_month,
+        args.to_month,
+        sources=[args.only] if args.only else SOURCES,
+        force=args.force,
+        restart=args.restart,
+        progress=lambda name, status: print(f"  {name}: {status}", file=sys.stderr),
+        max_workers=args.workers,
+        target=args.target,
+    )
+    print(json.dumps(out, indent=2, ensure_ascii=False, default=str))
+    return 0 if out["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
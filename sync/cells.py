@@ -0,0 +1,279 @@
+"""
+Normalización de filas antes de escribirlas en Sheets. El tipo de cada columna (número,
+fecha o texto) se infiere una sola vez por archivo o fetch, con una muestra de filas, y
+después cada fila se convierte con los conversores ya elegidos para sus columnas. Los
+valores viajan tipados con valueInputOption=RAW: Google no vuelve a interpretar cada
+celda según el locale de la hoja y el payload es más chico.
+- números: "1.234,56", "1,234.56", "1234.5", "$ 100"; el separador decimal se decide
+  por columna (no por celda);
+- fechas: YYYY-MM-DD (con o sin hora) y DD/MM/YYYY → número de serie de Sheets; el
+  formato de fecha de esas columnas se aplica con apply_date_formats;
+- el resto queda como texto, también los números con ceros a la izquierda ("0012",
+  códigos y legajos) y los de más de MAX_DIGITS dígitos.
+Una celda que no encaja con el tipo de su columna se manda tal cual (como texto). Las
+columnas de identificadores (cuenta, número de documento, idObr, legajo) se fijan como
+texto con text_columns, así no cambian de tipo según la muestra de cada corrida.
+El formato de fecha se aplica una vez por columna: el estado local recuerda qué formato
+tiene cada columna de cada hoja.
+"""
+from __future__ import annotations
+
+import json
+import re
+from datetime import date
+from itertools import chain, islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .sheets_writer import sheets_writer
+from .state import get_meta, set_meta
+
+# Filas de la muestra con la que se infiere el tipo de cada columna
+SAMPLE_ROWS = 1000
+# Más dígitos no entran exactos en un double (CBU, códigos largos): quedan como texto
+MAX_DIGITS = 15
+
+_EPOCH = date(1899, 12, 30)  # día 0 de los números de serie de Sheets
+_NUMBER = re.compile(r"-?\d[\d.,]*$")
+_INTEGER = re.compile(rf"-?(?:0|[1-9]\d{{0,{MAX_DIGITS - 1}}})$")
+_ISO_DATE = re.compile(r"(\d{4})-(\d{2})-(\d{2})(?:[T ][\d:.]*Z?)?$")
+_DMY_DATE = re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})$")
+# (regex, orden de año/mes/día en los grupos, formato para la columna)
+_DATE_FORMATS = (
+    (_ISO_DATE, (0, 1, 2), "yyyy-mm-dd"),
+    (_DMY_DATE, (2, 1, 0), "dd/mm/yyyy"),
+)
+
+Converter = Callable[[object], object]
+
+
+def _text(value):
+    return "" if value is None else value
+
+
+def _identifier(value):
+    """Celda de una columna de identificadores: siempre texto (1042 y 1042.0 → "1042")."""
+    if value is None:
+        return ""
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return value if isinstance(value, str) else str(value)
+
+
+def _clean(text: str) -> str:
+    return text.strip().replace(" ", "").replace("$", "")
+
+
+def parse_number(text: str, decimal: str = ".") -> Optional[float]:
+    """Número de un texto con ese separador decimal (el otro es de miles); None si no es número."""
+    thousands = "." if decimal == "," else ","
+    s = _clean(text)
+    if not _NUMBER.match(s) or s.count(decimal) > 1:
+        return None
+    if decimal in s and thousands in s[s.index(decimal):]:
+        return None
+    whole = s.lstrip("-").split(decimal)[0]
+    if len(whole) > 1 and whole[0] == "0":
+        return None  # cero a la izquierda: es un código, no un número
+    digits = s.replace(thousands, "").replace(decimal, ".")
+    if len(digits) - digits.count(".") - digits.startswith("-") > MAX_DIGITS:
+        return None
+    try:
+        n = float(digits)
+    except ValueError:
+        return None
+    return int(n) if n.is_integer() else n
+
+
+def _decimal_separator(values: List[str]) -> str:
+    """Separador decimal de una columna: el último cuando aparecen los dos, si no por repetición."""
+    cleaned = [_clean(v) for v in values]
+    both = [s for s in cleaned if "," in s and "." in s]
+    if both:
+        return "," if both[0].rfind(",") > both[0].rfind(".") else "."
+    if any(s.count(",") > 1 for s in cleaned):
+        return "."
+    if any("," in s for s in cleaned):
+        return ","
+    if any(s.count(".") > 1 for s in cleaned):
+        return ","
+    return "."
+
+
+def _number_converter(decimal: str) -> Converter:
+    # Camino rápido para lo más común: enteros y decimales sin separador de miles
+    decimal_re = re.compile(rf"-?(?:0|[1-9]\d{{0,{MAX_DIGITS - 1}}}){re.escape(decimal)}\d+$")
+
+    def convert(value):
+        if isinstance(value, str):
+            if _INTEGER.match(value):
+                return int(value)
+            if decimal_re.match(value) and len(value) <= MAX_DIGITS + 2:
+                n = float(value if decimal == "." else value.replace(",", "."))
+                return int(n) if n.is_integer() else n
+            n = parse_number(value, decimal)
+            return value if n is None else n
+        return _text(value)
+
+    return convert
+
+
+def _serial(regex, order: Tuple[int, int, int], text: str) -> Optional[int]:
+    m = regex.match(text.strip())
+    if m is None:
+        return None
+    parts = m.groups()
+    try:
+        day = date(int(parts[order[0]]), int(parts[order[1]]), int(parts[order[2]]))
+    except ValueError:
+        return None
+    return (day - _EPOCH).days
+
+
+def _date_converter(regex, order: Tuple[int, int, int]) -> Converter:
+    cache: Dict[str, object] = {}  # las fechas se repiten mucho dentro de un archivo
+
+    def convert(value):
+        if not isinstance(value, str):
+            return _text(value)
+        out = cache.get(value)
+        if out is None:
+            serial = _serial(regex, order, value)
+            out = cache[value] = value if serial is None else serial
+        return out
+
+    return convert
+
+
+class ColumnTypes:
+    """Tipo y conversor de cada columna, inferidos de una muestra de filas."""
+
+    def __init__(self, kinds: List[str], converters: List[Converter], date_patterns: Dict[int, str]):
+        self.kinds = kinds
+        self._typed = [(i, c) for i, c in enumerate(converters) if c is not _text]
+        self._date_patterns = date_patterns
+
+    @classmethod
+    def infer(cls, rows: Iterable[Sequence], text_columns: Iterable[int] = ()) -> "ColumnTypes":
+        """
+        Una columna es número o fecha si todos sus valores no vacíos de la muestra lo son;
+        las de text_columns (0-based) son siempre texto.
+        """
+        sample = [r for r in rows if r]
+        pinned = set(text_columns)
+        width = max((len(r) for r in sample), default=0)
+        kinds: List[str] = []
+        converters: List[Converter] = []
+        patterns: Dict[int, str] = {}
+        for i in range(width):
+            if i in pinned:
+                kinds.append("texto")
+                converters.append(_identifier)
+                continue
+            values = [r[i] for r in sample if i < len(r) and r[i] is not None and r[i] != ""]
+            texts = [v for v in values if isinstance(v, str)]
+            kind, convert = "texto", _text
+            if values and all(isinstance(v, (int, float)) and not isinstance(v, bool) for v in values):
+                kind, convert = "número", _number_converter(".")
+            elif texts and len(texts) == len(values):
+                for regex, order, pattern in _DATE_FORMATS:
+                    if all(_serial(regex, order, v) is not None for v in texts):
+                        kind, convert = "fecha", _date_converter(regex, order)
+                        patterns[i] = pattern
+                        break
+                else:
+                    decimal = _decimal_separator(texts)
+                    if all(parse_number(v, decimal) is not None for v in texts):
+                        kind, convert = "número", _number_converter(decimal)
+            elif values and all(
+                not isinstance(v, str) or parse_number(v) is not None for v in values
+            ):
+                kind, convert = "número", _number_converter(".")
+            kinds.append(kind)
+            converters.append(convert)
+        return cls(kinds, converters, patterns)
+
+    def convert(self, row: Sequence) -> list:
+        """La fila con cada celda convertida al tipo de su columna (las de texto quedan igual)."""
+        out = list(row)
+        n = len(out)
+        for i, convert in self._typed:
+            if i < n:
+                out[i] = convert(out[i])
+        return out
+
+    def date_patterns(self, offset: int = 0) -> Dict[int, str]:
+        """{columna (0-based, + offset): formato} de las columnas de fecha."""
+        return {i + offset: p for i, p in self._date_patterns.items()}
+
+
+class TypedRows:
+    """
+    Filas convertidas en streaming: los tipos se infieren con las primeras `sample` filas
+    al pedir la primera (solo la muestra queda en memoria). `types` es None hasta entonces
+    y también si no hubo filas. text_columns: ver ColumnTypes.infer.
+    """
+
+    def __init__(self, rows: Iterable[Sequence], sample: int = SAMPLE_ROWS, text_columns: Iterable[int] = ()):
+        self._rows = iter(rows)
+        self._sample = sample
+        self._text_columns = tuple(text_columns)
+        self._out: Optional[Iterator[list]] = None
+        self.types: Optional[ColumnTypes] = None
+
+    def __iter__(self) -> "TypedRows":
+        return self
+
+    def __next__(self) -> list:
+        if self._out is None:
+            head = list(islice(self._rows, self._sample))
+            self.types = ColumnTypes.infer(head, self._text_columns) if head else None
+            self._out = map(self.types.convert, chain(head, self._rows)) if head else iter(())
+        return next(self._out)
+
+    def date_patterns(self, offset: int = 0) -> Dict[int, str]:
+        return self.types.date_patterns(offset) if self.types is not None else {}
+
+
+def date_format_requests(sheet_id: int, patterns: Dict[int, str]) -> List[dict]:
+    """repeatCell que aplica el formato de fecha a esas columnas (desde la fila 2) de la hoja."""
+    return [
+        {
+            "repeatCell": {
+                "range": {"sheetId": sheet_id, "startRowIndex": 1, "startColumnIndex": col, "endColumnIndex": col + 1},
+                "cell": {"userEnteredFormat": {"numberFormat": {"type": "DATE", "pattern": pattern}}},
+                "fields": "userEnteredFormat.numberFormat",
+            }
+        }
+        for col, pattern in sorted(patterns.items())
+    ]
+
+
+def _formats_key(doc, sheet_id: int) -> str:
+    return f"date_formats:{doc.id}:{sheet_id}"
+
+
+def pending_date_formats(doc, sheet_id: int, patterns: Dict[int, str]) -> Dict[int, str]:
+    """Las columnas de `patterns` cuyo formato todavía no se aplicó a esa hoja (hoja o columna nueva, otro formato)."""
+    raw = get_meta(_formats_key(doc, sheet_id)) if patterns else None
+    applied = json.loads(raw) if raw else {}
+    return {col: p for col, p in patterns.items() if applied.get(str(col)) != p}
+
+
+def remember_date_formats(doc, sheet_id: int, patterns: Dict[int, str]) -> None:
+    """Registra en el estado local el formato ya aplicado a esas columnas de la hoja."""
+    if patterns:
+        raw = get_meta(_formats_key(doc, sheet_id))
+        applied = json.loads(raw) if raw else {}
+        applied.update({str(col): p for col, p in patterns.items()})
+        set_meta(_formats_key(doc, sheet_id), json.dumps(applied, sort_keys=True))
+
+
+def apply_date_formats(doc, sheet_id: int, patterns: Dict[int, str]) -> None:
+    """
+    Formato de fecha en las columnas de la hoja que todavía no lo tienen, en un solo
+    batch_update; nada si todas ya lo tienen (la mayoría de las corridas).
+    """
+    pending = pending_date_formats(doc, sheet_id, patterns)
+    if pending:
+        sheets_writer.call(doc.batch_update, {"requests": date_format_requests(sheet_id, pending)}, idempotent=True)
+        remember_date_formats(doc, sheet_id, pending)
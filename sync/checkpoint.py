@@ -0,0 +1,206 @@
+"""
+Checkpoints para retomar una corrida interrumpida (worker reiniciado, error de Google a
+mitad de un append grande) sin volver a pedir los datos ni duplicar filas.
+Cada fuente guarda, por alcance (spreadsheet + rango o periodo):
+- fetched: qué se pidió (rango y modo de Remitos, id + md5 del CSV de Drive);
+- content_ref: las filas transformadas, en un archivo comprimido en SYNC_CHECKPOINT_DIR
+  (una lista JSON de hasta SPOOL_BATCH filas por línea) cuyo nombre es el hash del contenido;
+- append_ref / committed: las filas que faltaba añadir y cuántas ya se confirmaron
+  (se actualiza después de cada lote de sheets_writer.append_rows).
+La corrida siguiente con el mismo alcance y lo mismo pedido lee las filas del archivo y
+sigue desde el último lote confirmado. Al terminar bien se borra el checkpoint.
+"""
+from __future__ import annotations
+
+import gzip
+import hashlib
+import json
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence
+
+from .config import SYNC_CHECKPOINT_DIR, SYNC_CHECKPOINT_MAX_HOURS
+from .state import (
+    delete_checkpoint,
+    get_checkpoint,
+    get_checkpoint_refs,
+    save_checkpoint,
+    update_checkpoint,
+)
+
+_SUFFIX = ".jsonl.gz"
+
+# Filas por línea del archivo (un json.dumps por lote es bastante más rápido que por fila)
+SPOOL_BATCH = 1000
+
+
+def _path(ref: str) -> Path:
+    return Path(SYNC_CHECKPOINT_DIR) / f"{ref}{_SUFFIX}"
+
+
+class RowSpool:
+    """
+    Escribe filas a un archivo de checkpoint a medida que pasan; close() lo deja con su
+    nombre definitivo (hash del contenido) y devuelve la referencia.
+    """
+
+    def __init__(self):
+        Path(SYNC_CHECKPOINT_DIR).mkdir(parents=True, exist_ok=True)
+        self._tmp = Path(SYNC_CHECKPOINT_DIR) / f".{uuid.uuid4().hex}.tmp"
+        self._file = gzip.open(self._tmp, "wt", encoding="utf-8", compresslevel=1)
+        self._hash = hashlib.sha256()
+        self._buf: List[Sequence] = []
+        self.complete = False
+
+    def add(self, row: Sequence) -> None:
+        self._buf.append(row)
+        if len(self._buf) >= SPOOL_BATCH:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._buf:
+            line = json.dumps(self._buf, default=str, ensure_ascii=False) + "\n"
+            self._hash.update(line.encode("utf-8"))
+            self._file.write(line)
+            self._buf = []
+
+    def tee(self, rows: Iterable[Sequence]) -> Iterator:
+        """Deja pasar las filas guardándolas; si se consumen todas el spool queda completo."""
+        for row in rows:
+            self.add(row)
+            yield row
+        self.complete = True
+
+    def close(self) -> str:
+        self._flush()
+        self._file.close()
+        ref = self._hash.hexdigest()[:32]
+        os.replace(self._tmp, _path(ref))
+        return ref
+
+    def discard(self) -> None:
+        self._file.close()
+        self._tmp.unlink(missing_ok=True)
+
+
+def write_rows(rows: Iterable[Sequence]) -> str:
+    """Guarda las filas y devuelve su referencia de contenido."""
+    spool = RowSpool()
+    try:
+        for row in rows:
+            spool.add(row)
+    except BaseException:
+        spool.discard()
+        raise
+    return spool.close()
+
+
+def remove_rows(ref: str) -> None:
+    """Borra las filas guardadas con write_rows / RowSpool si ningún checkpoint las usa."""
+    _remove_unused(ref)
+
+
+def read_rows(ref: str) -> Iterator[list]:
+    """Filas guardadas con esa referencia, en el mismo orden."""
+    with gzip.open(_path(ref), "rt", encoding="utf-8") as f:
+        for line in f:
+            yield from json.loads(line)
+
+
+class Checkpoint:
+    """Checkpoint de (source, scope); ver el docstring del módulo."""
+
+    def __init__(self, source: str, scope: str, data: dict):
+        self.source = source
+        self.scope = scope
+        self.fetched = data["fetched"]
+        self.content_ref = data.get("content_ref") or ""
+        self.append_ref = data.get("append_ref") or ""
+        self.committed = int(data.get("committed") or 0)
+
+    def rows(self) -> Iterator[list]:
+        """Las filas transformadas guardadas (sin volver a pedirlas a la fuente)."""
+        return read_rows(self.content_ref)
+
+    def set_content(self, ref: str) -> None:
+        self.content_ref = ref
+        update_checkpoint(self.source, self.scope, content_ref=ref)
+
+    def set_append(self, rows: Iterable[Sequence]) -> None:
+        """Guarda las filas que se van a añadir (todavía ninguna confirmada)."""
+        self.append_ref = write_rows(rows)
+        self.committed = 0
+        update_checkpoint(self.source, self.scope, append_ref=self.append_ref, committed=0)
+
+    def pending_append(self) -> Iterator[list]:
+        """Las filas de append_ref que todavía no se confirmaron."""
+        return islice(read_rows(self.append_ref), self.committed, None)
+
+    def on_commit(self, n: int) -> None:
+        """Para sheets_writer.append_rows(on_commit=...): suma un lote confirmado."""
+        self.committed += n
+        update_checkpoint(self.source, self.scope, committed=self.committed)
+
+    def clear(self) -> None:
+        delete_checkpoint(self.source, self.scope)
+        _remove_unused(self.content_ref, self.append_ref)
+
+
+def _remove_unused(*refs: str) -> None:
+    """Borra los archivos que ya no usa ningún checkpoint (el contenido puede compartirse)."""
+    used = get_checkpoint_refs()
+    for ref in refs:
+        if ref and ref not in used:
+            _path(ref).unlink(missing_ok=True)
+
+
+def _expired(data: dict) -> bool:
+    updated = datetime.fromisoformat(data["updated_at"])
+    return datetime.utcnow() - updated > timedelta(hours=SYNC_CHECKPOINT_MAX_HOURS)
+
+
+def load(source: str, scope: str, fetched: str) -> Optional[Checkpoint]:
+    """
+    Checkpoint de una corrida anterior que no terminó, si pidió lo mismo (fetched) y sus
+    archivos siguen en disco. Uno que no sirve (otro contenido, vencido, archivos
+    perdidos en un disco efímero) se descarta y se devuelve None.
+    """
+    data = get_checkpoint(source, scope)
+    if data is None:
+        return None
+    cp = Checkpoint(source, scope, data)
+    missing = any(ref and not _path(ref).exists() for ref in (cp.content_ref, cp.append_ref))
+    if data["fetched"] != fetched or _expired(data) or missing:
+        cp.clear()
+        return None
+    return cp
+
+
+def start(source: str, scope: str, fetched: str, content_ref: str = "") -> Checkpoint:
+    """Empieza el checkpoint de una corrida (reemplaza el anterior del mismo alcance)."""
+    previous = get_checkpoint(source, scope)
+    save_checkpoint(source, scope, fetched, content_ref)
+    if previous is not None:
+        _remove_unused(previous["content_ref"], previous["append_ref"])
+    _purge_orphans()
+    return Checkpoint(source, scope, {"fetched": fetched, "content_ref": content_ref})
+
+
+def _purge_orphans() -> None:
+    """Archivos de corridas muertas a mitad de un spool o sin checkpoint, más viejos que el máximo."""
+    folder = Path(SYNC_CHECKPOINT_DIR)
+    if not folder.is_dir():
+        return
+    used = get_checkpoint_refs()
+    cutoff = time.time() - SYNC_CHECKPOINT_MAX_HOURS * 3600
+    for path in folder.iterdir():
+        ref = path.name[: -len(_SUFFIX)] if path.name.endswith(_SUFFIX) else None
+        try:
+            if ref not in used and path.stat().st_mtime < cutoff:
+                path.unlink()
+        except FileNotFoundError:
+            continue  # lo borró otra corrida
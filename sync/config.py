@@ -20,12 +20,32 @@ REMITOS_API_URL = os.environ.get(
     "https://642f0538ae6d.sn.mynetname.net:5010/api/Remitos",
 )
 REMITOS_BEARER_TOKEN = os.environ.get("REMITOS_BEARER_TOKEN", "")
+# Fetch por ventanas: el rango se parte en ventanas de N días pedidas en paralelo
+REMITOS_WINDOW_DAYS = int(os.environ.get("REMITOS_WINDOW_DAYS", "7"))
+REMITOS_MAX_WORKERS = int(os.environ.get("REMITOS_MAX_WORKERS", "4"))
+# Timeout por request (segundos) y reintentos con backoff exponencial (factor en segundos)
+REMITOS_TIMEOUT = float(os.environ.get("REMITOS_TIMEOUT", "10"))
+REMITOS_RETRIES = int(os.environ.get("REMITOS_RETRIES", "3"))
+REMITOS_BACKOFF = float(os.environ.get("REMITOS_BACKOFF", "1.0"))
+# Decodificar la respuesta en streaming (documento por documento) en vez de resp.json()
+REMITOS_STREAM_JSON = os.environ.get("REMITOS_STREAM_JSON", "1").strip().lower() in ("1", "true", "yes")
+REMITOS_STREAM_CHUNK_BYTES = int(os.environ.get("REMITOS_STREAM_CHUNK_BYTES", str(64 * 1024)))
+# Cache local de remitos: con un high-water mark previo solo se piden los últimos N días
+REMITOS_INCREMENTAL = os.environ.get("REMITOS_INCREMENTAL", "1").strip().lower() in ("1", "true", "yes")
+REMITOS_TRAILING_DAYS = int(os.environ.get("REMITOS_TRAILING_DAYS", "7"))
+# Escritura en la hoja Materiales: "upsert" (reemplaza el rango de fechas sincronizado,
+# clave TipoDoc + Serie + NroDoc) o "append" (comportamiento anterior, añade todo)
+MATERIALES_WRITE_MODE = os.environ.get("MATERIALES_WRITE_MODE", "upsert").strip().lower()
 
 # --- Google Drive (CSV mano de obra) ---
 DRIVE_FOLDER_ID_MANO_OBRA = os.environ.get(
     "DRIVE_FOLDER_ID_MANO_OBRA",
     "1iEuqLWPnE8i-XJWPp-CF1B1r-X-5-yDu",
 )
+# Listado incremental: changes feed de Drive (token persistido en el estado local);
+# el listado completo paginado se rehace si el cache tiene más de N horas
+DRIVE_CHANGES_FEED = os.environ.get("DRIVE_CHANGES_FEED", "1").strip().lower() in ("1", "true", "yes")
+DRIVE_FULL_LISTING_HOURS = float(os.environ.get("DRIVE_FULL_LISTING_HOURS", "24"))
 
 # --- Carpeta de destino (Sync - Costos Materiales & Mano de Obra) ---
 DRIVE_FOLDER_ID_SYNC = os.environ.get(
@@ -52,6 +72,79 @@ GOOGLE_CREDENTIALS_PATH = os.environ.get(
     str(Path(__file__).resolve().parents[1] / "credentials" / "service_account.json"),
 )
 
+# Salida particionada: además de la hoja principal, una hoja por obra
+# ("Materiales - <CUENTA>", "Mano de obra - <idObr>")
+SHEETS_PARTITION_BY_OBRA = os.environ.get("SHEETS_PARTITION_BY_OBRA", "").strip().lower() in ("1", "true", "yes")
+
+# Hoja "Resumen" con totales por fuente, obra, periodo y moneda (mantenida con el delta de
+# cada corrida); columna del importe en el CSV de mano de obra ("" = Importe/Total/Monto/Costo)
+SHEETS_RESUMEN = os.environ.get("SHEETS_RESUMEN", "1").strip().lower() in ("1", "true", "yes")
+RESUMEN_IMPORTE_COLUMN = os.environ.get("RESUMEN_IMPORTE_COLUMN", "").strip()
+
+# Retención en las hojas principales (Materiales, Mano de obra): los meses anteriores a los
+# últimos SHEETS_RETENTION_MONTHS (contando el actual; 0 = no archivar) se mueven a un
+# spreadsheet de archivo por año ("<spreadsheet> - Archivo YYYY") en SHEETS_ARCHIVE_FOLDER_ID.
+# Corre después de un /sync correcto, como mucho cada SHEETS_ARCHIVE_INTERVAL_HOURS, y mueve
+# hasta SHEETS_ARCHIVE_MAX_ROWS filas por corrida (meses completos, primero los más viejos)
+SHEETS_RETENTION_MONTHS = int(os.environ.get("SHEETS_RETENTION_MONTHS", "0"))
+SHEETS_ARCHIVE_FOLDER_ID = os.environ.get("SHEETS_ARCHIVE_FOLDER_ID", "").strip() or DRIVE_FOLDER_ID_SYNC
+SHEETS_ARCHIVE_INTERVAL_HOURS = float(os.environ.get("SHEETS_ARCHIVE_INTERVAL_HOURS", "24"))
+SHEETS_ARCHIVE_MAX_ROWS = int(os.environ.get("SHEETS_ARCHIVE_MAX_ROWS", "50000"))
+
+# Cuota de escrituras a Google Sheets por minuto (la de Google es 60/min por usuario)
+SHEETS_WRITES_PER_MINUTE = float(os.environ.get("SHEETS_WRITES_PER_MINUTE", "50"))
+# Escritor de Sheets: filas por lote inicial (se ajusta solo), tope de payload por request,
+# reintentos ante 429/5xx con backoff exponencial y latencia objetivo por request (segundos)
+SHEETS_BATCH_ROWS = int(os.environ.get("SHEETS_BATCH_ROWS", "5000"))
+SHEETS_MAX_PAYLOAD_BYTES = int(os.environ.get("SHEETS_MAX_PAYLOAD_BYTES", str(2 * 1024 * 1024)))
+SHEETS_RETRIES = int(os.environ.get("SHEETS_RETRIES", "5"))
+SHEETS_BACKOFF = float(os.environ.get("SHEETS_BACKOFF", "1.0"))
+SHEETS_TARGET_LATENCY = float(os.environ.get("SHEETS_TARGET_LATENCY", "5"))
+
+# Backfill: cantidad de (fuente, mes) que se procesan en paralelo
+BACKFILL_MAX_WORKERS = int(os.environ.get("BACKFILL_MAX_WORKERS", "4"))
+
+# Deadline (segundos) de cada fuente cuando /sync las ejecuta en paralelo
+SYNC_TIMEOUT_MATERIALES = float(os.environ.get("SYNC_TIMEOUT_MATERIALES", "120"))
+SYNC_TIMEOUT_MANO_OBRA = float(os.environ.get("SYNC_TIMEOUT_MANO_OBRA", "120"))
+
+# Varios destinos (empresas/sucursales): archivo JSON o YAML con la lista de targets.
+# Sin archivo se sincroniza un único target "default" con las variables de arriba.
+SYNC_TARGETS_FILE = os.environ.get("SYNC_TARGETS_FILE", "").strip()
+# Hilos compartidos por todas las tareas (target × fuente) de un /sync
+SYNC_MAX_WORKERS = int(os.environ.get("SYNC_MAX_WORKERS", "4"))
+
+# Warm-up al arrancar cada worker (imports, clientes Google, token OAuth); timeout del token
+SYNC_WARMUP = os.environ.get("SYNC_WARMUP", "1").strip().lower() in ("1", "true", "yes")
+SYNC_WARMUP_TIMEOUT = float(os.environ.get("SYNC_WARMUP_TIMEOUT", "10"))
+
+# GET /health/deep: timeout de cada sonda (Remitos, Drive, Sheets) y cuánto se reusa el
+# último resultado, para que el monitoreo pueda consultarlo seguido sin cargar las fuentes
+HEALTH_PROBE_TIMEOUT = float(os.environ.get("HEALTH_PROBE_TIMEOUT", "5"))
+HEALTH_CACHE_SECONDS = float(os.environ.get("HEALTH_CACHE_SECONDS", "30"))
+
+# Snapshot local de costos (SQLite indexado por obra y periodo) que sirve GET /costos;
+# se actualiza en cada sync con lo escrito
+COSTOS_SNAPSHOT = os.environ.get("COSTOS_SNAPSHOT", "1").strip().lower() in ("1", "true", "yes")
+COSTOS_SNAPSHOT_PATH = os.environ.get(
+    "COSTOS_SNAPSHOT_PATH",
+    str(Path(__file__).resolve().parents[1] / "data" / "costos_snapshot.sqlite3"),
+)
+
+# Estado local del sync (SQLite): manifiesto de CSVs ya sincronizados, etc.
+# En Railway el disco es efímero; montar un volumen y apuntar esta ruta ahí para persistirlo.
+SYNC_STATE_PATH = os.environ.get(
+    "SYNC_STATE_PATH",
+    str(Path(__file__).resolve().parents[1] / "data" / "sync_state.sqlite3"),
+)
+
+# Checkpoints de corridas (ver sync.checkpoint): las filas de una corrida que falla a mitad
+# de la escritura quedan en disco y la siguiente retoma desde el último lote confirmado.
+# Un checkpoint más viejo que SYNC_CHECKPOINT_MAX_HOURS se descarta (los datos pueden haber cambiado).
+SYNC_CHECKPOINTS = os.environ.get("SYNC_CHECKPOINTS", "1").strip().lower() in ("1", "true", "yes")
+SYNC_CHECKPOINT_DIR = os.environ.get("SYNC_CHECKPOINT_DIR", str(Path(SYNC_STATE_PATH).parent / "checkpoints"))
+SYNC_CHECKPOINT_MAX_HOURS = float(os.environ.get("SYNC_CHECKPOINT_MAX_HOURS", "12"))
+
 
 def get_google_credentials():
     """Return credentials for gspread/Drive: dict or path."""
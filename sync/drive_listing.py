@@ -0,0 +1,125 @@
+"""
+Listado de una carpeta de Drive con cache local (sync.state).
+La primera vez, o si el cache tiene más de DRIVE_FULL_LISTING_HOURS, se lista la carpeta
+completa (paginada). En los demás syncs solo se piden los cambios desde el último token
+del changes feed de Drive: una sola llamada si no hubo cambios, sin importar cuántos
+archivos acumule la carpeta.
+"""
+from __future__ import annotations
+
+import sys
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+
+from . import metrics
+from .config import DRIVE_CHANGES_FEED, DRIVE_FULL_LISTING_HOURS
+from .google_clients import get_drive_service
+from .state import apply_drive_files, get_drive_files, get_meta, set_meta
+
+FILE_FIELDS = "id,name,mimeType,modifiedTime,md5Checksum,parents,trashed"
+PAGE_SIZE = 1000
+
+
+def _full_listing(drive, folder_id: str, mime_type: str) -> List[dict]:
+    query = f"'{folder_id}' in parents and mimeType='{mime_type}' and trashed=false"
+    files: List[dict] = []
+    page_token: Optional[str] = None
+    while True:
+        metrics.api_call("drive", "files.list")
+        resp = (
+            drive.files()
+            .list(
+                q=query,
+                fields=f"nextPageToken,files({FILE_FIELDS})",
+                pageSize=PAGE_SIZE,
+                pageToken=page_token,
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True,
+            )
+            .execute()
+        )
+        files.extend(resp.get("files", []))
+        page_token = resp.get("nextPageToken")
+        if not page_token:
+            return files
+
+
+def _changes_since(drive, token: str, folder_id: str, mime_type: str) -> Tuple[List[dict], List[str], str]:
+    """(archivos agregados/modificados en la carpeta, ids que salieron, token nuevo)."""
+    upserts: List[dict] = []
+    removed: List[str] = []
+    while True:
+        metrics.api_call("drive", "changes.list")
+        resp = (
+            drive.changes()
+            .list(
+                pageToken=token,
+                spaces="drive",
+                pageSize=PAGE_SIZE,
+                includeRemoved=True,
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True,
+                fields=f"nextPageToken,newStartPageToken,changes(fileId,removed,file({FILE_FIELDS}))",
+            )
+            .execute()
+        )
+        for change in resp.get("changes", []):
+            f = change.get("file") or {}
+            if (
+                change.get("removed")
+                or f.get("trashed")
+                or folder_id not in (f.get("parents") or [])
+                or f.get("mimeType") != mime_type
+            ):
+                # Borrado, a la papelera, movido fuera de la carpeta o ajeno a ella
+                removed.append(change["fileId"])
+            else:
+                upserts.append(f)
+        if "newStartPageToken" in resp:
+            return upserts, removed, resp["newStartPageToken"]
+        token = resp["nextPageToken"]
+
+
+def _is_fresh(listed_at: Optional[str]) -> bool:
+    if not listed_at:
+        return False
+    age = datetime.utcnow() - datetime.fromisoformat(listed_at)
+    return age < timedelta(hours=DRIVE_FULL_LISTING_HOURS)
+
+
+def list_folder_files(folder_id: str, mime_type: str = "text/csv") -> List[dict]:
+    """
+    Archivos de la carpeta con ese mimeType: [{"id", "name", "modifiedTime", "md5Checksum"}].
+    Usa el changes feed sobre el listado cacheado; si el token no sirve (vencido,
+    inválido) o el cache es viejo, vuelve a listar la carpeta completa.
+    """
+    from googleapiclient.errors import HttpError
+
+    drive = get_drive_service()
+    key = f"{folder_id}|{mime_type}"
+    token_key, listed_key = f"drive_changes_token:{key}", f"drive_listed_at:{key}"
+
+    token = get_meta(token_key) if DRIVE_CHANGES_FEED else None
+    if token and _is_fresh(get_meta(listed_key)):
+        try:
+            with metrics.stage("drive_changes"):
+                upserts, removed, new_token = _changes_since(drive, token, folder_id, mime_type)
+        except HttpError as e:
+            print(f"Drive changes feed falló ({e}); se lista la carpeta completa", file=sys.stderr)
+        else:
+            apply_drive_files(key, upserts, removed)
+            set_meta(token_key, new_token)
+            return get_drive_files(key)
+
+    with metrics.stage("drive_list"):
+        start_token: Optional[str] = None
+        if DRIVE_CHANGES_FEED:
+            # Token tomado antes de listar: lo que cambie durante el listado llega en el feed
+            metrics.api_call("drive", "changes.getStartPageToken")
+            start_token = drive.changes().getStartPageToken(supportsAllDrives=True).execute()["startPageToken"]
+        files = _full_listing(drive, folder_id, mime_type)
+    apply_drive_files(key, files, replace=True)
+    set_meta(listed_key, datetime.utcnow().isoformat(timespec="seconds"))
+    if start_token:
+        set_meta(token_key, start_token)
+    return get_drive_files(key)
@@ -0,0 +1,125 @@
+"""
+Clientes Google compartidos por todo el proceso: una sola credencial de la cuenta
+de servicio (el token OAuth se obtiene una vez y se refresca al vencer), un servicio
+Drive v3 y un cliente gspread. Todos los sync usan estos en vez de construir los suyos.
+Drive queda en solo lectura (listar y bajar los CSV); el único que escribe en Drive es
+el archivado al crear el spreadsheet de archivo, con su propio cliente (get_archive_client).
+"""
+from __future__ import annotations
+
+import threading
+
+from .config import get_google_credentials
+
+# Un solo set de scopes para Drive y Sheets: así la credencial (y su token) es única
+SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive.readonly",
+]
+# Crear spreadsheets de archivo en una carpeta de Drive
+ARCHIVE_SCOPES = [
+    "https://www.googleapis.com/auth/spreadsheets",
+    "https://www.googleapis.com/auth/drive",
+]
+
+_lock = threading.RLock()
+_credentials = None
+_drive_service = None
+_gspread_client = None
+_archive_client = None
+
+
+def get_credentials():
+    """Credencial de la cuenta de servicio, creada una sola vez por proceso."""
+    global _credentials
+    with _lock:
+        if _credentials is None:
+            from google.oauth2.service_account import Credentials
+
+            creds = get_google_credentials()
+            if not creds:
+                raise ValueError("Credenciales Google no configuradas")
+            if isinstance(creds, dict):
+                _credentials = Credentials.from_service_account_info(creds, scopes=SCOPES)
+            else:
+                _credentials = Credentials.from_service_account_file(creds, scopes=SCOPES)
+        return _credentials
+
+
+def get_drive_service():
+    """
+    Servicio Drive v3 cacheado. httplib2 no es thread-safe, así que cada request
+    usa su propio Http autorizado con la credencial compartida.
+    """
+    global _drive_service
+    with _lock:
+        if _drive_service is None:
+            import google_auth_httplib2
+            import httplib2
+            from googleapiclient.discovery import build
+            from googleapiclient.http import HttpRequest
+
+            credentials = get_credentials()
+
+            def _request_builder(http, *args, **kwargs):
+                authed = google_auth_httplib2.AuthorizedHttp(credentials, http=httplib2.Http())
+                return HttpRequest(authed, *args, **kwargs)
+
+            # Documento de discovery empaquetado en googleapiclient: sin request de red
+            _drive_service = build(
+                "drive",
+                "v3",
+                credentials=credentials,
+                requestBuilder=_request_builder,
+                cache_discovery=False,
+                static_discovery=True,
+            )
+        return _drive_service
+
+
+def get_gspread_client():
+    """Cliente gspread cacheado (comparte credencial y token con Drive)."""
+    global _gspread_client
+    with _lock:
+        if _gspread_client is None:
+            import gspread
+
+            _gspread_client = gspread.authorize(get_credentials())
+        return _gspread_client
+
+
+def get_archive_client():
+    """
+    Cliente gspread con escritura en Drive, solo para crear los spreadsheets de archivo
+    (sync.archive). Se crea la primera vez que hace falta, con su propio token.
+    """
+    global _archive_client
+    with _lock:
+        if _archive_client is None:
+            import gspread
+
+            _archive_client = gspread.authorize(get_credentials().with_scopes(ARCHIVE_SCOPES))
+        return _archive_client
+
+
+def use_clients(credentials=None, drive_service=None, gspread_client=None, archive_client=None) -> None:
+    """
+    Instala clientes ya construidos en el cache (p. ej. los fakes de bench/); sin
+    archive_client el archivado usa gspread_client.
+    """
+    global _credentials, _drive_service, _gspread_client, _archive_client
+    with _lock:
+        _credentials = credentials
+        _drive_service = drive_service
+        _gspread_client = gspread_client
+        _archive_client = archive_client or gspread_client
+
+
+def reset_clients() -> None:
+    """Descarta los clientes cacheados (p. ej. tras rotar la cuenta de servicio)."""
+    global _credentials, _drive_service, _gspread_client, _archive_client
+    with _lock:
+        _credentials = None
+        _drive_service = None
+        _gspread_client = None
+        _archive_client = None
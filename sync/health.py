@@ -0,0 +1,135 @@
+"""
+Health check profundo (GET /health/deep): sondas livianas a cada fuente y destino de
+cada target, en paralelo y con timeout (HEALTH_PROBE_TIMEOUT):
+- remitos: un request de un solo día, sin reintentos y sin leer el cuerpo;
+- drive: metadata de la carpeta de CSVs (files.get, sin listar);
+- sheet_materiales / sheet_mano_obra: metadata del spreadsheet (open_by_key).
+El resultado se reusa durante HEALTH_CACHE_SECONDS y un solo chequeo corre a la vez, así
+que el monitoreo puede consultarlo cada pocos segundos sin cargar las fuentes. Una sonda
+colgada no se relanza mientras siga corriendo: se informa como timeout.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+from datetime import datetime
+from typing import Callable, Dict, Optional
+
+from .config import HEALTH_CACHE_SECONDS, HEALTH_PROBE_TIMEOUT, SKIP_MATERIALES_SYNC
+
+Probe = Callable[[], str]
+
+_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="health")
+_inflight: Dict[str, Future] = {}
+_lock = threading.Lock()
+_check_lock = threading.Lock()
+_cached: Optional[dict] = None
+_cached_at = 0.0
+
+
+def _remitos_probe(api_url: str, token: str) -> Probe:
+    def probe() -> str:
+        from .materiales import ping_remitos
+
+        return f"HTTP {ping_remitos(api_url, token, timeout=HEALTH_PROBE_TIMEOUT)}"
+
+    return probe
+
+
+def _drive_probe(folder_id: str) -> Probe:
+    def probe() -> str:
+        from .google_clients import get_drive_service
+
+        meta = (
+            get_drive_service()
+            .files()
+            .get(fileId=folder_id, fields="id, mimeType", supportsAllDrives=True)
+            .execute()
+        )
+        return meta.get("mimeType") or ""
+
+    return probe
+
+
+def _sheet_probe(sheet_id: str) -> Probe:
+    def probe() -> str:
+        from .google_clients import get_gspread_client
+
+        # open_by_key ya trae la metadata del spreadsheet (un solo request)
+        return get_gspread_client().open_by_key(sheet_id).title
+
+    return probe
+
+
+def build_probes(targets: list) -> Dict[str, Probe]:
+    """
+    Sondas de los targets: {"remitos", "drive", "sheet_materiales", "sheet_mano_obra"},
+    con el prefijo "<target>/" salvo para el target default.
+    """
+    from .targets import DEFAULT_TARGET
+
+    probes: Dict[str, Probe] = {}
+    for target in targets:
+        prefix = "" if target["name"] == DEFAULT_TARGET else f"{target['name']}/"
+        m, mo = target["materiales"], target["mano_obra"]
+        if m is not None:
+            if not SKIP_MATERIALES_SYNC:
+                probes[f"{prefix}remitos"] = _remitos_probe(m["api_url"], m["token"])
+            probes[f"{prefix}sheet_materiales"] = _sheet_probe(m["sheet_id"])
+        if mo is not None:
+            probes[f"{prefix}drive"] = _drive_probe(mo["folder_id"])
+            probes[f"{prefix}sheet_mano_obra"] = _sheet_probe(mo["sheet_id"])
+    return probes
+
+
+def _timed(probe: Probe) -> dict:
+    start = time.monotonic()
+    try:
+        detail = probe()
+    except Exception as e:
+        return {"ok": False, "seconds": round(time.monotonic() - start, 3), "error": str(e) or repr(e)}
+    return {"ok": True, "seconds": round(time.monotonic() - start, 3), "detail": detail}
+
+
+def run_probes(probes: Dict[str, Probe], timeout: float = HEALTH_PROBE_TIMEOUT) -> Dict[str, dict]:
+    """Corre las sondas en paralelo; la que no termina en `timeout` segundos queda como error."""
+    with _lock:
+        futures = {}
+        for name, probe in probes.items():
+            running = _inflight.get(name)
+            if running is None or running.done():
+                running = _inflight[name] = _executor.submit(_timed, probe)
+            futures[name] = running
+    wait(futures.values(), timeout=timeout)
+    return {
+        name: f.result() if f.done() else {"ok": False, "error": f"timeout: sin respuesta en {timeout:g}s"}
+        for name, f in futures.items()
+    }
+
+
+def deep_check(force: bool = False) -> dict:
+    """
+    Estado de todas las sondas: {"ok", "checked_at", "age_seconds", "cached", "probes"}.
+    Reusa el último resultado si tiene menos de HEALTH_CACHE_SECONDS (salvo force=True).
+    """
+    global _cached, _cached_at
+    from .targets import load_targets
+
+    with _check_lock:
+        age = time.monotonic() - _cached_at
+        if _cached is None or force or age >= HEALTH_CACHE_SECONDS:
+            try:
+                probes = build_probes(load_targets())
+            except ValueError as e:
+                results = {"targets": {"ok": False, "error": str(e)}}
+            else:
+                results = run_probes(probes)
+            _cached = {
+                "ok": all(r["ok"] for r in results.values()),
+                "checked_at": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+                "probes": results,
+            }
+            _cached_at = time.monotonic()
+            return {**_cached, "age_seconds": 0.0, "cached": False}
+        return {**_cached, "age_seconds": round(age, 1), "cached": True}
@@ -0,0 +1,136 @@
+"""
+Jobs de sync en segundo plano: POST /sync devuelve un job_id al instante y
+GET /sync/<id> informa progreso y resultado. Un segundo disparo para el mismo
+target mientras hay uno en curso se une a ese job (single-flight) en vez de
+lanzar otro sync que duplicaría filas. Además cada job declara los spreadsheets que
+escribe: /sync y /backfill sobre las mismas hojas se excluyen (JobConflict).
+Los jobs viven en memoria del proceso (gunicorn con un solo worker).
+"""
+from __future__ import annotations
+
+import sys
+import threading
+import traceback
+import uuid
+from datetime import datetime
+from typing import Callable, Dict, FrozenSet, Iterable, Optional, Tuple
+
+# Cantidad de jobs terminados que se conservan para consultar su estado
+MAX_FINISHED_JOBS = 100
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat(timespec="seconds") + "Z"
+
+
+class JobConflict(Exception):
+    """Otro job (con otra clave) está escribiendo alguno de los mismos spreadsheets."""
+
+    def __init__(self, job: "Job"):
+        super().__init__(f"El job {job.id} ({job.target}) está escribiendo las mismas hojas")
+        self.job = job
+
+
+class Job:
+    """Un sync en curso o terminado. status: running | done | error."""
+
+    def __init__(self, target: str, resources: FrozenSet[str] = frozenset()):
+        self.id = uuid.uuid4().hex
+        self.target = target
+        self.resources = resources
+        self.status = "running"
+        self.created_at = _now()
+        self.finished_at: Optional[str] = None
+        self.progress: Dict[str, object] = {}
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        self._done = threading.Event()
+        self._lock = threading.Lock()
+
+    def set_progress(self, key: str, value) -> None:
+        with self._lock:
+            self.progress[key] = value
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._done.wait(timeout)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "job_id": self.id,
+                "target": self.target,
+                "status": self.status,
+                "created_at": self.created_at,
+                "finished_at": self.finished_at,
+                "progress": dict(self.progress),
+                "result": self.result,
+                "error": self.error,
+            }
+
+
+class JobRunner:
+    """Lanza jobs en hilos daemon, con como máximo un job activo por target."""
+
+    def __init__(self, max_finished: int = MAX_FINISHED_JOBS):
+        self._lock = threading.Lock()
+        self._jobs: Dict[str, Job] = {}
+        self._active: Dict[str, Job] = {}
+        self._finished: list = []
+        self._max_finished = max_finished
+
+    def submit(
+        self, target: str, fn: Callable[[Job], dict], resources: Iterable[str] = ()
+    ) -> Tuple[Job, bool]:
+        """
+        Inicia fn(job) para el target, o devuelve el job que ya está corriendo.
+        resources: IDs de los spreadsheets que escribe el job; JobConflict si un job activo
+        con otra clave escribe alguno de ellos.
+        Retorna (job, creado): creado=False si se unió a un job existente.
+        """
+        resources = frozenset(r for r in resources if r)
+        with self._lock:
+            running = self._active.get(target)
+            if running is not None:
+                return running, False
+            for other in self._active.values():
+                if other.resources & resources:
+                    raise JobConflict(other)
+            job = Job(target, resources)
+            self._jobs[job.id] = job
+            self._active[target] = job
+        thread = threading.Thread(
+            target=self._run, args=(job, fn), name=f"sync-job-{job.id[:8]}", daemon=True
+        )
+        thread.start()
+        return job, True
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def _run(self, job: Job, fn: Callable[[Job], dict]) -> None:
+        try:
+            result = fn(job)
+            with job._lock:
+                job.result = result
+                job.status = "done"
+        except Exception as e:
+            msg = str(e).strip() or repr(e)
+            print(f"Sync job {job.id} failed:", msg, file=sys.stderr)
+            print(traceback.format_exc(), file=sys.stderr)
+            with job._lock:
+                job.error = msg
+                job.status = "error"
+        finally:
+            with job._lock:
+                job.finished_at = _now()
+            with self._lock:
+                self._active.pop(job.target, None)
+                self._finished.append(job.id)
+                while len(self._finished) > self._max_finished:
+                    self._jobs.pop(self._finished.pop(0), None)
+            job._done.set()
+
+
+# Runner del proceso (compartido por todas las requests)
+runner = JobRunner()
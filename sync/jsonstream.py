@@ -0,0 +1,110 @@
+"""
+Lectura incremental de respuestas JSON grandes: recorre el objeto raíz a medida que
+llegan los chunks y entrega uno por uno los elementos de un array (p. ej. "documentos"),
+sin tener en memoria el cuerpo completo ni el árbol decodificado.
+"""
+from __future__ import annotations
+
+import codecs
+import json
+from typing import Any, Iterable, Iterator
+
+_WS = " \t\n\r"
+_decoder = json.JSONDecoder()
+
+
+class _Reader:
+    """Buffer de texto sobre los chunks; descarta lo ya consumido."""
+
+    def __init__(self, chunks: Iterable[bytes], encoding: str = "utf-8"):
+        self._chunks = iter(chunks)
+        self._decoder = codecs.getincrementaldecoder(encoding)()
+        self.buf = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self) -> bool:
+        if self.eof:
+            return False
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            self.pos = 0
+        for chunk in self._chunks:
+            text = self._decoder.decode(chunk)
+            if text:
+                self.buf += text
+                return True
+        self.buf += self._decoder.decode(b"", final=True)
+        self.eof = True
+        return True
+
+    def peek(self) -> str:
+        """Próximo carácter no blanco (sin consumirlo); "" al final."""
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in _WS:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self._fill():
+                return ""
+
+    def expect(self, char: str) -> None:
+        if self.peek() != char:
+            raise ValueError(f"JSON inválido: se esperaba '{char}' en la posición {self.pos}")
+        self.pos += 1
+
+    def value(self) -> Any:
+        """Decodifica el próximo valor completo (lee más chunks si quedó cortado)."""
+        self.peek()
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.buf, self.pos)
+            except json.JSONDecodeError:
+                if self._fill():
+                    continue
+                raise
+            # Un número al final del buffer puede seguir en el próximo chunk
+            if end >= len(self.buf) and not self.eof and self._fill():
+                continue
+            self.pos = end
+            return value
+
+
+def _iter_array(reader: _Reader) -> Iterator[Any]:
+    reader.expect("[")
+    if reader.peek() == "]":
+        reader.pos += 1
+        return
+    while True:
+        yield reader.value()
+        sep = reader.peek()
+        reader.pos += 1
+        if sep == "]":
+            return
+        if sep != ",":
+            raise ValueError("JSON inválido: se esperaba ',' o ']' en un array")
+
+
+def iter_array_items(chunks: Iterable[bytes], key: str, encoding: str = "utf-8") -> Iterator[Any]:
+    """
+    Elementos de root[key] (un array dentro del objeto raíz), decodificados de a uno.
+    Las demás claves del objeto raíz se decodifican y descartan. Si la clave no está o
+    es null no entrega nada.
+    """
+    reader = _Reader(chunks, encoding)
+    reader.expect("{")
+    if reader.peek() == "}":
+        return
+    while True:
+        name = reader.value()
+        reader.expect(":")
+        if name == key and reader.peek() == "[":
+            yield from _iter_array(reader)
+        else:
+            reader.value()
+        sep = reader.peek()
+        reader.pos += 1
+        if sep == "}":
+            return
+        if sep != ",":
+            raise ValueError("JSON inválido: se esperaba ',' o '}' en el objeto raíz")
@@ -4,16 +4,43 @@ El CSV tiene columna idObr para separar por obra.
 """
 from __future__ import annotations
 
+import codecs
 import csv
+import hashlib
 import io
+import json
 import re
+import threading
+import time
+from bisect import bisect_left, bisect_right
+from collections import Counter, defaultdict
+from itertools import islice
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
 
+from . import cells, checkpoint, metrics, resumen, snapshot
 from .config import (
+    COSTOS_SNAPSHOT,
     DRIVE_FOLDER_ID_MANO_OBRA,
     SHEET_ID_MANO_OBRA,
-    get_google_credentials,
+    SHEETS_PARTITION_BY_OBRA,
+    SHEETS_RESUMEN,
+    SYNC_CHECKPOINTS,
+)
+from .drive_listing import list_folder_files
+from .google_clients import get_credentials, get_drive_service, get_gspread_client
+from .partitions import a1_title, write_partitions
+from .runner import check_cancelled
+from .sheets_writer import contiguous_ranges, delete_rows_request, sheets_writer, spreadsheet_lock
+from .state import (
+    delete_meta,
+    get_manifest,
+    get_meta,
+    get_row_fingerprints,
+    is_same_file,
+    save_manifest,
+    save_row_fingerprints,
+    set_meta,
 )
 
 # Patrón: Costos_MM_YYYY.CSV (o .csv)
@@ -22,39 +49,23 @@ CSV_PATTERN = re.compile(r"Costos_(\d{2})_(\d{4})\.csv$", re.IGNORECASE)
 # Nombre de la hoja donde se acumulan los costos de mano de obra
 SHEET_NAME_MANO_OBRA = "Mano de obra"
 
+# Columnas de identificadores del CSV, siempre texto en la hoja (sync.cells)
+TEXT_HEADERS = ("idobr", "id_obr", "legajo")
 
-def _get_drive_service():
-    from google.oauth2.service_account import Credentials
-    from googleapiclient.discovery import build
-
-    creds = get_google_credentials()
-    if not creds:
-        raise ValueError("Credenciales Google no configuradas")
-    scopes = ["https://www.googleapis.com/auth/drive.readonly"]
-    if isinstance(creds, dict):
-        credentials = Credentials.from_service_account_info(creds, scopes=scopes)
-    else:
-        credentials = Credentials.from_service_account_file(creds, scopes=scopes)
-    return build("drive", "v3", credentials=credentials)
-
+# Tamaño de cada chunk de descarga desde Drive (bytes)
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
 
 def list_csv_files_in_folder(folder_id: Optional[str] = None) -> List[dict]:
     """
     Lista archivos CSV en la carpeta de mano de obra.
-    Retorna lista de {"id", "name", "modifiedTime", "year", "month"} ordenada por (año, mes) desc.
+    El listado sale del cache local mantenido con el changes feed de Drive
+    (sync.drive_listing): normalmente una sola llamada aunque la carpeta tenga años de archivos.
+    Retorna lista de {"id", "name", "modifiedTime", "md5Checksum", "year", "month"}
+    ordenada por (año, mes) desc.
     """
     fid = folder_id or DRIVE_FOLDER_ID_MANO_OBRA
-    drive = _get_drive_service()
-    results = (
-        drive.files()
-        .list(
-            q=f"'{fid}' in parents and mimeType='text/csv'",
-            fields="files(id,name,modifiedTime)",
-            orderBy="modifiedTime desc",
-        )
-        .execute()
-    )
-    files = results.get("files", [])
+    files = list_folder_files(fid, "text/csv")
+    files.sort(key=lambda f: f.get("modifiedTime") or "", reverse=True)
     out = []
     for f in files:
         name = f.get("name") or ""
@@ -65,6 +76,7 @@ def list_csv_files_in_folder(folder_id: Optional[str] = None) -> List[dict]:
                 "id": f["id"],
                 "name": name,
                 "modifiedTime": f.get("modifiedTime") or "",
+                "md5Checksum": f.get("md5Checksum") or "",
                 "year": year,
                 "month": month,
             })
@@ -92,29 +104,83 @@ def get_latest_month_csv(folder_id: Optional[str] = None) -> Optional[dict]:
     return best
 
 
-def download_csv_file(file_id: str) -> str:
-    """Descarga el contenido de un archivo de Drive por ID (CSV como texto)."""
-    from google.oauth2.service_account import Credentials
-    from googleapiclient.discovery import build
+def iter_csv_file_chunks(file_id: str, chunk_size: int = DOWNLOAD_CHUNK_SIZE) -> Iterator[str]:
+    """
+    Descarga un archivo de Drive por chunks y lo va decodificando (UTF-8, quita el BOM).
+    En memoria queda como máximo un chunk. El tiempo de cada chunk se suma a la etapa
+    csv_download aunque la descarga quede intercalada con la escritura.
+    """
     from googleapiclient.http import MediaIoBaseDownload
 
-    creds = get_google_credentials()
-    if not creds:
-        raise ValueError("Credenciales Google no configuradas")
-    scopes = ["https://www.googleapis.com/auth/drive.readonly"]
-    if isinstance(creds, dict):
-        credentials = Credentials.from_service_account_info(creds, scopes=scopes)
-    else:
-        credentials = Credentials.from_service_account_file(creds, scopes=scopes)
-    drive = build("drive", "v3", credentials=credentials)
+    drive = get_drive_service()
     request = drive.files().get_media(fileId=file_id)
     buf = io.BytesIO()
-    downloader = MediaIoBaseDownload(buf, request)
+    downloader = MediaIoBaseDownload(buf, request, chunksize=chunk_size)
+    decoder = codecs.getincrementaldecoder("utf-8-sig")()  # CSV a veces tiene BOM
     done = False
     while not done:
+        start = time.monotonic()
+        metrics.api_call("drive", "get_media", stage_name="csv_download")
         _, done = downloader.next_chunk()
-    buf.seek(0)
-    return buf.read().decode("utf-8-sig")  # CSV a veces tiene BOM
+        metrics.add_time("csv_download", time.monotonic() - start)
+        data = buf.getvalue()
+        metrics.add_bytes(len(data), "csv_download")
+        buf.seek(0)
+        buf.truncate()
+        text = decoder.decode(data, final=done)
+        if text:
+            yield text
+
+
+def download_csv_file(file_id: str) -> str:
+    """Descarga el contenido de un archivo de Drive por ID (CSV como texto)."""
+    return "".join(iter_csv_file_chunks(file_id))
+
+
+def _iter_lines(chunks: Iterable[str]) -> Iterator[str]:
+    """Reparte chunks de texto en líneas completas (con su salto de línea) para csv.reader."""
+    pending = ""
+    for chunk in chunks:
+        pending += chunk
+        lines = pending.split("\n")
+        pending = lines.pop()
+        for line in lines:
+            yield line + "\n"
+    if pending:
+        yield pending
+
+
+def _idobr_index(headers: List[str]) -> int:
+    """Índice de la columna idObr (o id_obr / variantes), case-insensitive; error si no existe."""
+    headers_lower = [h.lower().replace(" ", "") for h in headers]
+    for name in ("idobr", "id_obr"):
+        if name in headers_lower:
+            return headers_lower.index(name)
+    for i, h in enumerate(headers_lower):
+        if "id" in h and "obr" in h:
+            return i
+    raise ValueError(
+        f"Columna idObr no encontrada en el CSV. Columnas: {headers}"
+    )
+
+
+def text_columns(headers: List[str]) -> List[int]:
+    """Índices de las columnas de identificadores (TEXT_HEADERS) del CSV."""
+    return [i for i, h in enumerate(headers) if h.lower().replace(" ", "") in TEXT_HEADERS]
+
+
+def parse_csv_stream(chunks: Iterable[str]) -> Tuple[List[str], Iterator[list]]:
+    """
+    Parsea el CSV a medida que llegan los chunks de texto.
+    Retorna (headers, generador de filas); verifica la columna idObr.
+    """
+    reader = csv.reader(_iter_lines(chunks))
+    first = next(reader, None)
+    if first is None:
+        return [], iter(())
+    headers = [h.strip() for h in first]
+    _idobr_index(headers)
+    return headers, reader
 
 
 def parse_csv_content(content: str) -> Tuple[List[str], List[list]]:
@@ -122,27 +188,238 @@ def parse_csv_content(content: str) -> Tuple[List[str], List[list]]:
     Parsea el CSV y retorna (headers, rows).
     Verifica que exista columna idObr (case-insensitive).
     """
-    reader = csv.reader(io.StringIO(content))
-    rows = list(reader)
-    if not rows:
-        return [], []
-    headers = [h.strip() for h in rows[0]]
-    data_rows = rows[1:]
-    # Verificar que exista columna idObr (o id_obr / variantes)
-    headers_lower = [h.lower().replace(" ", "") for h in headers]
-    if "idobr" not in headers_lower and "id_obr" not in headers_lower:
-        if not any("id" in h and "obr" in h for h in headers_lower):
-            raise ValueError(
-                f"Columna idObr no encontrada en el CSV. Columnas: {headers}"
-            )
-    return headers, data_rows
+    headers, rows = parse_csv_stream([content])
+    return headers, list(rows)
+
+
+def _tee_by_obra(rows: Iterable[list], index: int, groups: Dict[str, List[list]]) -> Iterator[list]:
+    """Deja pasar las filas y a la vez las agrupa por obra (columna `index`)."""
+    for row in rows:
+        groups[str(row[index] if index < len(row) else "").strip()].append(row)
+        yield row
+
+
+def _tee_into(rows: Iterable[list], columns: "resumen.LaborColumns", sinks: List) -> Iterator[list]:
+    """
+    Deja pasar las filas y a la vez se las da a cada sink (totales del resumen, snapshot)
+    junto con su (obra, moneda, importe).
+    """
+    for row in rows:
+        if row:
+            obra, moneda, importe = columns.split(row)
+            for sink in sinks:
+                sink.add(row, obra, moneda, importe)
+        yield row
+
 
+def _norm_cell(value) -> str:
+    """
+    Valor comparable entre las filas tipadas (sync.cells) y lo que devuelve el Sheet
+    (UNFORMATTED_VALUE): los números se normalizan (8 y 8.0 son lo mismo) y el texto queda
+    tal cual, así "0012" y 12 dan huellas distintas.
+    """
+    if isinstance(value, bool):
+        return "TRUE" if value else "FALSE"
+    if isinstance(value, (int, float)):
+        number = float(value)
+        return "#" + (str(int(number)) if number.is_integer() else repr(number))
+    return "" if value is None else str(value)
+
+
+def row_fingerprint(periodo: str, cells: Iterable) -> str:
+    """Huella de una fila: hash de las columnas normalizadas (sin vacías al final) + periodo."""
+    values = [_norm_cell(v) for v in cells]
+    while values and values[-1] == "":
+        values.pop()
+    return hashlib.blake2b("\x1f".join([periodo] + values).encode("utf-8"), digest_size=16).hexdigest()
+
+
+def _col_letter(n: int) -> str:
+    letters = ""
+    while n:
+        n, rem = divmod(n - 1, 26)
+        letters = chr(65 + rem) + letters
+    return letters
 
-def sync_mano_obra(sheet_id: Optional[str] = None, folder_id: Optional[str] = None) -> dict:
+
+def layout_key(sheet_id: str) -> str:
+    return f"mano_obra_layout:{sheet_id}"
+
+
+class SheetLayout:
     """
-    Toma el último CSV del último mes en la carpeta Drive, lo parsea
-    y añade las filas al Google Sheet de mano de obra (append).
-    Retorna {"ok": bool, "rows_written": int, "file_name": str, "error": str opcional}.
+    Tramos de filas (periodo, primera, última) de la hoja de mano de obra y cuántas filas
+    tiene (con headers), guardados en el estado local para ubicar un periodo sin leer toda
+    la columna A. Antes de usarlos se verifican leyendo solo los tramos del periodo y el
+    final de la hoja; si no coinciden (edición manual, corrida cortada, archivado) se
+    reconstruyen con la columna A completa.
+    """
+
+    def __init__(self, ranges: List[List], total: int):
+        self.ranges = ranges
+        self.total = total
+
+    @classmethod
+    def scan(cls, sheet) -> "SheetLayout":
+        """Desde la columna A completa de la hoja."""
+        metrics.api_call("sheets", "col_values")
+        column = sheet.col_values(1)
+        ranges: List[List] = []
+        for n, value in enumerate(column[1:], start=2):  # fila 1 = headers
+            periodo = str(value).strip()
+            if ranges and ranges[-1][0] == periodo and ranges[-1][2] == n - 1:
+                ranges[-1][2] = n
+            elif periodo:
+                ranges.append([periodo, n, n])
+        return cls(ranges, len(column))
+
+    @classmethod
+    def load(cls, sheet_id: str) -> Optional["SheetLayout"]:
+        raw = get_meta(layout_key(sheet_id))
+        if raw is None:
+            return None
+        data = json.loads(raw)
+        return cls(data["ranges"], data["total"])
+
+    def save(self, sheet_id: str) -> None:
+        set_meta(layout_key(sheet_id), json.dumps({"ranges": self.ranges, "total": self.total}))
+
+    @staticmethod
+    def forget(sheet_id: str) -> None:
+        delete_meta(layout_key(sheet_id))
+
+    def rows(self, periodo: str) -> List[int]:
+        """Números de fila (1-based) del periodo."""
+        return [n for p, start, end in self.ranges if p == periodo for n in range(start, end + 1)]
+
+    def verify(self, doc, sheet, periodo: str) -> bool:
+        """
+        True si los tramos del periodo tienen ese periodo en la columna A, la última fila
+        conocida tiene datos y la siguiente está vacía (un solo values_batch_get).
+        """
+        title = a1_title(sheet.title)
+        ranges = [(start, end) for p, start, end in self.ranges if p == periodo]
+        metrics.api_call("sheets", "values_batch_get")
+        resp = doc.values_batch_get(
+            [f"{title}!A{start}:A{end}" for start, end in ranges] + [f"{title}!A{self.total}:A{self.total + 1}"],
+            params={"valueRenderOption": "UNFORMATTED_VALUE"},
+        )
+        value_ranges = resp.get("valueRanges", [])
+        if len(value_ranges) != len(ranges) + 1:
+            return False
+        for (start, end), value_range in zip(ranges, value_ranges):
+            values = value_range.get("values", [])
+            if len(values) != end - start + 1 or any(str(v[0] if v else "").strip() != periodo for v in values):
+                return False
+        tail = value_ranges[-1].get("values", [])
+        return len(tail) == 1 and bool(tail[0]) and str(tail[0][0]).strip() != ""
+
+    def delete(self, row_numbers: List[int]) -> None:
+        """Ajusta los tramos después de borrar esas filas (las de abajo suben)."""
+        deleted = sorted(row_numbers)
+        ranges = []
+        for periodo, start, end in self.ranges:
+            before = bisect_left(deleted, start)
+            inside = bisect_right(deleted, end) - before
+            if end - start + 1 > inside:
+                ranges.append([periodo, start - before, end - before - inside])
+        self.ranges = ranges
+        self.total -= len(deleted)
+
+    def append(self, periodo: str, n: int) -> None:
+        """Ajusta los tramos después de añadir n filas del periodo al final."""
+        if n <= 0:
+            return
+        if self.ranges and self.ranges[-1][0] == periodo and self.ranges[-1][2] == self.total:
+            self.ranges[-1][2] += n
+        else:
+            self.ranges.append([periodo, self.total + 1, self.total + n])
+        self.total += n
+
+
+def _sheet_fingerprints(doc, sheet, periodo: str, row_numbers: List[int], width: int) -> List[Tuple[int, str]]:
+    """(fila, huella) de esas filas, leyendo de la columna B a la última en un solo request."""
+    if not row_numbers:
+        return []
+    ranges = contiguous_ranges(row_numbers)
+    last = _col_letter(width)
+    metrics.api_call("sheets", "values_batch_get")
+    resp = doc.values_batch_get(
+        [f"{a1_title(sheet.title)}!B{start}:{last}{end}" for start, end in ranges],
+        # Fechas como número de serie, igual que las escribe sync.cells
+        params={"valueRenderOption": "UNFORMATTED_VALUE", "dateTimeRenderOption": "SERIAL_NUMBER"},
+    )
+    out = []
+    for (start, end), value_range in zip(ranges, resp.get("valueRanges", [])):
+        values = value_range.get("values", [])
+        for n in range(start, end + 1):
+            i = n - start
+            out.append((n, row_fingerprint(periodo, values[i] if i < len(values) else [])))
+    metrics.add_rows(len(out))
+    return out
+
+
+def _locate(located: List[Tuple[int, str]], removed: Counter) -> Optional[List[int]]:
+    """Filas de la hoja que corresponden a las huellas `removed`; None si falta alguna."""
+    pending = Counter(removed)
+    slots = []
+    for n, fp in located:
+        if pending[fp] > 0:
+            pending[fp] -= 1
+            slots.append(n)
+    return slots if len(slots) == sum(removed.values()) else None
+
+
+def _write_delta(
+    doc, sheet, slots: List[int], added: List[list], width: int, cancel: Optional[threading.Event] = None
+) -> Tuple[int, int, int]:
+    """
+    Las filas nuevas ocupan primero el lugar de las que ya no están (un rango por tramo
+    contiguo), las que sobran se añaden al final y los lugares que sobran se borran.
+    cancel se revisa antes de cada etapa y entre lotes.
+    Retorna (actualizadas, añadidas, borradas).
+    """
+    slots = sorted(slots)
+    by_row = {n: row + [""] * (width - len(row)) for n, row in zip(slots, added)}
+    if by_row:
+        data = [
+            {"range": f"A{start}", "values": [by_row[n] for n in range(start, end + 1)]}
+            for start, end in contiguous_ranges(sorted(by_row))
+        ]
+        sheets_writer.update_ranges(sheet, data, value_input_option="RAW", cancel=cancel)
+    leftover = slots[len(added):]
+    # Cortar acá no guarda las huellas: la corrida siguiente las reconstruye de la hoja
+    check_cancelled(cancel)
+    if leftover:
+        # De abajo hacia arriba para que los índices sigan siendo válidos
+        requests_body = [
+            delete_rows_request(sheet.id, start, end)
+            for start, end in reversed(contiguous_ranges(leftover))
+        ]
+        sheets_writer.call(doc.batch_update, {"requests": requests_body})
+    appended = 0
+    if len(added) > len(slots):
+        check_cancelled(cancel)
+        appended = sheets_writer.append_rows(sheet, added[len(slots):], value_input_option="RAW", cancel=cancel)
+    return len(by_row), appended, len(leftover)
+
+
+@metrics.instrumented("mano_obra")
+def sync_mano_obra(
+    sheet_id: Optional[str] = None,
+    folder_id: Optional[str] = None,
+    force: bool = False,
+    cancel: Optional[threading.Event] = None,
+    file_info: Optional[dict] = None,
+) -> dict:
+    """
+    Escribe el último CSV del mes de la carpeta Drive (o file_info, para el backfill) en el
+    Google Sheet de mano de obra: solo la diferencia con lo que la hoja ya tiene de ese
+    periodo, fila por fila según su huella (row_fingerprint). Si el archivo no cambió
+    desde el último sync no se hace nada, salvo force=True.
+    cancel: Event opcional; se revisa antes de cada escritura.
+    Retorna {"ok", "rows_written", "file_name", "error" opcional, "rows_updated",
+    "rows_appended", "rows_deleted", "rows_unchanged", "skipped", "resumed", "metrics"}.
     """
     sid = sheet_id or SHEET_ID_MANO_OBRA
     if not sid:
@@ -153,16 +430,12 @@ def sync_mano_obra(sheet_id: Optional[str] = None, folder_id: Optional[str] = No
             "error": "SHEET_ID_MANO_OBRA no configurado",
         }
 
-    creds = get_google_credentials()
-    if not creds:
-        return {
-            "ok": False,
-            "rows_written": 0,
-            "file_name": "",
-            "error": "Credenciales Google no configuradas",
-        }
+    try:
+        get_credentials()
+    except ValueError as e:
+        return {"ok": False, "rows_written": 0, "file_name": "", "error": str(e)}
 
-    info = get_latest_month_csv(folder_id)
+    info = file_info or get_latest_month_csv(folder_id)
     if not info:
         return {
             "ok": False,
@@ -171,46 +444,220 @@ def sync_mano_obra(sheet_id: Optional[str] = None, folder_id: Optional[str] = No
             "error": "No se encontró ningún CSV Costos_MM_YYYY en la carpeta",
         }
 
-    content = download_csv_file(info["id"])
-    headers, data_rows = parse_csv_content(content)
+    with spreadsheet_lock(sid):
+        periodo = f"{info['month']:02d}/{info['year']}"
+        # Mismo archivo que el último sync (manifiesto local, sync.state): nada que escribir
+        if not force and is_same_file(get_manifest(sid, periodo), info):
+            return {
+                "ok": True,
+                "rows_written": 0,
+                "file_name": info["name"],
+                "periodo": periodo,
+                "skipped": True,
+            }
 
-    import gspread
-    from google.oauth2.service_account import Credentials
+        # Con SYNC_CHECKPOINTS el CSV parseado y el avance del append quedan en un checkpoint:
+        # si la escritura falló a mitad, la corrida siguiente con el mismo archivo no vuelve
+        # a Drive ni a leer la hoja y añade solo los lotes que faltaban
+        scope = f"{sid}:{periodo}"
+        fetched_id = f"{info['id']}:{info.get('md5Checksum') or info.get('modifiedTime') or ''}"
+        cp = checkpoint.load("mano_obra", scope, fetched_id) if SYNC_CHECKPOINTS else None
+        resumed = cp is not None
 
-    scopes = [
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive",
-    ]
-    if isinstance(creds, dict):
-        credentials = Credentials.from_service_account_info(creds, scopes=scopes)
-    else:
-        credentials = Credentials.from_service_account_file(creds, scopes=scopes)
+        def open_csv() -> Tuple[List[str], Iterator[list]]:
+            """Headers y filas del CSV: del checkpoint si una corrida anterior lo guardó completo, si no de Drive."""
+            if cp is not None and cp.content_ref:
+                rows = cp.rows()
+                return next(rows, []), rows
+            return parse_csv_stream(iter_csv_file_chunks(info["id"]))
 
-    client = gspread.authorize(credentials)
-    doc = client.open_by_key(sid)
-    try:
-        sheet = doc.worksheet(SHEET_NAME_MANO_OBRA)
-    except gspread.WorksheetNotFound:
-        sheet = doc.add_worksheet(
-            title=SHEET_NAME_MANO_OBRA, rows=2000, cols=len(headers) + 2
-        )
-        sheet.append_row(["Periodo"] + headers)  # columna extra para mes/año
-
-    existing = sheet.get_all_values()
-    # Si está vacío o sin header, escribir header con columna Periodo
-    header_row = ["Periodo"] + headers
-    if not existing or existing[0] != header_row:
-        if not existing:
-            sheet.append_row(header_row)
-
-    # Añadir filas con periodo = MM/YYYY
-    periodo = f"{info['month']:02d}/{info['year']}"
-    new_rows = [[periodo] + row for row in data_rows]
-    sheet.append_rows(new_rows, value_input_option="USER_ENTERED")
-
-    return {
-        "ok": True,
-        "rows_written": len(new_rows),
-        "file_name": info["name"],
-        "periodo": periodo,
-    }
+        check_cancelled(cancel)
+        headers, data_rows = open_csv()
+        if not headers:
+            if cp is not None:
+                cp.clear()
+            return {"ok": True, "rows_written": 0, "file_name": info["name"], "periodo": periodo}
+        if cp is None and SYNC_CHECKPOINTS:
+            cp = checkpoint.start("mano_obra", scope, fetched_id)
+
+        import gspread
+
+        with metrics.stage("sheet_read"):
+            client = get_gspread_client()
+            metrics.api_call("sheets", "open_by_key")
+            doc = client.open_by_key(sid)
+            try:
+                metrics.api_call("sheets", "worksheet")
+                sheet = doc.worksheet(SHEET_NAME_MANO_OBRA)
+            except gspread.WorksheetNotFound:
+                sheet = None
+        if sheet is None:
+            sheet = sheets_writer.call(
+                doc.add_worksheet, title=SHEET_NAME_MANO_OBRA, rows=2000, cols=len(headers) + 2
+            )
+            sheets_writer.call(sheet.append_row, ["Periodo"] + headers)  # columna extra para mes/año
+
+        # Si está vacío, escribir header con columna Periodo (solo se lee la fila 1)
+        header_row = ["Periodo"] + headers
+        with metrics.stage("sheet_read"):
+            metrics.api_call("sheets", "row_values")
+            has_header = bool(sheet.row_values(1))
+        if not has_header:
+            sheets_writer.call(sheet.append_row, header_row)
+
+        # Filas del periodo (tramos guardados, verificados contra la hoja) y huellas de lo que
+        # tienen; si el estado no coincide con la hoja (hoja previa a las huellas, edición
+        # manual) se reconstruyen leyendo sus filas
+        width = len(header_row)
+        with metrics.stage("sheet_read"):
+            layout = SheetLayout.load(sid) if has_header else None
+            if layout is None or not layout.verify(doc, sheet, periodo):
+                layout = SheetLayout.scan(sheet)
+            positions = layout.rows(periodo)
+            old = Counter(get_row_fingerprints(sid, periodo))
+            # Append en streaming cortado a mitad: la hoja tiene justo los lotes confirmados
+            skip = cp.committed if cp is not None and cp.committed and not old and cp.committed == len(positions) else 0
+            located: Optional[List[Tuple[int, str]]] = None
+            if not skip and sum(old.values()) != len(positions):
+                located = _sheet_fingerprints(doc, sheet, periodo, positions, width)
+                old = Counter(fp for _, fp in located)
+
+        # El CSV parseado se guarda a medida que pasa: en el checkpoint (si no vino de ahí) y,
+        # sin checkpoints, cuando el periodo ya tiene filas, para poder recorrerlo otra vez
+        # si la hoja no coincide con las huellas sin volver a bajarlo
+        spool: Optional[checkpoint.RowSpool] = None
+        replay_ref = cp.content_ref if cp is not None else ""
+        if (cp is not None and not cp.content_ref) or (cp is None and old):
+            spool = checkpoint.RowSpool()
+            spool.add(headers)
+            data_rows = spool.tee(data_rows)
+
+        def save_spool() -> None:
+            """Si el CSV pasó completo por el spool queda como contenido del checkpoint."""
+            nonlocal spool, replay_ref
+            if spool is not None:
+                if spool.complete:
+                    replay_ref = spool.close()
+                    if cp is not None:
+                        cp.set_content(replay_ref)
+                else:
+                    spool.discard()
+                spool = None
+
+        # Filas con periodo = MM/YYYY; solo siguen las que la hoja no tiene
+        # Los totales del resumen (SHEETS_RESUMEN) y el snapshot de GET /costos
+        # (COSTOS_SNAPSHOT) se alimentan al pasar las filas y reemplazan los del periodo
+        totals = resumen.ManoObraTotals() if SHEETS_RESUMEN else None
+        load = snapshot.ManoObraLoad(sid, periodo) if COSTOS_SNAPSHOT else None
+        sinks = [s for s in (totals, load) if s is not None]
+        if sinks:
+            data_rows = _tee_into(data_rows, resumen.LaborColumns(headers, _idobr_index(headers)), sinks)
+        # Celdas tipadas (RAW, sync.cells): tipos inferidos una vez por archivo (idObr y
+        # Legajo siempre texto), números con formato local y fechas convertidos en bloque;
+        # resumen y snapshot ya recibieron el texto
+        typed = cells.TypedRows(data_rows, text_columns=text_columns(headers))
+        new_rows = ([periodo] + row for row in typed if row)
+        groups: Optional[Dict[str, List[list]]] = None
+        if SHEETS_PARTITION_BY_OBRA:
+            # Las filas del periodo se reemplazan también en las hojas por obra (idObr):
+            # necesitan las filas del mes agrupadas (se guardan en memoria)
+            groups = defaultdict(list)
+            new_rows = _tee_by_obra(new_rows, _idobr_index(headers) + 1, groups)
+        new: Counter = Counter()
+
+        def _not_in_sheet(rows: Iterable[list]) -> Iterator[list]:
+            for row in rows:
+                fp = row_fingerprint(periodo, row[1:])
+                new[fp] += 1
+                if new[fp] > old[fp]:
+                    yield row
+
+        # Los tramos guardados dejan de valer hasta que termine la escritura
+        SheetLayout.forget(sid)
+        updated = deleted = 0
+        if not old:
+            # Periodo vacío: todo es nuevo, se escribe en streaming a medida que se descarga
+            # y la memoria no crece con el archivo (al retomar, las primeras `skip` ya están)
+            pending = islice(_not_in_sheet(new_rows), skip, None)
+            try:
+                appended = sheets_writer.append_rows(
+                    sheet, pending, value_input_option="RAW", cancel=cancel,
+                    on_commit=cp.on_commit if cp is not None else None,
+                )
+            finally:
+                # Si el append falló a mitad el spool queda incompleto y se descarta (no se
+                # sigue bajando el CSV en una corrida que ya falló): la próxima vuelve a Drive
+                # y saltea las filas que el checkpoint tiene confirmadas
+                save_spool()
+            layout.append(periodo, appended)
+        else:
+            # Las filas iguales no se reescriben: las nuevas ocupan el lugar de las que ya no
+            # están en el archivo (_write_delta), así correr dos veces el mismo mes no duplica
+            try:
+                try:
+                    added = list(_not_in_sheet(new_rows))
+                finally:
+                    save_spool()
+                removed = old - new
+                slots: Optional[List[int]] = []
+                if removed:
+                    if located is None:
+                        with metrics.stage("sheet_read"):
+                            located = _sheet_fingerprints(doc, sheet, periodo, positions, width)
+                    slots = _locate(located, removed)
+                    if slots is None:
+                        # La hoja no coincide con las huellas: reemplazar el periodo completo
+                        # con las filas ya guardadas
+                        rows = checkpoint.read_rows(replay_ref)
+                        next(rows, None)  # headers
+                        added = [[periodo] + typed.types.convert(row) for row in rows if row]
+                        slots = positions
+            finally:
+                if cp is None and replay_ref:
+                    checkpoint.remove_rows(replay_ref)
+            check_cancelled(cancel)
+            updated, appended, deleted = _write_delta(doc, sheet, slots, added, width, cancel)
+            layout.delete(sorted(slots)[len(added):])
+            layout.append(periodo, appended)
+        written = updated + appended
+        date_patterns = typed.date_patterns(offset=1)  # columna A = Periodo
+        if written or skip:
+            cells.apply_date_formats(doc, sheet.id, date_patterns)
+        partitions = None
+        if groups is not None and (written or deleted):
+            partitions = write_partitions(
+                doc,
+                SHEET_NAME_MANO_OBRA,
+                header_row,
+                groups,
+                replace=lambda values: str(values[0]).strip() == periodo,
+                scan_all=True,
+                date_patterns=date_patterns,
+            )
+        layout.save(sid)
+        save_row_fingerprints(sid, periodo, new)
+        total = sum(new.values())
+        save_manifest(sid, periodo, info, total)
+        if cp is not None:
+            cp.clear()
+
+        out = {
+            "ok": True,
+            "rows_written": written,
+            "rows_updated": updated,
+            "rows_appended": appended,
+            "rows_deleted": deleted,
+            "rows_unchanged": total - written - skip,
+            "file_name": info["name"],
+            "periodo": periodo,
+        }
+        if resumed:
+            out["resumed"] = True
+            out["rows_already_appended"] = skip
+        if partitions is not None:
+            out["partitions"] = partitions
+        if totals is not None:
+            out["resumen"] = resumen.update_mano_obra(doc, sid, periodo, totals, headers)
+        if load is not None:
+            load.commit()
+        return out
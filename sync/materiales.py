@@ -4,29 +4,75 @@ Cada documento tiene CUENTA + DESCCUENTA = obra; el sheet se organiza por obra.
 """
 from __future__ import annotations
 
+import hashlib
+import json
 import ssl
+import threading
 import requests
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from itertools import islice
 from requests.adapters import HTTPAdapter
-from typing import List, Optional
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
 
 import urllib3
+from urllib3.util.retry import Retry
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
 from .config import (
+    COSTOS_SNAPSHOT,
+    MATERIALES_WRITE_MODE,
     REMITOS_API_URL,
+    REMITOS_BACKOFF,
     REMITOS_BEARER_TOKEN,
+    REMITOS_MAX_WORKERS,
+    REMITOS_INCREMENTAL,
+    REMITOS_RETRIES,
+    REMITOS_STREAM_CHUNK_BYTES,
+    REMITOS_STREAM_JSON,
+    REMITOS_TIMEOUT,
+    REMITOS_TRAILING_DAYS,
+    REMITOS_WINDOW_DAYS,
     SHEET_ID_MATERIALES,
-    get_google_credentials,
+    SHEETS_PARTITION_BY_OBRA,
+    SHEETS_RESUMEN,
+    SYNC_CHECKPOINTS,
+)
+from . import cells, checkpoint, metrics, resumen, snapshot
+from .archive import first_kept_month
+from .google_clients import get_credentials, get_gspread_client
+from .jsonstream import iter_array_items
+from .partitions import write_partitions
+from .runner import check_cancelled
+from .sheets_writer import contiguous_ranges, delete_rows_request, sheets_writer, spreadsheet_lock
+from .state import (
+    apply_remitos_delta,
+    get_cached_cuentas,
+    get_cached_remitos,
+    get_cached_rows,
+    get_cached_rows_by_cuenta,
+    get_meta,
+    set_meta,
 )
 
 # Moneda: 1 = pesos, 2 = dólares
 MONEDA_LABEL = {1: "Pesos", 2: "Dólares"}
 
+# TipoDoc, Serie, NroDoc y Cuenta: identificadores, siempre texto en la hoja (sync.cells)
+TEXT_COLUMNS = (1, 2, 3, 4)
+
 # Nombre de la hoja donde escribimos (una sola hoja con todos los documentos, columna Obra)
 SHEET_NAME_MATERIALES = "Materiales"
 
 
+def _cache_key(row) -> Tuple[str, str, str]:
+    return (row[1], row[2], row[3])
+
+
+def _row_hash(row) -> str:
+    return hashlib.sha1(json.dumps(row, default=str).encode("utf-8")).hexdigest()
+
+
 def _remitos_ssl_context() -> ssl.SSLContext:
     """Contexto SSL para API Remitos: TLS 1.0+ y sin verificación (servidor legacy)."""
     ctx = ssl.SSLContext(ssl.PROTOCOL_TLS_CLIENT)
@@ -44,57 +90,234 @@ class _TLSCompatAdapter(HTTPAdapter):
         return super().init_poolmanager(*args, **kwargs)
 
 
-def fetch_remitos(from_date: str, to_date: str) -> List[dict]:
+_session: Optional[requests.Session] = None
+_probe_session: Optional[requests.Session] = None
+_session_lock = threading.Lock()
+
+
+def _get_session() -> requests.Session:
     """
-    Llama a la API Remitos y devuelve la lista de documentos.
-    from_date / to_date: YYYY-MM-DD
-    El servidor Remitos puede usar TLS antiguo; usamos un adapter que lo permite.
+    Sesión HTTP persistente para la API Remitos (keep-alive, un pool de
+    REMITOS_MAX_WORKERS conexiones) con reintentos y backoff exponencial.
     """
-    if not REMITOS_BEARER_TOKEN:
-        raise ValueError("REMITOS_BEARER_TOKEN no configurado")
-    url = REMITOS_API_URL.strip()
+    global _session
+    with _session_lock:
+        if _session is None:
+            retry = Retry(
+                total=REMITOS_RETRIES,
+                connect=REMITOS_RETRIES,
+                read=REMITOS_RETRIES,
+                status=REMITOS_RETRIES,
+                backoff_factor=REMITOS_BACKOFF,
+                status_forcelist=(429, 500, 502, 503, 504),
+                allowed_methods=frozenset(["GET"]),
+                raise_on_status=False,
+            )
+            adapter = _TLSCompatAdapter(
+                pool_connections=1, pool_maxsize=max(1, REMITOS_MAX_WORKERS), max_retries=retry
+            )
+            session = requests.Session()
+            # Verificación desactivada en el adapter (CERT_NONE + check_hostname=False)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _session = session
+        return _session
+
+
+def _probe_get_session() -> requests.Session:
+    """Sesión para los health checks: mismo adapter TLS pero sin reintentos ni backoff."""
+    global _probe_session
+    with _session_lock:
+        if _probe_session is None:
+            session = requests.Session()
+            adapter = _TLSCompatAdapter(pool_connections=1, pool_maxsize=2, max_retries=0)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            _probe_session = session
+        return _probe_session
+
+
+def _window_url(api_url: str, from_date: str, to_date: str) -> str:
+    url = api_url.strip()
     if "?" in url:
         url += "&"
     else:
         url += "?"
-    url += f"fromDate={from_date}&toDate={to_date}"
-    session = requests.Session()
-    session.mount("https://", _TLSCompatAdapter())
-    # Verificación desactivada en el adapter (CERT_NONE + check_hostname=False)
-    resp = session.get(
-        url,
-        headers={"Authorization": f"Bearer {REMITOS_BEARER_TOKEN}"},
-        timeout=10,
+    return url + f"fromDate={from_date}&toDate={to_date}"
+
+
+def ping_remitos(api_url: Optional[str] = None, token: Optional[str] = None, timeout: float = REMITOS_TIMEOUT) -> int:
+    """
+    Request mínimo a la API Remitos para los health checks: el rango de un solo día, sin
+    reintentos y sin leer el cuerpo (alcanza con el status para saber que responde y que
+    el token sirve). Retorna el status HTTP; excepción si no conecta o no es 2xx.
+    """
+    api_url = api_url or REMITOS_API_URL
+    token = token if token is not None else REMITOS_BEARER_TOKEN
+    if not token:
+        raise ValueError("REMITOS_BEARER_TOKEN no configurado")
+    today = date.today().isoformat()
+    with _probe_get_session().get(
+        _window_url(api_url, today, today),
+        headers={"Authorization": f"Bearer {token}"},
+        timeout=timeout,
+        stream=True,
+    ) as resp:
+        resp.raise_for_status()
+        return resp.status_code
+
+
+def _date_windows(from_date: str, to_date: str, days: int) -> List[Tuple[str, str]]:
+    """
+    Parte from_date..to_date en ventanas de `days` días. Las ventanas se solapan en
+    su día límite (sirve tanto si toDate es inclusivo como exclusivo); el merge deduplica.
+    """
+    start = datetime.strptime(from_date, "%Y-%m-%d").date()
+    end = datetime.strptime(to_date, "%Y-%m-%d").date()
+    if days <= 0 or end <= start:
+        return [(from_date, to_date)]
+    windows = []
+    while True:
+        stop = min(start + timedelta(days=days), end)
+        windows.append((start.isoformat(), stop.isoformat()))
+        if stop >= end:
+            return windows
+        start = stop
+
+
+def _doc_key(d: dict) -> Tuple[str, str, str]:
+    return (
+        str(d.get("TIPDOCUM") or "").strip(),
+        str(d.get("SERIEDOCUM") or "").strip(),
+        str(d.get("NRODOCUM") or "").strip(),
+    )
+
+
+def _iter_window(from_date: str, to_date: str, api_url: str, token: str) -> Iterator[dict]:
+    """
+    Un request a la API Remitos para una ventana de fechas; entrega los documentos.
+    Con REMITOS_STREAM_JSON el cuerpo se lee y decodifica por chunks, de a un documento.
+    """
+    with _get_session().get(
+        _window_url(api_url, from_date, to_date),
+        headers={"Authorization": f"Bearer {token}"},
+        timeout=REMITOS_TIMEOUT,
+        stream=REMITOS_STREAM_JSON,
+    ) as resp:
+        metrics.api_call("remitos", "GET")
+        resp.raise_for_status()
+        if not REMITOS_STREAM_JSON:
+            metrics.add_bytes(len(resp.content))
+            yield from resp.json().get("documentos") or []
+            return
+
+        def chunks() -> Iterator[bytes]:
+            for chunk in resp.iter_content(REMITOS_STREAM_CHUNK_BYTES):
+                metrics.add_bytes(len(chunk))
+                yield chunk
+
+        yield from iter_array_items(chunks(), "documentos", resp.encoding or "utf-8")
+
+
+def _fetch_window(from_date: str, to_date: str, api_url: str, token: str) -> List[dict]:
+    return list(_iter_window(from_date, to_date, api_url, token))
+
+
+def _fetch_window_rows(from_date: str, to_date: str, api_url: str, token: str) -> List["RemitoRow"]:
+    """Como _fetch_window pero convierte cada documento a fila apenas se decodifica."""
+    return [documento_to_row(d) for d in _iter_window(from_date, to_date, api_url, token)]
+
+
+def _fetch_windows(
+    from_date: str, to_date: str, fetch, api_url: Optional[str] = None, token: Optional[str] = None
+) -> List[list]:
+    """Resultado de fetch(desde, hasta, api_url, token) para cada ventana del rango, en paralelo."""
+    api_url = api_url or REMITOS_API_URL
+    token = token if token is not None else REMITOS_BEARER_TOKEN
+    if not token:
+        raise ValueError("REMITOS_BEARER_TOKEN no configurado")
+    windows = _date_windows(from_date, to_date, REMITOS_WINDOW_DAYS)
+    if len(windows) == 1:
+        return [fetch(*windows[0], api_url, token)]
+    workers = max(1, min(REMITOS_MAX_WORKERS, len(windows)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="remitos") as ex:
+        return list(ex.map(metrics.wrap(lambda w: fetch(*w, api_url, token)), windows))
+
+
+def fetch_remitos(
+    from_date: str, to_date: str, api_url: Optional[str] = None, token: Optional[str] = None
+) -> List[dict]:
+    """
+    Llama a la API Remitos y devuelve la lista de documentos.
+    from_date / to_date: YYYY-MM-DD
+    api_url / token: endpoint y bearer token; por defecto REMITOS_API_URL / REMITOS_BEARER_TOKEN.
+    El rango se parte en ventanas de REMITOS_WINDOW_DAYS días que se piden en paralelo
+    (hasta REMITOS_MAX_WORKERS) sobre una misma sesión keep-alive; los documentos se
+    deduplican por (TIPDOCUM, SERIEDOCUM, NRODOCUM). Si una ventana falla tras los
+    reintentos falla todo el fetch (un mes incompleto borraría filas en el upsert).
+    El servidor Remitos puede usar TLS antiguo; usamos un adapter que lo permite.
+    """
+    merged = {}
+    for documentos in _fetch_windows(from_date, to_date, _fetch_window, api_url, token):
+        for d in documentos:
+            merged[_doc_key(d)] = d
+    return list(merged.values())
+
+
+def fetch_remitos_rows(
+    from_date: str, to_date: str, api_url: Optional[str] = None, token: Optional[str] = None
+) -> List["RemitoRow"]:
+    """
+    Como fetch_remitos pero devuelve directamente las filas del Sheet (RemitoRow).
+    Cada documento se convierte al decodificarse, así que nunca están en memoria a la
+    vez el cuerpo de la respuesta, los dicts de los documentos y las filas.
+    """
+    merged: Dict[Tuple[str, str, str], RemitoRow] = {}
+    for rows in _fetch_windows(from_date, to_date, _fetch_window_rows, api_url, token):
+        for row in rows:
+            merged[_cache_key(row)] = row
+    return list(merged.values())
+
+
+class RemitoRow(NamedTuple):
+    """Fila de la hoja Materiales (tupla: se serializa igual que la lista de columnas)."""
+
+    fecha: str
+    tipdoc: str
+    serie: str
+    nrodoc: str
+    cuenta: str
+    obra: str  # DESCCUENTA
+    direccion: str
+    total: Any
+    moneda: str
+
+
+def documento_to_row(d: dict) -> RemitoRow:
+    """Convierte un documento de la API en la fila del Sheet."""
+    fecha = d.get("FECHA") or ""
+    if fecha and "T" in str(fecha):
+        fecha = str(fecha).split("T")[0]
+    moneda = d.get("MONEDA", 0)
+    return RemitoRow(
+        fecha,
+        (d.get("TIPDOCUM") or "").strip(),
+        (d.get("SERIEDOCUM") or "").strip(),
+        (d.get("NRODOCUM") or "").strip(),
+        (d.get("CUENTA") or "").strip(),
+        (d.get("DESCCUENTA") or "").strip(),
+        (d.get("DIRCUENTA") or "").strip(),
+        d.get("TOTAL"),
+        MONEDA_LABEL.get(moneda, str(moneda)),
     )
-    resp.raise_for_status()
-    data = resp.json()
-    documentos = data.get("documentos") or []
-    return documentos
 
 
-def documentos_to_rows(documentos: List[dict]) -> List[list]:
+def documentos_to_rows(documentos: Iterable[dict]) -> List[RemitoRow]:
     """
     Convierte documentos API en filas para el Sheet.
     Incluye columna Obra (DESCCUENTA) y Cuenta para separación por obra.
     """
-    rows = []
-    for d in documentos:
-        fecha = d.get("FECHA") or ""
-        if fecha and "T" in str(fecha):
-            fecha = str(fecha).split("T")[0]
-        moneda = d.get("MONEDA", 0)
-        rows.append([
-            fecha,
-            (d.get("TIPDOCUM") or "").strip(),
-            (d.get("SERIEDOCUM") or "").strip(),
-            (d.get("NRODOCUM") or "").strip(),
-            (d.get("CUENTA") or "").strip(),
-            (d.get("DESCCUENTA") or "").strip(),  # Obra
-            (d.get("DIRCUENTA") or "").strip(),
-            d.get("TOTAL"),
-            MONEDA_LABEL.get(moneda, str(moneda)),
-        ])
-    return rows
+    return [documento_to_row(d) for d in documentos]
 
 
 def get_headers_materiales() -> List[str]:
@@ -111,58 +334,349 @@ def get_headers_materiales() -> List[str]:
     ]
 
 
-def sync_materiales(from_date: str, to_date: str, sheet_id: Optional[str] = None) -> dict:
+def _key_part(value) -> str:
+    """Normaliza una parte de la clave: el Sheet puede devolver "000123" como 123 o 123.0."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    s = str(value if value is not None else "").strip()
+    if s.isdigit():
+        s = s.lstrip("0") or "0"
+    return s
+
+
+def _row_key(row) -> Tuple[str, str, str]:
+    """Clave de upsert (TipoDoc, Serie, NroDoc) de una fila del Sheet."""
+    return (_key_part(row[1]), _key_part(row[2]), _key_part(row[3]))
+
+
+def _fecha_iso(value) -> str:
+    """Fecha leída del Sheet (serial, ISO o DD/MM/YYYY) → YYYY-MM-DD."""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return (date(1899, 12, 30) + timedelta(days=int(value))).isoformat()
+    s = str(value or "").strip()
+    if "T" in s:
+        s = s.split("T")[0]
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(s, fmt).date().isoformat()
+        except ValueError:
+            continue
+    return s
+
+
+def _upsert_materiales(
+    doc,
+    sheet,
+    rows: List[list],
+    from_date: Optional[str] = None,
+    to_date: Optional[str] = None,
+    delete_keys: Iterable[Tuple[str, str, str]] = (),
+    cp: Optional[checkpoint.Checkpoint] = None,
+    types: Optional[cells.ColumnTypes] = None,
+    cancel: Optional[threading.Event] = None,
+) -> dict:
+    """
+    Upsert por clave (TipoDoc, Serie, NroDoc). Solo se leen las columnas clave (A:D):
+    las filas cuya clave viene en `rows` se actualizan en su lugar, el resto se añade.
+    Con from_date/to_date se reemplaza el rango completo (se borran las filas del rango
+    que no vienen en `rows`); delete_keys borra además esas claves puntuales.
+    cp: checkpoint de la corrida; si ya tiene el append empezado (la corrida anterior
+    falló a mitad) actualizaciones y borrados ya están hechos y solo se añade lo que falta.
+    types: tipos de las columnas (sync.cells); por defecto se infieren de `rows`.
+    cancel: se revisa antes de cada etapa (actualizar, borrar, añadir) y entre lotes.
+    """
+    if cp is not None and cp.append_ref:
+        return _resume_append(sheet, cp, cancel)
+    if types is None:
+        types = cells.ColumnTypes.infer(islice(rows, cells.SAMPLE_ROWS), TEXT_COLUMNS)
+    incoming = {}
+    for r in rows:
+        incoming.setdefault(_row_key(r), r)
+    to_delete = {tuple(_key_part(p) for p in k) for k in delete_keys}
+    in_window = (
+        (lambda fecha: from_date <= _fecha_iso(fecha) <= to_date)
+        if from_date and to_date
+        else (lambda fecha: False)
+    )
+
+    with metrics.stage("sheet_read"):
+        metrics.api_call("sheets", "values_get")
+        existing = sheet.get(
+            "A2:D",
+            value_render_option="UNFORMATTED_VALUE",
+            date_time_render_option="SERIAL_NUMBER",
+        )
+        metrics.add_rows(len(existing))
+    updates: List[Tuple[int, list]] = []
+    deletes: List[int] = []
+    seen = set()
+    for i, values in enumerate(existing):
+        values = list(values) + [""] * (4 - len(values))
+        if not any(str(v).strip() for v in values):
+            continue
+        row_number = i + 2  # fila 1 = headers
+        key = _row_key(values)
+        if key in incoming and key not in seen:
+            seen.add(key)
+            updates.append((row_number, incoming[key]))
+        elif key in seen or key in to_delete or in_window(values[0]):
+            # Duplicado de un documento ya ubicado, o documento que ya no existe
+            deletes.append(row_number)
+
+    last_col = chr(ord("A") + len(get_headers_materiales()) - 1)
+    check_cancelled(cancel)
+    if updates:
+        data = []
+        by_row = dict(updates)
+        for start, end in contiguous_ranges(sorted(by_row)):
+            data.append({
+                "range": f"A{start}:{last_col}{end}",
+                "values": [types.convert(by_row[n]) for n in range(start, end + 1)],
+            })
+        sheets_writer.update_ranges(sheet, data, value_input_option="RAW", cancel=cancel)
+
+    # Cortar acá deja el Sheet como estaba más las filas actualizadas: la corrida siguiente
+    # (cache sin actualizar) vuelve a calcular el mismo upsert
+    check_cancelled(cancel)
+    if deletes:
+        # De abajo hacia arriba para que los índices sigan siendo válidos
+        requests_body = [
+            delete_rows_request(sheet.id, start, end)
+            for start, end in reversed(contiguous_ranges(deletes))
+        ]
+        sheets_writer.call(doc.batch_update, {"requests": requests_body})
+
+    check_cancelled(cancel)
+    new_rows = [types.convert(r) for k, r in incoming.items() if k not in seen]
+    if new_rows:
+        _append_new_rows(sheet, new_rows, cp, cancel)
+
+    return {
+        "ok": True,
+        "rows_written": len(updates) + len(new_rows),
+        "rows_updated": len(updates),
+        "rows_appended": len(new_rows),
+        "rows_deleted": len(deletes),
+    }
+
+
+def _append_new_rows(
+    sheet, rows: List, cp: Optional[checkpoint.Checkpoint], cancel: Optional[threading.Event] = None
+) -> int:
+    """append_rows que, con checkpoint, guarda antes las filas y registra cada lote confirmado."""
+    if cp is None:
+        return sheets_writer.append_rows(sheet, rows, value_input_option="RAW", cancel=cancel)
+    cp.set_append(rows)
+    return sheets_writer.append_rows(sheet, rows, value_input_option="RAW", cancel=cancel, on_commit=cp.on_commit)
+
+
+def _resume_append(sheet, cp: checkpoint.Checkpoint, cancel: Optional[threading.Event] = None) -> dict:
+    """Añade las filas del checkpoint que la corrida anterior no llegó a confirmar."""
+    done = cp.committed
+    appended = sheets_writer.append_rows(
+        sheet, cp.pending_append(), value_input_option="RAW", cancel=cancel, on_commit=cp.on_commit
+    )
+    return {"ok": True, "rows_written": appended, "rows_appended": appended, "rows_already_appended": done}
+
+
+@metrics.instrumented("materiales")
+def sync_materiales(
+    from_date: str,
+    to_date: str,
+    sheet_id: Optional[str] = None,
+    cancel: Optional[threading.Event] = None,
+    incremental: bool = REMITOS_INCREMENTAL,
+    api_url: Optional[str] = None,
+    token: Optional[str] = None,
+) -> dict:
     """
     Obtiene remitos del rango de fechas y escribe/actualiza el Google Sheet de materiales.
     sheet_id: opcional; si no se pasa usa SHEET_ID_MATERIALES.
-    Retorna {"ok": bool, "rows_written": int, "error": str opcional}.
+    api_url / token: endpoint Remitos del target; por defecto los de la configuración.
+    incremental: con un cache local previo (sync.state) solo se piden los últimos
+    REMITOS_TRAILING_DAYS días antes del high-water mark y solo se escriben los
+    documentos nuevos, cambiados o borrados. Con False se reemplaza el rango completo.
+    cancel: Event opcional; se revisa antes de cada escritura.
+    El rango empieza como mucho en archive.first_kept_month: los meses archivados no se
+    escriben ("archived": True si no queda nada del rango).
+    Retorna {"ok": bool, "rows_written": int, "error": str opcional, "metrics": desglose por etapa}.
     """
     sid = sheet_id or SHEET_ID_MATERIALES
     if not sid:
         return {"ok": False, "rows_written": 0, "error": "SHEET_ID_MATERIALES no configurado"}
 
-    creds = get_google_credentials()
-    if not creds:
-        return {"ok": False, "rows_written": 0, "error": "Credenciales Google no configuradas"}
+    try:
+        get_credentials()
+    except ValueError as e:
+        return {"ok": False, "rows_written": 0, "error": str(e)}
+
+    # Los meses ya archivados (o anteriores al corte de SHEETS_RETENTION_MONTHS) no se
+    # vuelven a escribir en la hoja: un backfill o un sync completo del rango no deshace el archivo
+    first_kept = first_kept_month("materiales", sid)
+    if first_kept and from_date[:7] < first_kept:
+        if to_date[:7] < first_kept:
+            return {"ok": True, "rows_written": 0, "skipped": True, "archived": True}
+        from_date = f"{first_kept}-01"
 
-    import gspread
-    from google.oauth2.service_account import Credentials
+    hwm_key = f"remitos_hwm:{sid}"
+    hwm = get_meta(hwm_key) if incremental else None
+    full = hwm is None
+    fetch_from = from_date
+    if not full:
+        trailing = (datetime.strptime(hwm, "%Y-%m-%d").date() - timedelta(days=REMITOS_TRAILING_DAYS)).isoformat()
+        fetch_from = max(from_date, min(trailing, to_date))
 
-    scopes = [
-        "https://www.googleapis.com/auth/spreadsheets",
-        "https://www.googleapis.com/auth/drive",
-    ]
-    if isinstance(creds, dict):
-        credentials = Credentials.from_service_account_info(creds, scopes=scopes)
+    scope = f"{sid}:{from_date}:{to_date}"
+    fetched_id = f"{fetch_from}:{to_date}:{'full' if full else 'incremental'}:{MATERIALES_WRITE_MODE}"
+    # Con SYNC_CHECKPOINTS las filas pedidas y el avance del append quedan en un checkpoint:
+    # si la corrida falla a mitad, la siguiente para el mismo rango no vuelve a llamar a
+    # Remitos y añade solo los lotes que faltaban ("resumed": True)
+    cp = checkpoint.load("materiales", scope, fetched_id) if SYNC_CHECKPOINTS else None
+    if cp is not None:
+        # Corrida anterior interrumpida: las mismas filas, sin volver a llamar a Remitos
+        rows = [RemitoRow(*r) for r in cp.rows()]
     else:
-        credentials = Credentials.from_service_account_file(creds, scopes=scopes)
+        with metrics.stage("remitos_fetch"):
+            # Decodificación y conversión a filas van dentro del fetch (documento por documento)
+            rows = fetch_remitos_rows(fetch_from, to_date, api_url, token)
+            metrics.add_rows(len(rows))
 
-    client = gspread.authorize(credentials)
-    doc = client.open_by_key(sid)
-    try:
-        sheet = doc.worksheet(SHEET_NAME_MATERIALES)
-    except gspread.WorksheetNotFound:
-        sheet = doc.add_worksheet(title=SHEET_NAME_MATERIALES, rows=1000, cols=len(get_headers_materiales()))
-        sheet.append_row(get_headers_materiales())
-
-    documentos = fetch_remitos(from_date, to_date)
-    rows = documentos_to_rows(documentos)
-    if not rows:
-        return {"ok": True, "rows_written": 0}
-
-    # Si la primera fila no son headers, insertar headers
-    existing = sheet.get_all_values()
-    if not existing or existing[0] != get_headers_materiales():
-        sheet.clear()
-        sheet.append_row(get_headers_materiales())
-    sheet.append_rows(rows, value_input_option="USER_ENTERED")
-    return {"ok": True, "rows_written": len(rows)}
-
-
-def run_sync_materiales_month(year: int, month: int, sheet_id: Optional[str] = None) -> dict:
+    with spreadsheet_lock(sid):
+        # Diff contra el cache: solo lo nuevo/cambiado sigue hacia el Sheet
+        with metrics.stage("cache_diff"):
+            cached = get_cached_remitos(sid, fetch_from, to_date)
+            fetched = {}
+            for r in rows:
+                fetched[_cache_key(r)] = (r, _row_hash(r))
+            changed = [(k, r, h) for k, (r, h) in fetched.items() if cached.get(k) != h]
+            # Un fetch incremental vacío con documentos en el cache es más probable que sea
+            # una respuesta vacía o cortada de Remitos que el borrado de toda la ventana
+            deleted = [k for k in cached if k not in fetched] if fetched or full else []
+            metrics.add_rows(len(changed) + len(deleted))
+        result_extra = {"incremental": not full, "fetched_from": fetch_from, "documents_fetched": len(fetched)}
+        if cp is not None:
+            result_extra["resumed"] = True
+
+        if (not rows and full) or (not changed and not deleted and not full):
+            if cp is not None:
+                cp.clear()
+            if not full:
+                result_extra["skipped"] = True
+            return {"ok": True, "rows_written": 0, **result_extra}
+        check_cancelled(cancel)
+        if cp is None and SYNC_CHECKPOINTS:
+            cp = checkpoint.start("materiales", scope, fetched_id, checkpoint.write_rows(rows))
+        # Celdas tipadas (RAW, sync.cells): Fecha como fecha de Sheets, Total como número;
+        # tipos inferidos una vez por fetch. Cache, resumen y snapshot siguen con las filas de la API
+        types = cells.ColumnTypes.infer(islice(rows, cells.SAMPLE_ROWS), TEXT_COLUMNS)
+
+        import gspread
+
+        with metrics.stage("sheet_read"):
+            client = get_gspread_client()
+            metrics.api_call("sheets", "open_by_key")
+            doc = client.open_by_key(sid)
+            try:
+                metrics.api_call("sheets", "worksheet")
+                sheet = doc.worksheet(SHEET_NAME_MATERIALES)
+            except gspread.WorksheetNotFound:
+                sheet = None
+        if sheet is None:
+            sheet = sheets_writer.call(
+                doc.add_worksheet, title=SHEET_NAME_MATERIALES, rows=1000, cols=len(get_headers_materiales())
+            )
+            sheets_writer.call(sheet.append_row, get_headers_materiales())
+
+        # Si la primera fila no son headers, insertar headers (solo se lee la fila 1)
+        with metrics.stage("sheet_read"):
+            metrics.api_call("sheets", "row_values")
+            header_ok = sheet.row_values(1) == get_headers_materiales()
+        if not header_ok:
+            sheets_writer.call(sheet.clear, idempotent=True)
+            sheets_writer.call(sheet.append_row, get_headers_materiales())
+        # upsert (default) reemplaza solo las filas del rango; "append" añade todas las filas
+        if MATERIALES_WRITE_MODE == "upsert":
+            if full:
+                result = _upsert_materiales(
+                    doc, sheet, [r for r, _ in fetched.values()], fetch_from, to_date, cp=cp, types=types,
+                    cancel=cancel,
+                )
+            else:
+                result = _upsert_materiales(
+                    doc, sheet, [r for _, r, _ in changed], delete_keys=deleted, cp=cp, types=types,
+                    cancel=cancel,
+                )
+        elif cp is not None and cp.append_ref:
+            result = _resume_append(sheet, cp, cancel)
+        else:
+            # append: en modo incremental solo los documentos que el Sheet todavía no tiene
+            new_rows = [types.convert(r) for r in (rows if full else [r for k, r, _ in changed if k not in cached])]
+            if new_rows:
+                _append_new_rows(sheet, new_rows, cp, cancel)
+            result = {"ok": True, "rows_written": len(new_rows)}
+        if result["rows_written"] or result.get("rows_already_appended"):
+            cells.apply_date_formats(doc, sheet.id, types.date_patterns())
+
+        # Filas que tenía el cache de los remitos que cambian: se restan del resumen
+        before = get_cached_rows(sid, [k for k, _, _ in changed] + deleted) if SHEETS_RESUMEN else {}
+        groups: Dict[str, List[list]] = {}
+        if SHEETS_PARTITION_BY_OBRA:
+            # Hojas por obra afectadas: las de los documentos nuevos/cambiados y las que tenían
+            # antes (un documento que cambió de obra o se borró solo se quita de su hoja)
+            groups = {c: [] for c in get_cached_cuentas(sid, [k for k, _, _ in changed] + deleted)}
+            for _, r, _ in changed:
+                groups.setdefault(str(r[4]), []).append(types.convert(r))
+        with metrics.stage("cache_write"):
+            apply_remitos_delta(sid, ((k, r[0], r, h) for k, r, h in changed), deleted)
+        if groups:
+            # En cada hoja de obra se borran y se vuelven a añadir solo los documentos del
+            # delta; una hoja que todavía no existe se arma con las filas de la obra del cache
+            affected = {_row_key(r) for _, r, _ in changed} | {tuple(_key_part(p) for p in k) for k in deleted}
+            result["partitions"] = write_partitions(
+                doc,
+                SHEET_NAME_MATERIALES,
+                get_headers_materiales(),
+                groups,
+                replace=lambda values: _row_key(values) in affected,
+                key_columns=4,
+                date_patterns=types.date_patterns(),
+                full_rows=lambda cuenta: [
+                    types.convert(r) for r in get_cached_rows_by_cuenta(sid, [cuenta])[str(cuenta)]
+                ],
+            )
+        if SHEETS_RESUMEN:
+            # Totales de la hoja Resumen: se restan las filas anteriores y se suman las nuevas
+            result["resumen"] = resumen.update_materiales(doc, sid, before.values(), [r for _, r, _ in changed])
+        if COSTOS_SNAPSHOT:
+            # Snapshot local que sirve GET /costos
+            snapshot.update_materiales(sid, [r for _, r, _ in changed], deleted)
+        if rows:
+            # Contra lo guardado, no contra `hwm` (None con incremental=False: backfill de
+            # meses viejos) para que el high-water mark nunca retroceda
+            newest = max(str(r[0]) for r in rows)
+            stored = get_meta(hwm_key)
+            if stored is None or newest > stored:
+                set_meta(hwm_key, newest)
+        if cp is not None:
+            cp.clear()
+        result.update(result_extra)
+        return result
+
+
+def run_sync_materiales_month(
+    year: int,
+    month: int,
+    sheet_id: Optional[str] = None,
+    cancel: Optional[threading.Event] = None,
+    incremental: bool = REMITOS_INCREMENTAL,
+    api_url: Optional[str] = None,
+    token: Optional[str] = None,
+) -> dict:
     """Helper: sincroniza un mes completo (primer y último día)."""
     from calendar import monthrange
     last = monthrange(year, month)[1]
     from_date = f"{year}-{month:02d}-01"
     to_date = f"{year}-{month:02d}-{last}"
-    return sync_materiales(from_date, to_date, sheet_id)
+    return sync_materiales(
+        from_date, to_date, sheet_id, cancel=cancel, incremental=incremental, api_url=api_url, token=token
+    )
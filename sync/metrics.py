@@ -0,0 +1,154 @@
+"""
+Instrumentación de los syncs: tiempo, bytes, filas y llamadas a APIs por etapa.
+- Cada sync junta su desglose en un RunMetrics (se devuelve en el JSON de /sync).
+- Los mismos valores se acumulan en métricas Prometheus (GET /metrics).
+La fuente y la etapa actuales viajan en contextvars; para hilos auxiliares usar wrap().
+"""
+from __future__ import annotations
+
+import contextvars
+import functools
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, Optional
+
+from prometheus_client import Counter, Gauge, Histogram
+
+STAGE_SECONDS = Histogram(
+    "pluril_sync_stage_seconds",
+    "Duración de cada etapa (o tramo de etapa) del sync",
+    ["source", "stage"],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+RUN_SECONDS = Histogram(
+    "pluril_sync_run_seconds",
+    "Duración total de cada sync por fuente",
+    ["source"],
+    buckets=(0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600),
+)
+RUNS = Counter("pluril_sync_runs_total", "Syncs ejecutados", ["source", "result"])
+API_CALLS = Counter("pluril_sync_api_calls_total", "Llamadas a APIs externas", ["source", "api", "method"])
+BYTES = Counter("pluril_sync_bytes_total", "Bytes descargados por etapa", ["source", "stage"])
+ROWS = Counter("pluril_sync_rows_total", "Filas procesadas por etapa", ["source", "stage"])
+WARMUP_SECONDS = Gauge("pluril_warmup_seconds", "Duración de cada paso del warm-up del worker", ["step"])
+
+_run: contextvars.ContextVar[Optional["RunMetrics"]] = contextvars.ContextVar("sync_run", default=None)
+_stage: contextvars.ContextVar[str] = contextvars.ContextVar("sync_stage", default="otro")
+
+
+class RunMetrics:
+    """Desglose de un sync: {etapa: {"seconds", "api_calls", "bytes", "rows"}}."""
+
+    def __init__(self, source: str):
+        self.source = source
+        self.stages: Dict[str, Dict[str, float]] = {}
+        self.total_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, **values: float) -> None:
+        with self._lock:
+            entry = self.stages.setdefault(
+                stage, {"seconds": 0.0, "api_calls": 0, "bytes": 0, "rows": 0}
+            )
+            for key, value in values.items():
+                entry[key] += value
+
+    def as_dict(self) -> dict:
+        with self._lock:
+            return {
+                "total_seconds": round(self.total_seconds, 3),
+                "stages": {
+                    name: {k: round(v, 3) if k == "seconds" else int(v) for k, v in entry.items()}
+                    for name, entry in self.stages.items()
+                },
+            }
+
+
+def _source() -> str:
+    run = _run.get()
+    return run.source if run is not None else "otro"
+
+
+@contextmanager
+def collect(source: str) -> Iterator[RunMetrics]:
+    """Abre el desglose de un sync de `source`; todo lo registrado dentro se le suma."""
+    run = RunMetrics(source)
+    token = _run.set(run)
+    start = time.monotonic()
+    result = "error"
+    try:
+        yield run
+        result = "ok"
+    finally:
+        run.total_seconds = time.monotonic() - start
+        RUN_SECONDS.labels(source).observe(run.total_seconds)
+        RUNS.labels(source, result).inc()
+        _run.reset(token)
+
+
+def instrumented(source: str) -> Callable:
+    """Decorador para un sync: lo corre dentro de collect() y agrega "metrics" a su resultado."""
+
+    def decorator(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with collect(source) as run:
+                result = fn(*args, **kwargs)
+            if isinstance(result, dict):
+                result["metrics"] = run.as_dict()
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    """Mide una etapa; las llamadas/bytes/filas registradas dentro se le atribuyen."""
+    token = _stage.set(name)
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        add_time(name, time.monotonic() - start)
+        _stage.reset(token)
+
+
+def add_time(stage_name: str, seconds: float) -> None:
+    """Suma tiempo a una etapa (para etapas intercaladas, p. ej. descarga en streaming)."""
+    STAGE_SECONDS.labels(_source(), stage_name).observe(seconds)
+    run = _run.get()
+    if run is not None:
+        run.add(stage_name, seconds=seconds)
+
+
+def api_call(api: str, method: str, count: int = 1, stage_name: Optional[str] = None) -> None:
+    """Registra llamadas a una API externa (remitos, drive, sheets)."""
+    API_CALLS.labels(_source(), api, method).inc(count)
+    run = _run.get()
+    if run is not None:
+        run.add(stage_name or _stage.get(), api_calls=count)
+
+
+def add_bytes(n: int, stage_name: Optional[str] = None) -> None:
+    stage_name = stage_name or _stage.get()
+    BYTES.labels(_source(), stage_name).inc(n)
+    run = _run.get()
+    if run is not None:
+        run.add(stage_name, bytes=n)
+
+
+def add_rows(n: int, stage_name: Optional[str] = None) -> None:
+    stage_name = stage_name or _stage.get()
+    ROWS.labels(_source(), stage_name).inc(n)
+    run = _run.get()
+    if run is not None:
+        run.add(stage_name, rows=n)
+
+
+def wrap(fn: Callable) -> Callable:
+    """Envuelve fn para que corra con el contexto actual (fuente/etapa) en otro hilo."""
+    ctx = contextvars.copy_context()
+    return lambda *args, **kwargs: ctx.copy().run(fn, *args, **kwargs)
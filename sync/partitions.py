@@ -0,0 +1,159 @@
+"""
+Salida particionada por obra: además de la hoja principal, cada obra (CUENTA en
+materiales, idObr en mano de obra) tiene su propia hoja "<hoja> - <obra>", así AppSheet
+carga una tabla chica en vez de filtrar toda la historia.
+Por spreadsheet se hace una lectura de metadata, una lectura de las columnas clave de las
+hojas afectadas, un único batch_update (altas, borrados, filas extra) y un único
+values_batch_update con los valores de todas las hojas. Las filas llegan tipadas
+(sync.cells) y el formato de las columnas de fecha va en el mismo batch_update, solo para
+las hojas nuevas y las columnas que todavía no lo tienen.
+"""
+from __future__ import annotations
+
+import re
+from typing import Callable, Dict, List, Optional
+
+from . import metrics
+from .cells import date_format_requests, pending_date_formats, remember_date_formats
+from .sheets_writer import contiguous_ranges, delete_rows_request, sheets_writer
+
+# Filas libres extra al crear o agrandar una hoja de partición
+ROW_MARGIN = 100
+
+
+def partition_title(base_title: str, key) -> str:
+    """Título de la hoja de una obra (sin caracteres problemáticos, máx. 100)."""
+    clean = re.sub(r"[\[\]*?/\\:']", " ", str(key or "")).strip() or "sin obra"
+    return f"{base_title} - {clean}"[:100]
+
+
+def a1_title(title: str) -> str:
+    return "'" + title.replace("'", "''") + "'"
+
+
+def write_partitions(
+    doc,
+    base_title: str,
+    headers: List[str],
+    groups: Dict[str, List[list]],
+    replace: Callable[[list], bool],
+    key_columns: int = 1,
+    scan_all: bool = False,
+    value_input_option: str = "RAW",
+    date_patterns: Optional[Dict[int, str]] = None,
+    full_rows: Optional[Callable[[str], List[list]]] = None,
+) -> dict:
+    """
+    Escribe cada grupo {obra: filas} en su hoja de partición (las filas se añaden al final).
+    replace(valores de las primeras `key_columns` columnas) indica qué filas existentes se
+    reemplazan (se borran antes de escribir las nuevas). scan_all=True aplica el borrado
+    también a las hojas de obras que no vienen en `groups` (p. ej. una obra que desapareció
+    del CSV del periodo).
+    full_rows(obra): todas las filas de una obra cuya hoja todavía no existe; así `groups`
+    puede traer solo el delta. Sin full_rows la hoja nueva se crea con las de `groups`.
+    date_patterns: {columna: formato} de las columnas de fecha (ColumnTypes.date_patterns),
+    que se aplica a las hojas creadas y a las escritas que todavía no lo tienen.
+    """
+    with metrics.stage("sheet_read"):
+        metrics.api_call("sheets", "fetch_sheet_metadata")
+        meta = doc.fetch_sheet_metadata()
+    sheets = {s["properties"]["title"]: s["properties"] for s in meta.get("sheets", [])}
+
+    by_title: Dict[str, List[list]] = {}
+    for key, rows in groups.items():
+        title = partition_title(base_title, key)
+        if full_rows is not None and title not in sheets:
+            rows = full_rows(key)
+        by_title.setdefault(title, []).extend(rows)
+    prefix = f"{base_title} - "
+    targets = set(by_title)
+    if scan_all:
+        targets |= {t for t in sheets if t.startswith(prefix)}
+    existing = sorted(t for t in targets if t in sheets)
+
+    used: Dict[str, int] = {}
+    deletes: Dict[str, List[int]] = {}
+    if existing:
+        last = chr(ord("A") + key_columns - 1)
+        with metrics.stage("sheet_read"):
+            metrics.api_call("sheets", "values_batch_get")
+            resp = doc.values_batch_get(
+                [f"{a1_title(t)}!A:{last}" for t in existing],
+                params={"valueRenderOption": "UNFORMATTED_VALUE", "dateTimeRenderOption": "SERIAL_NUMBER"},
+            )
+        for title, value_range in zip(existing, resp.get("valueRanges", [])):
+            keys = [list(r) + [""] * (key_columns - len(r)) for r in value_range.get("values", [])]
+            used[title] = len(keys)
+            # Fila 1 = headers
+            deletes[title] = [i + 1 for i, values in enumerate(keys) if i > 0 and replace(values)]
+
+    requests_body: List[dict] = []
+    formats: List[dict] = []
+    formatted: List[tuple] = []  # (sheetId, patrones) para registrar después del batch_update
+    data: List[dict] = []
+    # Las hojas nuevas llevan id explícito para poder darles formato en el mismo batch_update
+    next_id = max([p.get("sheetId", 0) for p in sheets.values()] + [0]) + 1
+    created = 0
+    written = 0
+    for title in sorted(targets):
+        rows = by_title.get(title, [])
+        if title not in sheets:
+            if not rows:
+                continue
+            requests_body.append({
+                "addSheet": {
+                    "properties": {
+                        "sheetId": next_id,
+                        "title": title,
+                        "gridProperties": {
+                            "rowCount": len(rows) + 1 + ROW_MARGIN,
+                            "columnCount": len(headers),
+                        },
+                    }
+                }
+            })
+            data.append({"range": f"{a1_title(title)}!A1", "values": [headers] + rows})
+            formats += date_format_requests(next_id, date_patterns or {})
+            formatted.append((next_id, date_patterns or {}))
+            next_id += 1
+            created += 1
+            written += len(rows)
+            continue
+
+        props = sheets[title]
+        for start, end in reversed(contiguous_ranges(deletes[title])):
+            requests_body.append(delete_rows_request(props["sheetId"], start, end))
+        remaining = used[title] - len(deletes[title])
+        values = rows
+        if remaining == 0:
+            values = [headers] + rows
+        grid_rows = props.get("gridProperties", {}).get("rowCount", 0) - len(deletes[title])
+        missing = remaining + len(values) - grid_rows
+        if missing > 0:
+            requests_body.append({
+                "appendDimension": {
+                    "sheetId": props["sheetId"],
+                    "dimension": "ROWS",
+                    "length": missing + ROW_MARGIN,
+                }
+            })
+        if values:
+            data.append({"range": f"{a1_title(title)}!A{remaining + 1}", "values": values})
+            pending = pending_date_formats(doc, props["sheetId"], date_patterns or {})
+            formats += date_format_requests(props["sheetId"], pending)
+            formatted.append((props["sheetId"], pending))
+            written += len(rows)
+
+    requests_body += formats
+    if requests_body:
+        sheets_writer.call(doc.batch_update, {"requests": requests_body})
+        for sheet_id, patterns in formatted:
+            remember_date_formats(doc, sheet_id, patterns)
+    if data:
+        sheets_writer.update_values(doc, data, value_input_option=value_input_option)
+    return {
+        "partitions": len(by_title),
+        "sheets_created": created,
+        "rows_written": written,
+        "rows_deleted": sum(len(d) for d in deletes.values()),
+    }
@@ -0,0 +1,47 @@
+"""
+Token bucket para no pasar la cuota por minuto de la API de Google Sheets.
+Un solo limitador de escrituras por proceso, compartido por todos los syncs
+(incluido el backfill que corre varios meses en paralelo).
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Optional
+
+from .config import SHEETS_WRITES_PER_MINUTE
+
+
+class TokenBucket:
+    """
+    rate_per_minute tokens por minuto, con ráfagas de hasta `capacity`.
+    acquire() reserva el token aunque deje el balance negativo y duerme lo que
+    falte fuera del lock, así los hilos esperan en orden de llegada.
+    """
+
+    def __init__(self, rate_per_minute: float, capacity: Optional[float] = None):
+        if rate_per_minute <= 0:
+            raise ValueError("rate_per_minute debe ser > 0")
+        self.rate = rate_per_minute / 60.0
+        # Ráfaga chica: con la cuota en ventana de un minuto, una ráfaga igual a la
+        # cuota completa permitiría casi el doble dentro de la misma ventana.
+        self.capacity = capacity if capacity is not None else max(1.0, rate_per_minute / 6.0)
+        self._tokens = self.capacity
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0) -> float:
+        """Bloquea hasta tener `tokens` disponibles. Retorna los segundos esperados."""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= tokens
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+        if wait > 0:
+            time.sleep(wait)
+        return wait
+
+
+# Escrituras a Google Sheets (append, batch_update, alta de hojas...) de todo el proceso
+sheets_write_limiter = TokenBucket(SHEETS_WRITES_PER_MINUTE)
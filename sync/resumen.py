@@ -0,0 +1,306 @@
+"""
+Hoja "Resumen": totales por fuente, obra (CUENTA / idObr), periodo (MM/YYYY) y moneda,
+para que AppSheet y los dashboards lean unos cientos de filas en vez de toda la historia.
+Los totales viven en el estado local (tabla resumen) y se mantienen con el delta de cada
+corrida, sin leer las hojas completas:
+- materiales: se restan las filas anteriores de los remitos cambiados o borrados (cache)
+  y se suman las nuevas;
+- mano de obra: se reemplazan los totales del periodo con lo que pasó por el CSV.
+La primera vez, los totales de cada fuente se arman leyendo su hoja principal (lo que ya
+muestra el spreadsheet, aunque el estado local sea nuevo o incompleto).
+En la hoja solo se reescriben las claves que cambiaron (las pendientes de una corrida que
+falló se escriben en la siguiente).
+"""
+from __future__ import annotations
+
+import re
+import threading
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from . import metrics
+from .archive import archived_through, month_of
+from .config import RESUMEN_IMPORTE_COLUMN
+from .partitions import a1_title
+from .sheets_writer import contiguous_ranges, delete_rows_request, sheets_writer
+from .state import (
+    ResumenKey,
+    apply_resumen_delta,
+    get_dirty_resumen,
+    get_meta,
+    iter_cached_rows,
+    mark_resumen_written,
+    replace_resumen,
+    set_meta,
+)
+
+SHEET_NAME_RESUMEN = "Resumen"
+RESUMEN_HEADERS = ["Fuente", "Obra", "Periodo", "Moneda", "Total", "Filas"]
+
+# Columnas candidatas al importe en el CSV de mano de obra (sin RESUMEN_IMPORTE_COLUMN)
+IMPORTE_COLUMNS = ("importe", "total", "monto", "costo")
+
+_locks: Dict[str, threading.Lock] = defaultdict(threading.Lock)
+_NUMBER = re.compile(r"-?[\d.,]+$")
+
+
+def to_number(value) -> float:
+    """Número de una celda: 1234.5, "1234.5", "1.234,56" o "1,234.56"; 0 si no es número."""
+    if isinstance(value, bool) or value is None:
+        return 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value).strip().replace(" ", "").replace("$", "")
+    if not _NUMBER.match(text):
+        return 0.0
+    if "," in text and "." in text:
+        # El separador decimal es el último que aparece
+        text = text.replace(".", "").replace(",", ".") if text.rfind(",") > text.rfind(".") else text.replace(",", "")
+    elif "," in text:
+        text = text.replace(",", ".") if text.count(",") == 1 else text.replace(",", "")
+    try:
+        return float(text)
+    except ValueError:
+        return 0.0
+
+
+def periodo_from_fecha(fecha) -> str:
+    """'YYYY-MM-DD' → 'MM/YYYY' (mismo formato que la columna Periodo de mano de obra)."""
+    s = str(fecha or "")
+    return f"{s[5:7]}/{s[:4]}" if len(s) >= 7 and s[4] == "-" else ""
+
+
+def _key_text(value) -> str:
+    """Obra o moneda como texto; una celda numérica de la hoja (1042.0) queda como en el origen."""
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return "" if value is None else str(value).strip()
+
+
+def _add(totals: Dict[ResumenKey, List], key: ResumenKey, total: float, n: int) -> None:
+    entry = totals.setdefault(key, [0.0, 0])
+    entry[0] += total
+    entry[1] += n
+
+
+def _materiales_key(row: Sequence) -> ResumenKey:
+    # RemitoRow: fecha, tipdoc, serie, nrodoc, cuenta, obra, direccion, total, moneda
+    return ("materiales", _key_text(row[4]), periodo_from_fecha(row[0]), _key_text(row[8]))
+
+
+def _frozen(totals: Dict[ResumenKey, List]) -> Dict[ResumenKey, Tuple[float, int]]:
+    return {k: (round(t, 2), n) for k, (t, n) in totals.items()}
+
+
+def _read_sheet(doc, title: str, last_col: str) -> List[list]:
+    """Valores de la hoja (A1:<last_col>, con headers), sin formato y con fechas como serial."""
+    with metrics.stage("sheet_read"):
+        metrics.api_call("sheets", "values_batch_get")
+        resp = doc.values_batch_get(
+            [f"{a1_title(title)}!A:{last_col}"],
+            params={"valueRenderOption": "UNFORMATTED_VALUE", "dateTimeRenderOption": "SERIAL_NUMBER"},
+        )
+    ranges = resp.get("valueRanges", [])
+    return ranges[0].get("values", []) if ranges else []
+
+
+def _materiales_from_sheet(doc, sheet_id: str) -> Dict[ResumenKey, List]:
+    """
+    Totales de la hoja Materiales (la fecha llega como serial o como texto) más los de los
+    meses ya archivados, que siguen en el cache.
+    """
+    from .materiales import SHEET_NAME_MATERIALES
+
+    totals: Dict[ResumenKey, List] = {}
+    for values in _read_sheet(doc, SHEET_NAME_MATERIALES, "I")[1:]:
+        row = list(values) + [""] * (9 - len(values))
+        month = month_of(row[0])
+        periodo = f"{month[5:]}/{month[:4]}" if month else ""
+        _add(totals, ("materiales", _key_text(row[4]), periodo, _key_text(row[8])), to_number(row[7]), 1)
+    through = archived_through("materiales", sheet_id)
+    if through:
+        for row in iter_cached_rows(sheet_id):
+            if str(row[0])[:7] <= through:
+                _add(totals, _materiales_key(row), to_number(row[7]), 1)
+    return totals
+
+
+def update_materiales(doc, sheet_id: str, before: Iterable[Sequence], after: Iterable[Sequence]) -> dict:
+    """
+    Aplica el delta de una corrida de materiales: `before` son las filas que tenía el
+    cache para los remitos cambiados o borrados, `after` las filas nuevas de esos remitos.
+    La primera vez (sin resumen para el spreadsheet) se arma completo desde la hoja
+    Materiales, que ya debe tener escrita la corrida; si esa lectura falla se reintenta en
+    la próxima. Después escribe en la hoja las claves pendientes.
+    """
+    init_key = f"resumen_init:materiales:{sheet_id}"
+    totals: Dict[ResumenKey, List] = {}
+    with _locks[sheet_id]:
+        if get_meta(init_key) is None:
+            try:
+                totals = _materiales_from_sheet(doc, sheet_id)
+            except Exception as e:
+                return {"ok": False, "rows_written": 0, "rows_deleted": 0, "error": str(e) or repr(e)}
+            replace_resumen(sheet_id, "materiales", _frozen(totals))
+            set_meta(init_key, "1")
+        else:
+            for row in before:
+                _add(totals, _materiales_key(row), -to_number(row[7]), -1)
+            for row in after:
+                _add(totals, _materiales_key(row), to_number(row[7]), 1)
+            apply_resumen_delta(sheet_id, _frozen(totals))
+        return _flush(doc, sheet_id)
+
+
+def importe_index(headers: List[str]) -> Optional[int]:
+    """Columna del importe en el CSV de mano de obra (RESUMEN_IMPORTE_COLUMN o la primera candidata)."""
+    lower = [h.strip().lower() for h in headers]
+    if RESUMEN_IMPORTE_COLUMN:
+        wanted = RESUMEN_IMPORTE_COLUMN.strip().lower()
+        return lower.index(wanted) if wanted in lower else None
+    for name in IMPORTE_COLUMNS:
+        if name in lower:
+            return lower.index(name)
+    return None
+
+
+class LaborColumns:
+    """Columnas de obra (idObr), moneda e importe de un CSV de mano de obra."""
+
+    def __init__(self, headers: List[str], idobr_index: int):
+        lower = [h.strip().lower() for h in headers]
+        self._obra = idobr_index
+        self._importe = importe_index(headers)
+        self._moneda = lower.index("moneda") if "moneda" in lower else None
+
+    @staticmethod
+    def _cell(row: Sequence, i: Optional[int]):
+        return row[i] if i is not None and i < len(row) else ""
+
+    def split(self, row: Sequence) -> Tuple[str, str, float]:
+        """(obra, moneda, importe) de una fila del CSV."""
+        return (
+            _key_text(self._cell(row, self._obra)),
+            _key_text(self._cell(row, self._moneda)),
+            to_number(self._cell(row, self._importe)),
+        )
+
+
+class ManoObraTotals:
+    """Acumula los totales por (obra, moneda) de las filas de un periodo a medida que pasan."""
+
+    def __init__(self):
+        self.totals: Dict[Tuple[str, str], List] = {}
+
+    def add(self, row: Sequence, obra: str, moneda: str, importe: float) -> None:
+        entry = self.totals.setdefault((obra, moneda), [0.0, 0])
+        entry[0] += importe
+        entry[1] += 1
+
+
+def _mano_obra_from_sheet(doc, headers: List[str], skip_periodo: str) -> Dict[ResumenKey, List]:
+    """Totales de la hoja de mano de obra por periodo (salvo skip_periodo), con sus propios headers."""
+    from .mano_obra import SHEET_NAME_MANO_OBRA, _col_letter, _idobr_index
+
+    values = _read_sheet(doc, SHEET_NAME_MANO_OBRA, _col_letter(len(headers) + 1))
+    totals: Dict[ResumenKey, List] = {}
+    if not values:
+        return totals
+    sheet_headers = [str(h) for h in values[0][1:]]  # columna A = Periodo
+    columns = LaborColumns(sheet_headers, _idobr_index(sheet_headers))
+    for row in values[1:]:
+        periodo = str(row[0]).strip() if row else ""
+        if periodo and periodo != skip_periodo:
+            obra, moneda, importe = columns.split(row[1:])
+            _add(totals, ("mano_obra", obra, periodo, moneda), importe, 1)
+    return totals
+
+
+def update_mano_obra(doc, sheet_id: str, periodo: str, acc: ManoObraTotals, headers: List[str]) -> dict:
+    """
+    Reemplaza los totales del periodo con los acumulados y escribe en la hoja las claves
+    pendientes. La primera vez suma además los demás periodos que ya tiene la hoja de mano
+    de obra (`headers`: los del CSV, para saber hasta qué columna leer); si esa lectura
+    falla se reintenta en la próxima corrida.
+    """
+    totals = {("mano_obra", obra, periodo, moneda): v for (obra, moneda), v in acc.totals.items()}
+    init_key = f"resumen_init:mano_obra:{sheet_id}"
+    with _locks[sheet_id]:
+        replace_resumen(sheet_id, "mano_obra", _frozen(totals), periodo=periodo)
+        if get_meta(init_key) is None:
+            try:
+                others = _mano_obra_from_sheet(doc, headers, periodo)
+            except Exception as e:
+                return {"ok": False, "rows_written": 0, "rows_deleted": 0, "error": str(e) or repr(e)}
+            replace_resumen(sheet_id, "mano_obra", _frozen({**others, **totals}))
+            set_meta(init_key, "1")
+        return _flush(doc, sheet_id)
+
+
+def _resumen_sheet(doc):
+    import gspread
+
+    try:
+        metrics.api_call("sheets", "worksheet")
+        return doc.worksheet(SHEET_NAME_RESUMEN)
+    except gspread.WorksheetNotFound:
+        sheet = sheets_writer.call(
+            doc.add_worksheet, title=SHEET_NAME_RESUMEN, rows=1000, cols=len(RESUMEN_HEADERS)
+        )
+        sheets_writer.call(sheet.append_row, RESUMEN_HEADERS, value_input_option="RAW")
+        return sheet
+
+
+def _flush(doc, sheet_id: str) -> dict:
+    """
+    Escribe en la hoja Resumen las claves pendientes: las existentes se actualizan en su
+    lugar, las que quedaron sin filas se borran y las nuevas se añaden. Se leen solo las
+    columnas clave (A:D) de la hoja, que tiene una fila por clave.
+    """
+    dirty = get_dirty_resumen(sheet_id)
+    if not dirty:
+        return {"ok": True, "rows_written": 0, "rows_deleted": 0}
+    try:
+        with metrics.stage("sheet_read"):
+            sheet = _resumen_sheet(doc)
+            metrics.api_call("sheets", "values_get")
+            existing = sheet.get("A2:D", value_render_option="UNFORMATTED_VALUE")
+        positions: Dict[ResumenKey, int] = {}
+        deletes: List[int] = []
+        for i, values in enumerate(existing):
+            key = tuple(str(v).strip() for v in (list(values) + [""] * 4)[:4])
+            if key in positions:
+                deletes.append(i + 2)  # clave repetida (edición manual)
+            else:
+                positions[key] = i + 2
+
+        def row_of(key: ResumenKey) -> list:
+            total, n = dirty[key]
+            return list(key) + [round(total, 2), n]
+
+        updates = {positions[k]: row_of(k) for k in dirty if k in positions and dirty[k][1] > 0}
+        deletes += [positions[k] for k in dirty if k in positions and dirty[k][1] <= 0]
+        # Nuevas al final, por periodo (año, mes) y obra
+        order = sorted(dirty, key=lambda k: (k[2][3:], k[2][:2], k))
+        new_rows = [row_of(k) for k in order if k not in positions and dirty[k][1] > 0]
+
+        if updates:
+            data = [
+                {"range": f"A{start}", "values": [updates[n] for n in range(start, end + 1)]}
+                for start, end in contiguous_ranges(sorted(updates))
+            ]
+            sheets_writer.update_ranges(sheet, data, value_input_option="RAW")
+        if deletes:
+            # De abajo hacia arriba para que los índices sigan siendo válidos
+            requests_body = [
+                delete_rows_request(sheet.id, start, end)
+                for start, end in reversed(contiguous_ranges(sorted(deletes)))
+            ]
+            sheets_writer.call(doc.batch_update, {"requests": requests_body})
+        if new_rows:
+            sheets_writer.append_rows(sheet, new_rows, value_input_option="RAW")
+    except Exception as e:
+        # Los totales ya están en el estado: quedan pendientes para la próxima corrida
+        return {"ok": False, "rows_written": 0, "rows_deleted": 0, "error": str(e) or repr(e)}
+    mark_resumen_written(sheet_id, dirty)
+    return {"ok": True, "rows_written": len(updates) + len(new_rows), "rows_deleted": len(deletes)}
@@ -0,0 +1,100 @@
+"""
+Ejecución concurrente de las fuentes de sync (materiales, mano de obra)
+con un deadline por fuente sobre un pool acotado de hilos.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Dict, Optional, Tuple
+
+# Cada tarea recibe un Event de cancelación y devuelve el dict de resultado de la fuente
+SyncTask = Callable[[threading.Event], dict]
+
+# Cada cuánto se revisan las tareas que todavía esperan un hilo libre (segundos)
+_QUEUED_POLL = 0.5
+
+
+class SyncCancelled(Exception):
+    """La fuente superó su deadline y se canceló antes de escribir (o entre dos escrituras)."""
+
+
+def check_cancelled(cancel: Optional[threading.Event]) -> None:
+    """Cancelación cooperativa: las fuentes la llaman antes de cada etapa costosa."""
+    if cancel is not None and cancel.is_set():
+        raise SyncCancelled("cancelado: se superó el deadline de la fuente")
+
+
+def run_sources(
+    tasks: Dict[str, Tuple[SyncTask, float]],
+    on_done: Optional[Callable[[str, dict], None]] = None,
+    max_workers: Optional[int] = None,
+) -> Dict[str, dict]:
+    """
+    Ejecuta cada tarea {nombre: (fn, deadline_segundos)} en un pool de max_workers hilos
+    (por defecto uno por tarea). El deadline corre desde que la tarea empieza, no mientras
+    espera un hilo libre.
+    Si una fuente supera su deadline se marca su Event de cancelación y su resultado
+    es {"ok": False, "error": "timeout ..."}; el resto de las fuentes no la espera.
+    on_done(nombre, resultado) se llama a medida que cada fuente termina.
+    No vuelve hasta que los hilos vencidos salen (en la próxima check_cancelled): el job
+    sigue ocupando su lugar y un sync nuevo no escribe las hojas a la vez que ellos.
+    """
+    if not tasks:
+        return {}
+    results: Dict[str, dict] = {}
+    events = {name: threading.Event() for name in tasks}
+    started: Dict[str, float] = {}
+    workers = max(1, min(max_workers or len(tasks), len(tasks)))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="sync")
+
+    def finish(name: str, result: dict) -> None:
+        results[name] = result
+        if on_done is not None:
+            on_done(name, result)
+
+    def start(name: str, fn: SyncTask) -> dict:
+        started[name] = time.monotonic()
+        return fn(events[name])
+
+    def remaining(name: str, now: float) -> Optional[float]:
+        """Segundos hasta el deadline de la tarea; None si todavía no empezó."""
+        if name not in started:
+            return None
+        return tasks[name][1] - (now - started[name])
+
+    try:
+        pending = {
+            name: executor.submit(start, name, fn) for name, (fn, _) in tasks.items()
+        }
+        while pending:
+            now = time.monotonic()
+            expired = [
+                n for n, f in pending.items()
+                if not f.done() and remaining(n, now) is not None and remaining(n, now) <= 0
+            ]
+            for name in expired:
+                events[name].set()
+                del pending[name]
+                finish(name, {
+                    "ok": False,
+                    "rows_written": 0,
+                    "error": f"timeout: la fuente superó su deadline de {tasks[name][1]:g}s",
+                })
+            if not pending:
+                break
+            running = [r for r in (remaining(n, now) for n in pending) if r is not None]
+            # Con tareas en cola se revisa seguido: su deadline empieza al tomar un hilo
+            timeout = min(running) if len(running) == len(pending) else min(running + [_QUEUED_POLL])
+            done, _ = wait(pending.values(), timeout=max(0.0, timeout), return_when=FIRST_COMPLETED)
+            for name in [n for n, f in pending.items() if f in done]:
+                future = pending.pop(name)
+                try:
+                    finish(name, future.result())
+                except Exception as e:
+                    finish(name, {"ok": False, "rows_written": 0, "error": str(e) or repr(e)})
+    finally:
+        # Los hilos vencidos terminan al ver su Event de cancelación; se los espera
+        executor.shutdown(wait=True, cancel_futures=True)
+    return results
@@ -0,0 +1,268 @@
+"""
+Escritor de Google Sheets compartido por materiales y mano de obra:
+- parte las filas en lotes por cantidad y por tamaño de payload,
+- pasa cada request por el token bucket de escrituras (sync.ratelimit),
+- reintenta con backoff exponencial: 429 siempre (la API rechazó el request sin
+  aplicarlo); 5xx y errores de red solo en escrituras idempotentes (actualizar valores,
+  formatos), porque un append o un deleteDimension que sí se aplicó se repetiría,
+- ajusta el tamaño de lote según latencia y errores (crece si va rápido, se achica
+  a la mitad ante errores o respuestas lentas).
+"""
+from __future__ import annotations
+
+import json
+import random
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .config import (
+    SHEETS_BACKOFF,
+    SHEETS_BATCH_ROWS,
+    SHEETS_MAX_PAYLOAD_BYTES,
+    SHEETS_RETRIES,
+    SHEETS_TARGET_LATENCY,
+)
+from . import metrics
+from .ratelimit import TokenBucket, sheets_write_limiter
+from .runner import check_cancelled
+
+RETRYABLE_STATUS = (429, 500, 502, 503, 504)
+MIN_BATCH_ROWS = 50
+MAX_BATCH_ROWS = 50000
+
+
+def _status_of(exc: Exception) -> Optional[int]:
+    response = getattr(exc, "response", None)
+    status = getattr(response, "status_code", None)
+    if status is None:
+        status = getattr(exc, "code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(exc: Exception, idempotent: bool = True) -> bool:
+    """
+    429, 5xx o error de red (conexión cortada, timeout). Sin idempotent solo 429: ante un
+    5xx o un corte no se sabe si la escritura se aplicó.
+    """
+    import requests
+
+    if not idempotent:
+        return _status_of(exc) == 429
+    if isinstance(exc, (requests.ConnectionError, requests.Timeout)):
+        return True
+    return _status_of(exc) in RETRYABLE_STATUS
+
+
+def _payload_size(item) -> int:
+    value = item if isinstance(item, dict) else list(item)
+    return len(json.dumps(value, default=str, ensure_ascii=False)) + 1
+
+
+def contiguous_ranges(row_numbers: List[int]) -> List[Tuple[int, int]]:
+    """Agrupa números de fila ordenados en rangos contiguos [(inicio, fin), ...]."""
+    ranges: List[Tuple[int, int]] = []
+    for n in row_numbers:
+        if ranges and ranges[-1][1] == n - 1:
+            ranges[-1] = (ranges[-1][0], n)
+        else:
+            ranges.append((n, n))
+    return ranges
+
+
+def delete_rows_request(sheet_id: int, start: int, end: int) -> dict:
+    """Request de batch_update que borra las filas start..end (1-based, inclusive)."""
+    return {
+        "deleteDimension": {
+            "range": {
+                "sheetId": sheet_id,
+                "dimension": "ROWS",
+                "startIndex": start - 1,
+                "endIndex": end,
+            }
+        }
+    }
+
+
+_spreadsheet_locks: Dict[str, threading.RLock] = {}
+_spreadsheet_locks_guard = threading.Lock()
+
+
+def spreadsheet_lock(spreadsheet_id: str) -> threading.RLock:
+    """
+    Lock de las escrituras a un spreadsheet: los updates y borrados por número de fila
+    (upsert, delta, archivo) solo valen si nadie más escribe la hoja entre la lectura y
+    la escritura. Lo toman los syncs, el backfill (meses en paralelo) y el archivo; los
+    fetches van afuera. Es del proceso (gunicorn con un solo worker).
+    """
+    with _spreadsheet_locks_guard:
+        lock = _spreadsheet_locks.get(spreadsheet_id)
+        if lock is None:
+            lock = _spreadsheet_locks[spreadsheet_id] = threading.RLock()
+        return lock
+
+
+class SheetsWriter:
+    """Escrituras con lotes adaptativos, rate limit y reintentos. Thread-safe."""
+
+    def __init__(
+        self,
+        limiter: TokenBucket = sheets_write_limiter,
+        batch_rows: int = SHEETS_BATCH_ROWS,
+        max_payload_bytes: int = SHEETS_MAX_PAYLOAD_BYTES,
+        retries: int = SHEETS_RETRIES,
+        backoff: float = SHEETS_BACKOFF,
+        target_latency: float = SHEETS_TARGET_LATENCY,
+    ):
+        self.limiter = limiter
+        self.max_payload_bytes = max_payload_bytes
+        self.retries = retries
+        self.backoff = backoff
+        self.target_latency = target_latency
+        self._batch_rows = max(MIN_BATCH_ROWS, min(MAX_BATCH_ROWS, batch_rows))
+        self._lock = threading.Lock()
+
+    @property
+    def batch_rows(self) -> int:
+        return self._batch_rows
+
+    def _adapt(self, elapsed: Optional[float], failed: bool = False) -> None:
+        """Crecimiento aditivo-multiplicativo: x1.25 si va rápido, /2 si falla o tarda."""
+        with self._lock:
+            if failed or (elapsed is not None and elapsed > self.target_latency):
+                self._batch_rows = max(MIN_BATCH_ROWS, self._batch_rows // 2)
+            elif elapsed is not None and elapsed < self.target_latency / 2:
+                self._batch_rows = min(MAX_BATCH_ROWS, int(self._batch_rows * 1.25) + 1)
+
+    def _sleep_backoff(self, attempt: int) -> None:
+        time.sleep(self.backoff * (2 ** attempt) * (1 + random.random() / 2))
+
+    def call(self, fn: Callable, *args, idempotent: bool = False, **kwargs):
+        """
+        Una escritura suelta (alta de hoja, clear, batch_update...) con rate limit y reintentos.
+        idempotent=True si repetirla no cambia el resultado (clear, formatos): se reintenta
+        también ante 5xx y errores de red.
+        """
+        attempt = 0
+        while True:
+            self.limiter.acquire()
+            metrics.api_call("sheets", getattr(fn, "__name__", "call"), stage_name="sheet_write")
+            start = time.monotonic()
+            try:
+                return fn(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.retries or not is_retryable(e, idempotent):
+                    raise
+                self._sleep_backoff(attempt)
+                attempt += 1
+            finally:
+                metrics.add_time("sheet_write", time.monotonic() - start)
+
+    def _next_chunk(self, buf: List) -> int:
+        """Cuántas filas del buffer entran en el próximo lote (por cantidad y bytes)."""
+        limit = min(len(buf), self._batch_rows)
+        size = 0
+        for i in range(limit):
+            size += _payload_size(buf[i])
+            if size > self.max_payload_bytes and i > 0:
+                return i
+        return limit
+
+    def _send_chunks(
+        self,
+        items: Iterable,
+        send: Callable[[List], None],
+        method: str,
+        cancel=None,
+        on_commit: Optional[Callable[[int], None]] = None,
+        idempotent: bool = True,
+    ) -> int:
+        written = 0
+        buf: List = []
+        it = iter(items)
+        exhausted = False
+        attempt = 0
+        while True:
+            while not exhausted and len(buf) < self._batch_rows:
+                try:
+                    buf.append(next(it))
+                except StopIteration:
+                    exhausted = True
+            if not buf:
+                return written
+            check_cancelled(cancel)
+            n = self._next_chunk(buf)
+            chunk = buf[:n]
+            self.limiter.acquire()
+            metrics.api_call("sheets", method, stage_name="sheet_write")
+            start = time.monotonic()
+            try:
+                send(chunk)
+            except Exception as e:
+                metrics.add_time("sheet_write", time.monotonic() - start)
+                if attempt >= self.retries or not is_retryable(e, idempotent):
+                    raise
+                # Reintentar lo mismo en lotes más chicos
+                self._adapt(None, failed=True)
+                self._sleep_backoff(attempt)
+                attempt += 1
+                continue
+            attempt = 0
+            elapsed = time.monotonic() - start
+            metrics.add_time("sheet_write", elapsed)
+            metrics.add_rows(n, "sheet_write")
+            self._adapt(elapsed)
+            del buf[:n]
+            written += n
+            if on_commit is not None:
+                on_commit(n)
+
+    def append_rows(
+        self,
+        sheet,
+        rows: Iterable[Sequence],
+        value_input_option: str = "USER_ENTERED",
+        cancel: Optional[threading.Event] = None,
+        on_commit: Optional[Callable[[int], None]] = None,
+    ) -> int:
+        """
+        append_rows en lotes; acepta cualquier iterable (se consume en streaming).
+        on_commit(n) se llama después de cada lote confirmado por la API (checkpoints).
+        """
+        return self._send_chunks(
+            rows,
+            lambda chunk: sheet.append_rows(chunk, value_input_option=value_input_option),
+            "append_rows",
+            cancel=cancel,
+            on_commit=on_commit,
+            idempotent=False,
+        )
+
+    def update_ranges(
+        self,
+        sheet,
+        data: List[dict],
+        value_input_option: str = "USER_ENTERED",
+        cancel: Optional[threading.Event] = None,
+    ) -> int:
+        """batch_update de valores [{"range", "values"}], partido en varios requests si es grande."""
+        return self._send_chunks(
+            data,
+            lambda chunk: sheet.batch_update(chunk, value_input_option=value_input_option),
+            "values_batch_update",
+            cancel=cancel,
+        )
+
+    def update_values(self, doc, data: List[dict], value_input_option: str = "USER_ENTERED") -> int:
+        """values_batch_update del spreadsheet (varias hojas en un request; se parte solo si excede el payload)."""
+        return self._send_chunks(
+            data,
+            lambda chunk: doc.values_batch_update(
+                {"valueInputOption": value_input_option, "data": chunk}
+            ),
+            "values_batch_update",
+        )
+
+
+# Escritor del proceso (comparte el tamaño de lote aprendido entre syncs)
+sheets_writer = SheetsWriter()
@@ -0,0 +1,265 @@
+"""
+Snapshot local de costos (SQLite en COSTOS_SNAPSHOT_PATH) para leer sin pasar por la
+API de Sheets: una fila por remito o fila de CSV, indexada por obra y periodo.
+Cada sync lo actualiza con lo que escribió:
+- materiales: el delta de remitos (la primera vez se arma desde el cache de remitos);
+- mano de obra: las filas del periodo, que se cargan en una tabla de staging mientras
+  pasan por el stream y reemplazan a las anteriores en una sola transacción al final.
+Cada cambio incrementa `version`, que GET /costos usa como ETag.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from .config import COSTOS_SNAPSHOT_PATH
+from .resumen import periodo_from_fecha, to_number
+from .state import iter_cached_rows
+
+_COLUMNS = """
+    sheet_id TEXT NOT NULL,
+    fuente TEXT NOT NULL,
+    clave TEXT NOT NULL,
+    obra TEXT NOT NULL,
+    periodo TEXT NOT NULL,
+    mes TEXT NOT NULL,
+    moneda TEXT NOT NULL,
+    fecha TEXT NOT NULL,
+    importe REAL NOT NULL,
+    fila TEXT NOT NULL
+"""
+_FIELDS = "sheet_id, fuente, clave, obra, periodo, mes, moneda, fecha, importe, fila"
+
+_SCHEMA = [
+    f"CREATE TABLE IF NOT EXISTS costos ({_COLUMNS})",
+    "CREATE INDEX IF NOT EXISTS costos_obra_mes ON costos (obra, mes)",
+    "CREATE INDEX IF NOT EXISTS costos_mes ON costos (mes)",
+    "CREATE INDEX IF NOT EXISTS costos_clave ON costos (sheet_id, fuente, clave)",
+    # Cargas de mano de obra todavía no confirmadas (sin índices: se insertan en streaming)
+    f"CREATE TABLE IF NOT EXISTS costos_staging (carga TEXT NOT NULL, {_COLUMNS})",
+    "CREATE TABLE IF NOT EXISTS snapshot_meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)",
+]
+
+# Filas por INSERT al cargar mano de obra en staging
+STAGE_BATCH = 5000
+
+_init_lock = threading.Lock()
+_initialized = set()
+
+
+@contextmanager
+def connect(path: Optional[str] = None) -> Iterator[sqlite3.Connection]:
+    """Conexión al snapshot (crea archivo y tablas si hace falta). Commit al salir."""
+    db_path = Path(path or COSTOS_SNAPSHOT_PATH)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        with _init_lock:
+            if str(db_path) not in _initialized:
+                conn.execute("PRAGMA journal_mode=WAL")
+                for stmt in _SCHEMA:
+                    conn.execute(stmt)
+                conn.commit()
+                _initialized.add(str(db_path))
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def _mes(periodo: str) -> str:
+    """'MM/YYYY' → 'YYYY-MM' (ordenable, para filtrar rangos)."""
+    return f"{periodo[3:]}-{periodo[:2]}" if len(periodo) == 7 and periodo[2] == "/" else ""
+
+
+def _bump(conn: sqlite3.Connection) -> None:
+    conn.execute(
+        """
+        INSERT INTO snapshot_meta (key, value) VALUES ('version', '1')
+        ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1
+        """
+    )
+
+
+def version() -> int:
+    """Versión del snapshot: cambia cada vez que un sync lo modifica."""
+    with connect() as conn:
+        row = conn.execute("SELECT value FROM snapshot_meta WHERE key = 'version'").fetchone()
+    return int(row["value"]) if row else 0
+
+
+# --- Materiales ---
+
+
+def _materiales_record(sheet_id: str, row: Sequence) -> tuple:
+    # RemitoRow: fecha, tipdoc, serie, nrodoc, cuenta, obra, direccion, total, moneda
+    periodo = periodo_from_fecha(row[0])
+    return (
+        sheet_id, "materiales", "|".join(str(p) for p in row[1:4]), str(row[4]).strip(),
+        periodo, _mes(periodo), str(row[8]).strip(), str(row[0] or ""), to_number(row[7]),
+        json.dumps(list(row), default=str),
+    )
+
+
+_INSERT = f"INSERT INTO costos ({_FIELDS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+
+
+def update_materiales(sheet_id: str, upserts: Iterable[Sequence], deleted: Iterable[Tuple[str, str, str]]) -> None:
+    """
+    Aplica el delta de remitos (filas nuevas o cambiadas, claves borradas). La primera vez
+    para el spreadsheet carga todos los remitos del cache local (que ya tiene el delta).
+    """
+    init_key = f"init:materiales:{sheet_id}"
+    with connect() as conn:
+        if conn.execute("SELECT 1 FROM snapshot_meta WHERE key = ?", (init_key,)).fetchone() is None:
+            conn.execute("DELETE FROM costos WHERE sheet_id = ? AND fuente = 'materiales'", (sheet_id,))
+            conn.execute("INSERT INTO snapshot_meta (key, value) VALUES (?, '1')", (init_key,))
+            upserts = iter_cached_rows(sheet_id)
+        else:
+            upserts = list(upserts)
+            keys = ["|".join(str(p) for p in k) for k in deleted]
+            keys += ["|".join(str(p) for p in row[1:4]) for row in upserts]
+            conn.executemany(
+                "DELETE FROM costos WHERE sheet_id = ? AND fuente = 'materiales' AND clave = ?",
+                ((sheet_id, k) for k in keys),
+            )
+        conn.executemany(_INSERT, (_materiales_record(sheet_id, r) for r in upserts))
+        _bump(conn)
+
+
+# --- Mano de obra ---
+
+
+class ManoObraLoad:
+    """
+    Carga de las filas de un periodo: add() las deja en costos_staging de a lotes y
+    commit() reemplaza las filas del periodo en una transacción. El staging que haya
+    dejado una carga interrumpida (worker reiniciado, error de Sheets) se descarta al empezar.
+    """
+
+    def __init__(self, sheet_id: str, periodo: str):
+        self.sheet_id = sheet_id
+        self.periodo = periodo
+        self.carga = uuid.uuid4().hex
+        self._mes = _mes(periodo)
+        self._buf: List[tuple] = []
+        self._n = 0
+        with connect() as conn:
+            conn.execute(
+                "DELETE FROM costos_staging WHERE sheet_id = ? AND periodo = ?", (sheet_id, periodo)
+            )
+
+    def add(self, row: Sequence, obra: str, moneda: str, importe: float) -> None:
+        self._n += 1
+        self._buf.append((
+            self.carga, self.sheet_id, "mano_obra", str(self._n), obra, self.periodo, self._mes, moneda, "",
+            importe, json.dumps(row),
+        ))
+        if len(self._buf) >= STAGE_BATCH:
+            self._flush()
+
+    def _flush(self) -> None:
+        if self._buf:
+            with connect() as conn:
+                conn.executemany(
+                    f"INSERT INTO costos_staging (carga, {_FIELDS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    self._buf,
+                )
+            self._buf = []
+
+    def commit(self) -> int:
+        self._flush()
+        with connect() as conn:
+            conn.execute(
+                "DELETE FROM costos WHERE sheet_id = ? AND fuente = 'mano_obra' AND periodo = ?",
+                (self.sheet_id, self.periodo),
+            )
+            conn.execute(
+                f"INSERT INTO costos ({_FIELDS}) SELECT {_FIELDS} FROM costos_staging WHERE carga = ?",
+                (self.carga,),
+            )
+            conn.execute("DELETE FROM costos_staging WHERE carga = ?", (self.carga,))
+            _bump(conn)
+        return self._n
+
+
+# --- Consultas ---
+
+GROUP_COLUMNS = ("fuente", "obra", "periodo", "moneda", "sheet_id")
+
+
+def query(
+    fuente: Optional[str] = None,
+    obras: Optional[List[str]] = None,
+    desde: Optional[str] = None,
+    hasta: Optional[str] = None,
+    moneda: Optional[str] = None,
+    sheet_id: Optional[str] = None,
+    group_by: Optional[List[str]] = None,
+    limit: int = 1000,
+    offset: int = 0,
+) -> dict:
+    """
+    Filas (o totales agrupados) del snapshot. desde/hasta: periodos MM/YYYY inclusive.
+    group_by: columnas de GROUP_COLUMNS; con group_by devuelve {"groups": [...]} con
+    total e importe por grupo, si no {"rows": [...]} paginado con limit/offset.
+    ValueError si un filtro es inválido.
+    """
+    where: List[str] = []
+    params: list = []
+    if fuente:
+        where.append("fuente = ?")
+        params.append(fuente)
+    if obras:
+        where.append(f"obra IN ({', '.join('?' * len(obras))})")
+        params.extend(obras)
+    for op, value in ((">=", desde), ("<=", hasta)):
+        if value:
+            mes = _mes(value)
+            if not mes:
+                raise ValueError(f"Periodo inválido '{value}': usar MM/YYYY")
+            where.append(f"mes {op} ?")
+            params.append(mes)
+    if moneda:
+        where.append("moneda = ?")
+        params.append(moneda)
+    if sheet_id:
+        where.append("sheet_id = ?")
+        params.append(sheet_id)
+    cond = " AND ".join(where) or "1"
+
+    with connect() as conn:
+        if group_by:
+            unknown = [c for c in group_by if c not in GROUP_COLUMNS]
+            if unknown:
+                raise ValueError(f"group_by inválido: {', '.join(unknown)} (usar {', '.join(GROUP_COLUMNS)})")
+            cols = ", ".join(group_by)
+            order = ", ".join("mes" if c == "periodo" else c for c in group_by)
+            rows = conn.execute(
+                f"""
+                SELECT {cols}, ROUND(SUM(importe), 2) AS total, COUNT(*) AS filas FROM costos
+                WHERE {cond} GROUP BY {cols}, {order} ORDER BY {order}
+                """,
+                params,
+            ).fetchall()
+            return {"groups": [dict(r) for r in rows]}
+        total = conn.execute(f"SELECT COUNT(*) FROM costos WHERE {cond}", params).fetchone()[0]
+        rows = conn.execute(
+            f"""
+            SELECT sheet_id, fuente, obra, periodo, moneda, fecha, importe, fila FROM costos
+            WHERE {cond} ORDER BY mes, fuente, obra, rowid LIMIT ? OFFSET ?
+            """,
+            params + [limit, offset],
+        ).fetchall()
+    out = []
+    for r in rows:
+        item = dict(r)
+        item["fila"] = json.loads(item["fila"])
+        out.append(item)
+    return {"rows": out, "count": total, "limit": limit, "offset": offset}
@@ -0,0 +1,540 @@
+"""
+Estado local del sync en SQLite (SYNC_STATE_PATH).
+Guarda qué se escribió en los Sheets para poder saltear trabajo repetido.
+"""
+from __future__ import annotations
+
+import json
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from .config import SYNC_STATE_PATH
+
+_SCHEMA = [
+    # Último CSV de mano de obra escrito por (sheet, periodo)
+    """
+    CREATE TABLE IF NOT EXISTS mano_obra_manifest (
+        sheet_id TEXT NOT NULL,
+        periodo TEXT NOT NULL,
+        file_id TEXT NOT NULL,
+        file_name TEXT NOT NULL DEFAULT '',
+        modified_time TEXT NOT NULL DEFAULT '',
+        md5_checksum TEXT NOT NULL DEFAULT '',
+        rows_written INTEGER NOT NULL DEFAULT 0,
+        synced_at TEXT NOT NULL,
+        PRIMARY KEY (sheet_id, periodo)
+    )
+    """,
+    # Huellas (hash de columnas normalizadas + periodo) de las filas de mano de obra en
+    # cada Sheet, con cuántas veces aparece cada una
+    """
+    CREATE TABLE IF NOT EXISTS mano_obra_rows (
+        sheet_id TEXT NOT NULL,
+        periodo TEXT NOT NULL,
+        fingerprint TEXT NOT NULL,
+        n INTEGER NOT NULL,
+        PRIMARY KEY (sheet_id, periodo, fingerprint)
+    )
+    """,
+    # Cache del listado de cada carpeta de Drive (se mantiene con el changes feed)
+    """
+    CREATE TABLE IF NOT EXISTS drive_files (
+        folder_id TEXT NOT NULL,
+        file_id TEXT NOT NULL,
+        name TEXT NOT NULL,
+        modified_time TEXT NOT NULL DEFAULT '',
+        md5_checksum TEXT NOT NULL DEFAULT '',
+        PRIMARY KEY (folder_id, file_id)
+    )
+    """,
+    # Valores sueltos (high-water marks, tokens)
+    """
+    CREATE TABLE IF NOT EXISTS sync_meta (
+        key TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    )
+    """,
+    # Remitos ya escritos en cada Sheet de materiales (fila convertida + hash); cuenta
+    # (obra) va aparte para leer las filas de una obra sin recorrer todo el cache
+    """
+    CREATE TABLE IF NOT EXISTS remitos_cache (
+        sheet_id TEXT NOT NULL,
+        tipdoc TEXT NOT NULL,
+        serie TEXT NOT NULL,
+        nrodoc TEXT NOT NULL,
+        fecha TEXT NOT NULL,
+        cuenta TEXT NOT NULL DEFAULT '',
+        row_json TEXT NOT NULL,
+        row_hash TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        PRIMARY KEY (sheet_id, tipdoc, serie, nrodoc)
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS remitos_cache_fecha ON remitos_cache (sheet_id, fecha)",
+    # Totales por (fuente, obra, periodo, moneda) de la hoja Resumen de cada spreadsheet;
+    # dirty = cambió y todavía no se escribió en la hoja
+    """
+    CREATE TABLE IF NOT EXISTS resumen (
+        sheet_id TEXT NOT NULL,
+        fuente TEXT NOT NULL,
+        obra TEXT NOT NULL,
+        periodo TEXT NOT NULL,
+        moneda TEXT NOT NULL,
+        total REAL NOT NULL,
+        n INTEGER NOT NULL,
+        dirty INTEGER NOT NULL DEFAULT 1,
+        PRIMARY KEY (sheet_id, fuente, obra, periodo, moneda)
+    )
+    """,
+    # Avance de cada backfill (run_id = rango pedido) para poder reanudarlo
+    """
+    CREATE TABLE IF NOT EXISTS backfill_items (
+        run_id TEXT NOT NULL,
+        item TEXT NOT NULL,
+        status TEXT NOT NULL,
+        result_json TEXT NOT NULL DEFAULT '{}',
+        updated_at TEXT NOT NULL,
+        PRIMARY KEY (run_id, item)
+    )
+    """,
+    # Corrida en curso (o interrumpida) de cada fuente, para retomarla (ver sync.checkpoint):
+    # qué se pidió, referencias al contenido de las filas y cuántas del append se confirmaron
+    """
+    CREATE TABLE IF NOT EXISTS checkpoints (
+        source TEXT NOT NULL,
+        scope TEXT NOT NULL,
+        fetched TEXT NOT NULL,
+        content_ref TEXT NOT NULL DEFAULT '',
+        append_ref TEXT NOT NULL DEFAULT '',
+        committed INTEGER NOT NULL DEFAULT 0,
+        updated_at TEXT NOT NULL,
+        PRIMARY KEY (source, scope)
+    )
+    """,
+]
+
+_init_lock = threading.Lock()
+_initialized = set()
+
+
+def _migrate(conn: sqlite3.Connection) -> None:
+    """Cambios de esquema sobre bases creadas por versiones anteriores."""
+    columns = {r[1] for r in conn.execute("PRAGMA table_info(remitos_cache)")}
+    if "cuenta" not in columns:
+        conn.execute("ALTER TABLE remitos_cache ADD COLUMN cuenta TEXT NOT NULL DEFAULT ''")
+        conn.execute(
+            "UPDATE remitos_cache SET cuenta = COALESCE(CAST(json_extract(row_json, '$[4]') AS TEXT), '')"
+        )
+    conn.execute("CREATE INDEX IF NOT EXISTS remitos_cache_cuenta ON remitos_cache (sheet_id, cuenta)")
+
+
+@contextmanager
+def connect(path: Optional[str] = None) -> Iterator[sqlite3.Connection]:
+    """Conexión a la base de estado (crea archivo y tablas si hace falta). Commit al salir."""
+    db_path = Path(path or SYNC_STATE_PATH)
+    db_path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(str(db_path), timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        with _init_lock:
+            if str(db_path) not in _initialized:
+                conn.execute("PRAGMA journal_mode=WAL")
+                for stmt in _SCHEMA:
+                    conn.execute(stmt)
+                _migrate(conn)
+                conn.commit()
+                _initialized.add(str(db_path))
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+
+def get_manifest(sheet_id: str, periodo: str) -> Optional[dict]:
+    """Último archivo sincronizado para (sheet_id, periodo) o None."""
+    with connect() as conn:
+        row = conn.execute(
+            "SELECT * FROM mano_obra_manifest WHERE sheet_id = ? AND periodo = ?",
+            (sheet_id, periodo),
+        ).fetchone()
+    return dict(row) if row else None
+
+
+def save_manifest(sheet_id: str, periodo: str, info: dict, rows_written: int) -> None:
+    """Registra el archivo de Drive (id, modifiedTime, md5Checksum) escrito para el periodo."""
+    with connect() as conn:
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO mano_obra_manifest
+                (sheet_id, periodo, file_id, file_name, modified_time, md5_checksum, rows_written, synced_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                sheet_id,
+                periodo,
+                info["id"],
+                info.get("name") or "",
+                info.get("modifiedTime") or "",
+                info.get("md5Checksum") or "",
+                rows_written,
+                datetime.utcnow().isoformat(timespec="seconds"),
+            ),
+        )
+
+
+def is_same_file(manifest: Optional[dict], info: dict) -> bool:
+    """True si el manifiesto corresponde exactamente al archivo `info` (mismo id y contenido)."""
+    if not manifest or manifest["file_id"] != info["id"]:
+        return False
+    md5 = info.get("md5Checksum") or ""
+    if md5 and manifest["md5_checksum"]:
+        return manifest["md5_checksum"] == md5
+    return bool(manifest["modified_time"]) and manifest["modified_time"] == (info.get("modifiedTime") or "")
+
+
+def get_row_fingerprints(sheet_id: str, periodo: str) -> Dict[str, int]:
+    """{huella: cantidad} de las filas de mano de obra escritas para (sheet_id, periodo)."""
+    with connect() as conn:
+        rows = conn.execute(
+            "SELECT fingerprint, n FROM mano_obra_rows WHERE sheet_id = ? AND periodo = ?",
+            (sheet_id, periodo),
+        ).fetchall()
+    return {r["fingerprint"]: r["n"] for r in rows}
+
+
+def save_row_fingerprints(sheet_id: str, periodo: str, counts: Dict[str, int]) -> None:
+    """Reemplaza las huellas guardadas de (sheet_id, periodo)."""
+    with connect() as conn:
+        conn.execute("DELETE FROM mano_obra_rows WHERE sheet_id = ? AND periodo = ?", (sheet_id, periodo))
+        conn.executemany(
+            "INSERT INTO mano_obra_rows (sheet_id, periodo, fingerprint, n) VALUES (?, ?, ?, ?)",
+            ((sheet_id, periodo, fp, n) for fp, n in counts.items() if n > 0),
+        )
+
+
+def delete_row_fingerprints(sheet_id: str, periodos: Iterable[str]) -> None:
+    """Olvida las huellas de esos periodos (p. ej. porque se movieron al archivo)."""
+    with connect() as conn:
+        conn.executemany(
+            "DELETE FROM mano_obra_rows WHERE sheet_id = ? AND periodo = ?",
+            ((sheet_id, periodo) for periodo in periodos),
+        )
+
+
+def get_drive_files(folder_id: str) -> List[dict]:
+    """Listado cacheado de la carpeta: [{"id", "name", "modifiedTime", "md5Checksum"}]."""
+    with connect() as conn:
+        rows = conn.execute(
+            "SELECT file_id, name, modified_time, md5_checksum FROM drive_files WHERE folder_id = ?",
+            (folder_id,),
+        ).fetchall()
+    return [
+        {"id": r["file_id"], "name": r["name"], "modifiedTime": r["modified_time"], "md5Checksum": r["md5_checksum"]}
+        for r in rows
+    ]
+
+
+def apply_drive_files(
+    folder_id: str, upserts: Iterable[dict], removed: Iterable[str] = (), replace: bool = False
+) -> None:
+    """Actualiza el listado cacheado (replace=True: reemplaza el listado completo)."""
+    with connect() as conn:
+        if replace:
+            conn.execute("DELETE FROM drive_files WHERE folder_id = ?", (folder_id,))
+        conn.executemany(
+            """
+            INSERT OR REPLACE INTO drive_files (folder_id, file_id, name, modified_time, md5_checksum)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (
+                (folder_id, f["id"], f.get("name") or "", f.get("modifiedTime") or "", f.get("md5Checksum") or "")
+                for f in upserts
+            ),
+        )
+        conn.executemany(
+            "DELETE FROM drive_files WHERE folder_id = ? AND file_id = ?",
+            ((folder_id, file_id) for file_id in removed),
+        )
+
+
+def get_meta(key: str) -> Optional[str]:
+    with connect() as conn:
+        row = conn.execute("SELECT value FROM sync_meta WHERE key = ?", (key,)).fetchone()
+    return row["value"] if row else None
+
+
+def set_meta(key: str, value: str) -> None:
+    with connect() as conn:
+        conn.execute("INSERT OR REPLACE INTO sync_meta (key, value) VALUES (?, ?)", (key, value))
+
+
+def delete_meta(key: str) -> None:
+    with connect() as conn:
+        conn.execute("DELETE FROM sync_meta WHERE key = ?", (key,))
+
+
+RemitoKey = Tuple[str, str, str]
+
+
+def get_cached_remitos(sheet_id: str, from_date: str, to_date: str) -> Dict[RemitoKey, str]:
+    """{(tipdoc, serie, nrodoc): row_hash} de los remitos cacheados con fecha en el rango."""
+    with connect() as conn:
+        rows = conn.execute(
+            """
+            SELECT tipdoc, serie, nrodoc, row_hash FROM remitos_cache
+            WHERE sheet_id = ? AND fecha BETWEEN ? AND ?
+            """,
+            (sheet_id, from_date, to_date),
+        ).fetchall()
+    return {(r["tipdoc"], r["serie"], r["nrodoc"]): r["row_hash"] for r in rows}
+
+
+def apply_remitos_delta(
+    sheet_id: str,
+    upserts: Iterable[Tuple[RemitoKey, str, list, str]],
+    deleted: Iterable[RemitoKey],
+) -> None:
+    """
+    Actualiza el cache tras escribir en el Sheet.
+    upserts: (clave, fecha, fila, hash) de documentos nuevos o cambiados.
+    """
+    now = datetime.utcnow().isoformat(timespec="seconds")
+    with connect() as conn:
+        conn.executemany(
+            """
+            INSERT OR REPLACE INTO remitos_cache
+                (sheet_id, tipdoc, serie, nrodoc, fecha, cuenta, row_json, row_hash, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (
+                (sheet_id, *key, fecha, _cuenta(row), json.dumps(row, default=str), row_hash, now)
+                for key, fecha, row, row_hash in upserts
+            ),
+        )
+        conn.executemany(
+            "DELETE FROM remitos_cache WHERE sheet_id = ? AND tipdoc = ? AND serie = ? AND nrodoc = ?",
+            ((sheet_id, *key) for key in deleted),
+        )
+
+
+def _cuenta(row: list) -> str:
+    """Columna cuenta del cache: CUENTA de la fila (RemitoRow[4]) como texto."""
+    return "" if row[4] is None else str(row[4])
+
+
+def get_cached_cuentas(sheet_id: str, keys: Iterable[RemitoKey]) -> Set[str]:
+    """CUENTA (obra) con la que quedaron cacheados los remitos `keys`."""
+    cuentas = set()
+    with connect() as conn:
+        for key in keys:
+            row = conn.execute(
+                """
+                SELECT cuenta FROM remitos_cache
+                WHERE sheet_id = ? AND tipdoc = ? AND serie = ? AND nrodoc = ?
+                """,
+                (sheet_id, *key),
+            ).fetchone()
+            if row:
+                cuentas.add(row["cuenta"])
+    return cuentas
+
+
+def get_cached_rows(sheet_id: str, keys: Iterable[RemitoKey]) -> Dict[RemitoKey, list]:
+    """{clave: fila} de los remitos `keys` que están en el cache."""
+    out: Dict[RemitoKey, list] = {}
+    with connect() as conn:
+        for key in keys:
+            row = conn.execute(
+                """
+                SELECT row_json FROM remitos_cache
+                WHERE sheet_id = ? AND tipdoc = ? AND serie = ? AND nrodoc = ?
+                """,
+                (sheet_id, *key),
+            ).fetchone()
+            if row:
+                out[key] = json.loads(row["row_json"])
+    return out
+
+
+def iter_cached_rows(sheet_id: str) -> Iterator[list]:
+    """Todas las filas cacheadas del Sheet de materiales (se leen de a lotes)."""
+    with connect() as conn:
+        cursor = conn.execute("SELECT row_json FROM remitos_cache WHERE sheet_id = ?", (sheet_id,))
+        while True:
+            batch = cursor.fetchmany(1000)
+            if not batch:
+                return
+            for r in batch:
+                yield json.loads(r["row_json"])
+
+
+def get_cached_rows_by_cuenta(sheet_id: str, cuentas: Iterable[str]) -> Dict[str, List[list]]:
+    """{cuenta: filas} de todos los remitos cacheados de esas obras, ordenados por fecha."""
+    out: Dict[str, List[list]] = {str(c): [] for c in cuentas}
+    with connect() as conn:
+        for cuenta, rows in out.items():
+            for r in conn.execute(
+                """
+                SELECT row_json FROM remitos_cache WHERE sheet_id = ? AND cuenta = ?
+                ORDER BY fecha, tipdoc, serie, nrodoc
+                """,
+                (sheet_id, cuenta),
+            ):
+                rows.append(json.loads(r["row_json"]))
+    return out
+
+
+ResumenKey = Tuple[str, str, str, str]  # (fuente, obra, periodo, moneda)
+
+
+def apply_resumen_delta(sheet_id: str, delta: Dict[ResumenKey, Tuple[float, int]]) -> None:
+    """Suma (total, filas) a cada clave del resumen y la marca para escribir."""
+    with connect() as conn:
+        conn.executemany(
+            """
+            INSERT INTO resumen (sheet_id, fuente, obra, periodo, moneda, total, n, dirty)
+            VALUES (?, ?, ?, ?, ?, ?, ?, 1)
+            ON CONFLICT (sheet_id, fuente, obra, periodo, moneda)
+            DO UPDATE SET total = total + excluded.total, n = n + excluded.n, dirty = 1
+            """,
+            ((sheet_id, *key, total, n) for key, (total, n) in delta.items() if total or n),
+        )
+
+
+def replace_resumen(
+    sheet_id: str,
+    fuente: str,
+    totals: Dict[ResumenKey, Tuple[float, int]],
+    periodo: Optional[str] = None,
+) -> None:
+    """
+    Reemplaza los totales de la fuente (solo de ese periodo si se pasa). Las claves que
+    cambian o desaparecen quedan marcadas para escribir; las que desaparecen con n = 0.
+    """
+    scope, params = "sheet_id = ? AND fuente = ?", [sheet_id, fuente]
+    if periodo is not None:
+        scope += " AND periodo = ?"
+        params.append(periodo)
+    with connect() as conn:
+        old = {
+            (r["fuente"], r["obra"], r["periodo"], r["moneda"]): (r["total"], r["n"])
+            for r in conn.execute(f"SELECT * FROM resumen WHERE {scope}", params)
+        }
+        gone = [(0.0, 0, sheet_id, *key) for key in old if key not in totals]
+        conn.executemany(
+            """
+            UPDATE resumen SET total = ?, n = ?, dirty = 1
+            WHERE sheet_id = ? AND fuente = ? AND obra = ? AND periodo = ? AND moneda = ?
+            """,
+            gone,
+        )
+        conn.executemany(
+            "INSERT OR REPLACE INTO resumen (sheet_id, fuente, obra, periodo, moneda, total, n, dirty) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, 1)",
+            ((sheet_id, *key, total, n) for key, (total, n) in totals.items() if old.get(key) != (total, n)),
+        )
+
+
+def get_dirty_resumen(sheet_id: str) -> Dict[ResumenKey, Tuple[float, int]]:
+    """Claves del resumen que cambiaron desde la última escritura de la hoja."""
+    with connect() as conn:
+        rows = conn.execute("SELECT * FROM resumen WHERE sheet_id = ? AND dirty = 1", (sheet_id,)).fetchall()
+    return {(r["fuente"], r["obra"], r["periodo"], r["moneda"]): (r["total"], r["n"]) for r in rows}
+
+
+def mark_resumen_written(sheet_id: str, keys: Iterable[ResumenKey]) -> None:
+    """Tras escribir la hoja: las claves sin filas se borran, el resto deja de estar pendiente."""
+    keys = list(keys)
+    with connect() as conn:
+        conn.executemany(
+            """
+            DELETE FROM resumen
+            WHERE sheet_id = ? AND fuente = ? AND obra = ? AND periodo = ? AND moneda = ? AND n <= 0
+            """,
+            ((sheet_id, *key) for key in keys),
+        )
+        conn.executemany(
+            """
+            UPDATE resumen SET dirty = 0
+            WHERE sheet_id = ? AND fuente = ? AND obra = ? AND periodo = ? AND moneda = ?
+            """,
+            ((sheet_id, *key) for key in keys),
+        )
+
+
+def get_backfill_items(run_id: str) -> Dict[str, dict]:
+    """{item: {"status", "result"}} de un backfill."""
+    with connect() as conn:
+        rows = conn.execute(
+            "SELECT item, status, result_json FROM backfill_items WHERE run_id = ?", (run_id,)
+        ).fetchall()
+    return {r["item"]: {"status": r["status"], "result": json.loads(r["result_json"])} for r in rows}
+
+
+def save_backfill_item(run_id: str, item: str, status: str, result: dict) -> None:
+    with connect() as conn:
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO backfill_items (run_id, item, status, result_json, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (run_id, item, status, json.dumps(result, default=str), datetime.utcnow().isoformat(timespec="seconds")),
+        )
+
+
+def clear_backfill(run_id: str) -> None:
+    with connect() as conn:
+        conn.execute("DELETE FROM backfill_items WHERE run_id = ?", (run_id,))
+
+
+_CHECKPOINT_FIELDS = ("fetched", "content_ref", "append_ref", "committed")
+
+
+def get_checkpoint(source: str, scope: str) -> Optional[dict]:
+    """Checkpoint de (source, scope) o None."""
+    with connect() as conn:
+        row = conn.execute(
+            "SELECT * FROM checkpoints WHERE source = ? AND scope = ?", (source, scope)
+        ).fetchone()
+    return dict(row) if row else None
+
+
+def save_checkpoint(source: str, scope: str, fetched: str, content_ref: str = "") -> None:
+    """Empieza (o reemplaza) el checkpoint de (source, scope), sin lotes confirmados."""
+    with connect() as conn:
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO checkpoints (source, scope, fetched, content_ref, updated_at)
+            VALUES (?, ?, ?, ?, ?)
+            """,
+            (source, scope, fetched, content_ref, datetime.utcnow().isoformat(timespec="seconds")),
+        )
+
+
+def update_checkpoint(source: str, scope: str, **fields) -> None:
+    """Actualiza columnas del checkpoint (fetched, content_ref, append_ref, committed)."""
+    unknown = [k for k in fields if k not in _CHECKPOINT_FIELDS]
+    if unknown:
+        raise ValueError(f"Campos de checkpoint inválidos: {', '.join(unknown)}")
+    sets = ", ".join(f"{k} = ?" for k in fields)
+    with connect() as conn:
+        conn.execute(
+            f"UPDATE checkpoints SET {sets}, updated_at = ? WHERE source = ? AND scope = ?",
+            (*fields.values(), datetime.utcnow().isoformat(timespec="seconds"), source, scope),
+        )
+
+
+def delete_checkpoint(source: str, scope: str) -> None:
+    with connect() as conn:
+        conn.execute("DELETE FROM checkpoints WHERE source = ? AND scope = ?", (source, scope))
+
+
+def get_checkpoint_refs() -> Set[str]:
+    """Referencias de contenido que usa algún checkpoint."""
+    with connect() as conn:
+        rows = conn.execute("SELECT content_ref, append_ref FROM checkpoints").fetchall()
+    return {ref for r in rows for ref in (r["content_ref"], r["append_ref"]) if ref}
@@ -0,0 +1,205 @@
+"""
+Destinos del sync (targets): cada empresa o sucursal con su endpoint Remitos, su carpeta
+de CSVs y sus hojas. Se declaran en SYNC_TARGETS_FILE (JSON o YAML):
+
+  {"targets": [
+    {"name": "gns",
+     "materiales": {"sheet_id": "...", "api_url": "https://.../api/Remitos", "token_env": "GNS_REMITOS_TOKEN"},
+     "mano_obra": {"sheet_id": "...", "folder_id": "..."}},
+    {"name": "sucursal-norte",
+     "mano_obra": {"sheet_id": "...", "folder_id": "...", "timeout": 300}}
+  ]}
+
+Una fuente que no figura en un target no se sincroniza para ese target. El token de
+Remitos se da con "token_env" (nombre de la variable de entorno, recomendado) o "token".
+Sin archivo hay un único target "default" armado con las variables de sync.config.
+
+run_targets ejecuta todas las (target, fuente) en un solo pool acotado (SYNC_MAX_WORKERS):
+cada tarea tiene su deadline y su resultado, un target que falla no afecta a los demás,
+y los clientes de Google y la sesión HTTP de Remitos se comparten entre todas.
+"""
+from __future__ import annotations
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .config import (
+    DRIVE_FOLDER_ID_MANO_OBRA,
+    REMITOS_API_URL,
+    REMITOS_BEARER_TOKEN,
+    SHEET_ID_MANO_OBRA,
+    SHEET_ID_MATERIALES,
+    SKIP_MATERIALES_SYNC,
+    SYNC_MAX_WORKERS,
+    SYNC_TARGETS_FILE,
+    SYNC_TIMEOUT_MANO_OBRA,
+    SYNC_TIMEOUT_MATERIALES,
+)
+
+DEFAULT_TARGET = "default"
+
+
+def default_target() -> dict:
+    """El target único de siempre, con la configuración por variables de entorno."""
+    return {
+        "name": DEFAULT_TARGET,
+        "materiales": {
+            "sheet_id": SHEET_ID_MATERIALES,
+            "api_url": REMITOS_API_URL,
+            "token": REMITOS_BEARER_TOKEN,
+            "timeout": SYNC_TIMEOUT_MATERIALES,
+        },
+        "mano_obra": {
+            "sheet_id": SHEET_ID_MANO_OBRA,
+            "folder_id": DRIVE_FOLDER_ID_MANO_OBRA,
+            "timeout": SYNC_TIMEOUT_MANO_OBRA,
+        },
+    }
+
+
+def _read_file(path: str) -> dict:
+    text = Path(path).read_text(encoding="utf-8")
+    if Path(path).suffix.lower() in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ValueError(f"{path}: para archivos YAML instalar pyyaml (o usar JSON)")
+        return yaml.safe_load(text) or {}
+    return json.loads(text)
+
+
+def _normalize(raw: dict, index: int) -> dict:
+    name = str(raw.get("name") or "").strip()
+    if not name:
+        raise ValueError(f"Target #{index + 1} sin 'name'")
+    target: dict = {"name": name, "materiales": None, "mano_obra": None}
+    m = raw.get("materiales")
+    if m:
+        if not m.get("sheet_id"):
+            raise ValueError(f"Target '{name}': materiales sin 'sheet_id'")
+        token = os.environ.get(m["token_env"], "") if m.get("token_env") else m.get("token", "")
+        target["materiales"] = {
+            "sheet_id": m["sheet_id"],
+            "api_url": m.get("api_url") or REMITOS_API_URL,
+            "token": token,
+            "timeout": float(m.get("timeout", SYNC_TIMEOUT_MATERIALES)),
+        }
+    mo = raw.get("mano_obra")
+    if mo:
+        if not mo.get("sheet_id") or not mo.get("folder_id"):
+            raise ValueError(f"Target '{name}': mano_obra requiere 'sheet_id' y 'folder_id'")
+        target["mano_obra"] = {
+            "sheet_id": mo["sheet_id"],
+            "folder_id": mo["folder_id"],
+            "timeout": float(mo.get("timeout", SYNC_TIMEOUT_MANO_OBRA)),
+        }
+    return target
+
+
+def load_targets(path: Optional[str] = None) -> List[dict]:
+    """
+    Targets del archivo (path o SYNC_TARGETS_FILE), validados; [default_target()] si no hay
+    archivo. ValueError si falta un nombre, se repite o una fuente no tiene sus IDs.
+    """
+    path = path if path is not None else SYNC_TARGETS_FILE
+    if not path:
+        return [default_target()]
+    data = _read_file(path)
+    raw_targets = data.get("targets") if isinstance(data, dict) else data
+    if not isinstance(raw_targets, list) or not raw_targets:
+        raise ValueError(f"{path}: se esperaba una lista 'targets' no vacía")
+    targets = [_normalize(raw, i) for i, raw in enumerate(raw_targets)]
+    names = [t["name"] for t in targets]
+    duplicated = sorted({n for n in names if names.count(n) > 1})
+    if duplicated:
+        raise ValueError(f"{path}: targets repetidos: {', '.join(duplicated)}")
+    return targets
+
+
+def get_target(name: Optional[str] = None) -> dict:
+    """Target por nombre (None: el primero, que sin archivo es "default")."""
+    targets = load_targets()
+    if name is None:
+        return targets[0]
+    for target in targets:
+        if target["name"] == name:
+            return target
+    raise ValueError(f"Target '{name}' no configurado")
+
+
+def sheet_ids(targets: List[dict], sources: Iterable[str] = ("materiales", "mano_obra")) -> List[str]:
+    """IDs de los spreadsheets que escriben esas fuentes de los targets."""
+    return [t[s]["sheet_id"] for t in targets for s in sources if t.get(s) is not None]
+
+
+def run_targets(
+    targets: List[dict],
+    progress: Optional[Callable[[str, object], None]] = None,
+    max_workers: int = SYNC_MAX_WORKERS,
+    now: Optional[datetime] = None,
+) -> dict:
+    """
+    Sincroniza el mes actual de cada fuente de cada target en un pool de max_workers hilos.
+    Las tareas se llaman "<target>/<fuente>" (así las informa progress). Con
+    SHEETS_RETENTION_MONTHS cada fuente archiva al terminar sus meses viejos (sync.archive).
+    Retorna {"ok", "rows_written", "targets": {target: {fuente: resultado}}}.
+    """
+    from .archive import after_sync
+    from .mano_obra import sync_mano_obra
+    from .materiales import run_sync_materiales_month
+    from .runner import run_sources
+
+    now = now or datetime.utcnow()
+    tasks = {}
+    out: Dict[str, Dict[str, dict]] = {t["name"]: {} for t in targets}
+    for target in targets:
+        m, mo = target["materiales"], target["mano_obra"]
+        if m is not None and SKIP_MATERIALES_SYNC:
+            out[target["name"]]["materiales"] = {
+                "ok": False,
+                "rows_written": 0,
+                "error": "omitido (SKIP_MATERIALES_SYNC=1): servidor Remitos requiere TLS 1.2+",
+            }
+        elif m is not None:
+            tasks[f"{target['name']}/materiales"] = (
+                lambda cancel, m=m: after_sync(
+                    "materiales",
+                    m["sheet_id"],
+                    run_sync_materiales_month(
+                        now.year, now.month, sheet_id=m["sheet_id"], cancel=cancel,
+                        api_url=m["api_url"], token=m["token"],
+                    ),
+                    cancel,
+                ),
+                m["timeout"],
+            )
+        if mo is not None:
+            tasks[f"{target['name']}/mano_obra"] = (
+                lambda cancel, mo=mo: after_sync(
+                    "mano_obra",
+                    mo["sheet_id"],
+                    sync_mano_obra(sheet_id=mo["sheet_id"], folder_id=mo["folder_id"], cancel=cancel),
+                    cancel,
+                ),
+                mo["timeout"],
+            )
+
+    if progress is not None:
+        for name in tasks:
+            progress(name, "en curso")
+    results = run_sources(tasks, on_done=progress, max_workers=max_workers)
+    for name, result in results.items():
+        target_name, source = name.rsplit("/", 1)
+        if source == "mano_obra":
+            result.setdefault("file_name", "")
+        out[target_name][source] = result
+
+    all_results = [r for by_source in out.values() for r in by_source.values()]
+    return {
+        "ok": all(r.get("ok") for r in all_results),
+        "rows_written": sum(r.get("rows_written") or 0 for r in all_results),
+        "targets": out,
+    }
@@ -0,0 +1,105 @@
+"""
+Warm-up del proceso: deja hecho al arrancar lo que si no pagaría el primer /sync
+(imports pesados, construcción del servicio Drive desde el discovery empaquetado,
+cliente gspread, token OAuth de la cuenta de servicio, sesión de Remitos).
+Lo llama gunicorn.conf.py al iniciar cada worker y main.py al correr en local.
+Cada paso se mide; el reporte queda en last_report (GET /health) y en /metrics.
+"""
+from __future__ import annotations
+
+import importlib
+import json
+import sys
+import time
+from typing import Callable, Dict, Optional
+
+from .config import SYNC_WARMUP_TIMEOUT
+
+last_report: Optional[dict] = None
+
+# Módulos que el primer sync importaría en frío
+HEAVY_MODULES = (
+    "googleapiclient.discovery",
+    "googleapiclient.http",
+    "google_auth_httplib2",
+    "gspread",
+    "sync.materiales",
+    "sync.mano_obra",
+    "sync.runner",
+    "sync.targets",
+    "sync.jobs",
+)
+
+
+def _import_modules() -> None:
+    for name in HEAVY_MODULES:
+        importlib.import_module(name)
+
+
+def _refresh_token() -> None:
+    """Intercambia el token OAuth ahora (con timeout) en vez de en el primer request."""
+    from google.auth.transport.requests import Request
+
+    from .google_clients import get_credentials
+
+    base = Request()
+
+    def request(*args, **kwargs):
+        kwargs.setdefault("timeout", SYNC_WARMUP_TIMEOUT)
+        return base(*args, **kwargs)
+
+    get_credentials().refresh(request)
+
+
+def _drive_service() -> None:
+    from .google_clients import get_drive_service
+
+    get_drive_service()
+
+
+def _gspread_client() -> None:
+    from .google_clients import get_gspread_client
+
+    get_gspread_client()
+
+
+def _remitos_session() -> None:
+    from .materiales import _get_session
+
+    _get_session()
+
+
+STEPS: Dict[str, Callable[[], None]] = {
+    "imports": _import_modules,
+    "drive_service": _drive_service,
+    "gspread_client": _gspread_client,
+    "oauth_token": _refresh_token,
+    "remitos_session": _remitos_session,
+}
+
+
+def warm_up() -> dict:
+    """
+    Corre todos los pasos; un paso que falla (p. ej. sin credenciales en local) no frena
+    a los demás ni al arranque. Retorna {"ok", "total_seconds", "steps": {paso: segundos},
+    "errors": {paso: mensaje}}.
+    """
+    global last_report
+    from . import metrics
+
+    start = time.monotonic()
+    steps: Dict[str, float] = {}
+    errors: Dict[str, str] = {}
+    for name, step in STEPS.items():
+        t0 = time.monotonic()
+        try:
+            step()
+        except Exception as e:
+            errors[name] = str(e)
+        steps[name] = round(time.monotonic() - t0, 3)
+        metrics.WARMUP_SECONDS.labels(name).set(steps[name])
+    total = round(time.monotonic() - start, 3)
+    metrics.WARMUP_SECONDS.labels("total").set(total)
+    last_report = {"ok": not errors, "total_seconds": total, "steps": steps, "errors": errors}
+    print(f"Warm-up: {json.dumps(last_report, ensure_ascii=False)}", file=sys.stderr)
+    return last_report
@@ -0,0 +1,31 @@
+"""
+Configuración común: estado local, snapshot y checkpoints en un directorio temporal y
+sin esperas del rate limit ni del backoff. Va antes de importar sync (la configuración
+se lee al importar sync.config).
+"""
+import os
+import tempfile
+
+_tmp = tempfile.mkdtemp(prefix="sync-tests-")
+os.environ.update(
+    SYNC_STATE_PATH=os.path.join(_tmp, "state.db"),
+    COSTOS_SNAPSHOT_PATH=os.path.join(_tmp, "costos.db"),
+    SHEETS_WRITES_PER_MINUTE="1000000",
+    SHEETS_BACKOFF="0",
+    SHEETS_RETENTION_MONTHS="0",
+    SYNC_TARGETS_FILE="",
+)
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture
+def fake_google():
+    """Clientes de Google en memoria (bench.fakes): (drive, sheets)."""
+    from bench.fakes import FakeDriveService, FakeSheetsClient
+    from sync.google_clients import reset_clients, use_clients
+
+    drive, sheets = FakeDriveService(), FakeSheetsClient()
+    use_clients(object(), drive, sheets)
+    yield drive, sheets
+    reset_clients()
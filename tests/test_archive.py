@@ -0,0 +1,85 @@
+from datetime import date
+
+import pytest
+
+from bench.data import documentos_by_day, generate_documentos
+from bench.fakes import FakeRemitosServer
+from sync import google_clients, materiales
+from sync.archive import archive_old_periods, cutoff_month, first_kept_month, month_of
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [(46023, "2026-01"), ("2026-03-15", "2026-03"), ("15/03/2026", "2026-03"), ("03/2026", "2026-03"), ("x", ""), (0, "")],
+)
+def test_month_of(value, expected):
+    assert month_of(value) == expected
+
+
+def test_cutoff_month():
+    assert cutoff_month(6, date(2026, 9, 15)) == "2026-04"
+    assert cutoff_month(1, date(2026, 1, 31)) == "2026-01"
+    assert cutoff_month(13, date(2026, 1, 1)) == "2025-01"
+
+
+def test_archived_months_are_not_synced_again(fake_google):
+    _, sheets = fake_google
+    docs = generate_documentos(300, "2026-04-01", "2026-09-30", seed=11)
+    server = FakeRemitosServer(documentos_by_day(docs)).start()
+    try:
+        sync = lambda f, t: materiales.sync_materiales(
+            f, t, sheet_id="M-arch", incremental=False, api_url=server.url, token="t"
+        )
+        assert sync("2026-04-01", "2026-09-30")["rows_written"] == 300
+        archived = archive_old_periods("materiales", "M-arch", months=3, today=date(2026, 9, 15))
+        assert archived["months"] == ["2026-04", "2026-05", "2026-06"]
+        ws = sheets.open_by_key("M-arch").worksheet("Materiales")
+        kept = len(ws.values) - 1
+        assert kept == 300 - archived["rows_archived"] and first_kept_month("materiales", "M-arch") == "2026-07"
+
+        # Sync completo del rango: los meses archivados no vuelven a la hoja
+        result = sync("2026-04-01", "2026-09-30")
+        assert result["ok"] and result.get("rows_appended", 0) == 0
+        assert len(ws.values) - 1 == kept
+        # Backfill de un mes archivado: se saltea sin llamar a Remitos
+        calls = server.calls["GET"]
+        month = materiales.run_sync_materiales_month(
+            2026, 5, sheet_id="M-arch", incremental=False, api_url=server.url, token="t"
+        )
+        assert month["skipped"] and month["archived"] and server.calls["GET"] == calls
+        assert len(ws.values) - 1 == kept
+        assert archive_old_periods("materiales", "M-arch", months=3, today=date(2026, 9, 15))["rows_archived"] == 0
+    finally:
+        server.stop()
+
+
+class _Writer:
+    """Cliente con escritura en Drive: solo debería usarse para crear el archivo."""
+
+    def __init__(self, sheets):
+        self._sheets = sheets
+        self.created = []
+
+    def create(self, title, folder_id=None):
+        self.created.append(title)
+        return self._sheets.create(title, folder_id=folder_id)
+
+
+def test_only_archive_creation_uses_the_write_client(fake_google):
+    drive, sheets = fake_google
+    writer = _Writer(sheets)
+    google_clients.use_clients(object(), drive, sheets, archive_client=writer)
+    docs = generate_documentos(30, "2026-05-01", "2026-09-30", seed=12)
+    server = FakeRemitosServer(documentos_by_day(docs)).start()
+    try:
+        materiales.sync_materiales(
+            "2026-05-01", "2026-09-30", sheet_id="M-write", incremental=False, api_url=server.url, token="t"
+        )
+    finally:
+        server.stop()
+    assert writer.created == []
+    archive_old_periods("materiales", "M-write", months=3, today=date(2026, 9, 15))
+    assert writer.created == ["M-write - Archivo 2026"]
+    # El segundo archivado encuentra el spreadsheet y no crea otro
+    archive_old_periods("materiales", "M-write", months=2, today=date(2026, 9, 15))
+    assert writer.created == ["M-write - Archivo 2026"]
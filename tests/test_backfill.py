@@ -0,0 +1,30 @@
+from collections import Counter
+
+from bench.data import documentos_by_day, generate_documentos
+from bench.fakes import FakeRemitosServer
+from sync.backfill import backfill, month_range
+from sync.materiales import _key_part
+
+
+def test_month_range():
+    assert month_range("2025-11", "2026-02") == [(2025, 11), (2025, 12), (2026, 1), (2026, 2)]
+
+
+def test_parallel_months_share_one_sheet(fake_google, monkeypatch):
+    _, sheets = fake_google
+    docs = generate_documentos(900, "2026-07-01", "2026-09-30", seed=3)
+    server = FakeRemitosServer(documentos_by_day(docs)).start()
+    monkeypatch.setattr("sync.targets.SHEET_ID_MATERIALES", "M-backfill")
+    monkeypatch.setattr("sync.targets.REMITOS_API_URL", server.url)
+    monkeypatch.setattr("sync.targets.REMITOS_BEARER_TOKEN", "t")
+    try:
+        for _ in range(2):
+            result = backfill("2026-07", "2026-09", sources=["materiales"], restart=True, max_workers=3)
+            assert result["ok"], result["items"]
+            assert len(result["items"]) == 3
+    finally:
+        server.stop()
+
+    doc = sheets.open_by_key("M-backfill")
+    keys = Counter(tuple(_key_part(v) for v in row[1:4]) for row in doc.worksheet("Materiales").values[1:])
+    assert len(keys) == 900 and max(keys.values()) == 1
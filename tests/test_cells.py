@@ -0,0 +1,124 @@
+import pytest
+
+from sync import cells
+
+
+@pytest.mark.parametrize(
+    "text, decimal, expected",
+    [
+        ("1.234,56", ",", 1234.56),
+        ("1,234.56", ".", 1234.56),
+        ("1234.5", ".", 1234.5),
+        ("$ 100", ".", 100),
+        ("-3,25", ",", -3.25),
+        ("1.000.000", ",", 1000000),
+        ("0", ".", 0),
+        ("0,5", ",", 0.5),
+        ("abc", ".", None),
+        ("1,2,3", ",", None),
+        ("1,234.5", ",", None),
+    ],
+)
+def test_parse_number(text, decimal, expected):
+    assert cells.parse_number(text, decimal) == expected
+
+
+@pytest.mark.parametrize("text", ["0012", "-012", "000", "0012,5", "1234567890123456"])
+def test_parse_number_keeps_codes_as_text(text):
+    assert cells.parse_number(text, ",") is None
+
+
+def test_integers_come_back_as_int():
+    assert isinstance(cells.parse_number("1.000", ","), int)
+
+
+def test_decimal_separator_per_column():
+    assert cells._decimal_separator(["1.234,5", "12"]) == ","
+    assert cells._decimal_separator(["1,234.5", "12"]) == "."
+    assert cells._decimal_separator(["1,5", "2"]) == ","
+    assert cells._decimal_separator(["1.000.000"]) == ","
+    assert cells._decimal_separator(["1,000,000"]) == "."
+
+
+def test_infer_and_convert():
+    types = cells.ColumnTypes.infer([
+        ["1.234,56", "05/10/2026", "00123", "x", "2026-10-05"],
+        ["12", "31/10/2026", "7", "1", "2026-10-31T00:00:00"],
+    ])
+    assert types.kinds == ["número", "fecha", "texto", "texto", "fecha"]
+    row = types.convert(["1.234,56", "05/10/2026", "00123", "x", "2026-10-05"])
+    assert row == [1234.56, 46300, "00123", "x", 46300]
+    assert types.date_patterns(offset=1) == {2: "dd/mm/yyyy", 5: "yyyy-mm-dd"}
+
+
+def test_convert_leaves_mismatches_as_text():
+    types = cells.ColumnTypes.infer([["10", "2026-01-01"], ["20", "2026-01-02"]])
+    assert types.convert(["n/a", "99/99/2026"]) == ["n/a", "99/99/2026"]
+    assert types.convert(["0012", None]) == ["0012", ""]
+
+
+def test_number_column_with_zero_padded_value_is_text():
+    types = cells.ColumnTypes.infer([["0012"], ["0100"]])
+    assert types.kinds == ["texto"]
+
+
+def test_typed_rows_is_lazy():
+    consumed = []
+
+    def rows():
+        for i in range(5):
+            consumed.append(i)
+            yield [str(i)]
+
+    typed = cells.TypedRows(rows(), sample=2)
+    assert typed.types is None and consumed == []
+    assert next(typed) == [0]
+    assert consumed == [0, 1]
+    assert list(typed) == [[1], [2], [3], [4]]
+    assert typed.date_patterns() == {}
+
+
+def test_typed_rows_empty():
+    typed = cells.TypedRows(iter(()))
+    assert list(typed) == []
+    assert typed.types is None and typed.date_patterns() == {}
+
+
+def test_date_format_requests():
+    (request,) = cells.date_format_requests(7, {2: "dd/mm/yyyy"})
+    rng = request["repeatCell"]["range"]
+    assert rng == {"sheetId": 7, "startRowIndex": 1, "startColumnIndex": 2, "endColumnIndex": 3}
+
+
+def test_text_columns_are_pinned():
+    types = cells.ColumnTypes.infer([["1042", 7, "10"], ["1043", 8.0, "20"]], text_columns=(0, 1))
+    assert types.kinds == ["texto", "texto", "número"]
+    assert types.convert(["1042", 8.0, "10"]) == ["1042", "8", 10]
+    typed = cells.TypedRows(iter([["1", "2"]]), text_columns=[0])
+    assert list(typed) == [["1", 2]]
+
+
+class _Doc:
+    """Spreadsheet mínimo que registra los batch_update."""
+
+    def __init__(self, doc_id):
+        self.id = doc_id
+        self.batches = []
+
+    def batch_update(self, body):
+        self.batches.append(body["requests"])
+
+
+def test_date_formats_are_applied_once_per_column():
+    doc = _Doc("F-once")
+    cells.apply_date_formats(doc, 3, {0: "yyyy-mm-dd"})
+    cells.apply_date_formats(doc, 3, {0: "yyyy-mm-dd"})
+    assert len(doc.batches) == 1
+    # Columna nueva o formato distinto: solo esas columnas
+    cells.apply_date_formats(doc, 3, {0: "yyyy-mm-dd", 4: "dd/mm/yyyy"})
+    cells.apply_date_formats(doc, 3, {0: "dd/mm/yyyy", 4: "dd/mm/yyyy"})
+    assert [[r["repeatCell"]["range"]["startColumnIndex"] for r in b] for b in doc.batches] == [[0], [4], [0]]
+    # Otra hoja del mismo spreadsheet
+    cells.apply_date_formats(doc, 5, {0: "dd/mm/yyyy"})
+    cells.apply_date_formats(doc, 5, {})
+    assert len(doc.batches) == 4
@@ -0,0 +1,135 @@
+import os
+import time
+from collections import Counter
+
+import pytest
+
+from bench.data import documentos_by_day, generate_documentos
+from bench.fakes import FakeRemitosServer, FakeWorksheet
+from sync import checkpoint, state
+from sync.config import SYNC_CHECKPOINT_DIR
+from sync.mano_obra import sync_mano_obra
+from sync.materiales import _key_part, sync_materiales
+from sync.sheets_writer import sheets_writer
+
+
+class WriteError(Exception):
+    pass
+
+
+@pytest.fixture
+def fail_after(monkeypatch):
+    """append_rows de la hoja falla a partir del lote número `n` + 1 (una vez)."""
+    monkeypatch.setattr(sheets_writer, "_batch_rows", 50)
+    original = FakeWorksheet.append_rows
+
+    def arm(n):
+        calls = Counter()
+
+        def append_rows(self, rows, **kwargs):
+            calls["n"] += 1
+            if calls["n"] == n + 1:
+                raise WriteError("se cortó la conexión")
+            return original(self, rows, **kwargs)
+
+        monkeypatch.setattr(FakeWorksheet, "append_rows", append_rows)
+
+    return arm
+
+
+def test_committed_batches_are_skipped_on_resume():
+    cp = checkpoint.start("test", "scope-a", "f1")
+    cp.set_append([[i] for i in range(10)])
+    cp.on_commit(3)
+    cp.on_commit(4)
+    again = checkpoint.load("test", "scope-a", "f1")
+    assert again.committed == 7
+    assert list(again.pending_append()) == [[7], [8], [9]]
+    again.clear()
+    assert checkpoint.load("test", "scope-a", "f1") is None
+
+
+def test_checkpoint_for_other_content_is_discarded():
+    cp = checkpoint.start("test", "scope-b", "f1", checkpoint.write_rows([["x"]]))
+    assert checkpoint.load("test", "scope-b", "f2") is None
+    assert not checkpoint._path(cp.content_ref).exists()
+
+
+def test_orphan_files_are_purged():
+    os.makedirs(SYNC_CHECKPOINT_DIR, exist_ok=True)
+    old = time.time() - 48 * 3600
+    orphan = os.path.join(SYNC_CHECKPOINT_DIR, ".muerto.tmp")
+    open(orphan, "w").close()
+    os.utime(orphan, (old, old))
+    kept = checkpoint.start("test", "scope-c", "f1", checkpoint.write_rows([["y"]]))
+    os.utime(checkpoint._path(kept.content_ref), (old, old))
+
+    checkpoint.start("test", "scope-d", "f1")
+    assert not os.path.exists(orphan)
+    assert checkpoint._path(kept.content_ref).exists()
+
+
+def test_materiales_resumes_without_calling_remitos(fake_google, fail_after):
+    _, sheets = fake_google
+    docs = generate_documentos(200, "2026-08-01", "2026-08-31", seed=3)
+    server = FakeRemitosServer(documentos_by_day(docs)).start()
+    try:
+        fail_after(2)
+        with pytest.raises(WriteError):
+            sync_materiales("2026-08-01", "2026-08-31", sheet_id="M-cp", api_url=server.url, token="t")
+        ws = sheets.open_by_key("M-cp").worksheet("Materiales")
+        committed = len(ws.values) - 1
+        assert 0 < committed < 200
+        remitos_calls = server.calls["GET"]
+
+        result = sync_materiales("2026-08-01", "2026-08-31", sheet_id="M-cp", api_url=server.url, token="t")
+        assert result["resumed"] and result["rows_already_appended"] == committed
+        assert result["rows_appended"] == 200 - committed
+        assert server.calls["GET"] == remitos_calls
+    finally:
+        server.stop()
+    keys = Counter(tuple(_key_part(v) for v in row[1:4]) for row in ws.values[1:])
+    assert len(keys) == 200 and max(keys.values()) == 1
+    assert state.get_checkpoint("materiales", "M-cp:2026-08-01:2026-08-31") is None
+
+
+def _csv(n):
+    rows = [f"{i % 4},Obra {i % 4},{i % 28 + 1:02d}/07/2026,{i:05d},8,{i}.5" for i in range(1, n + 1)]
+    return ("idObr,Obra,Fecha,Legajo,Horas,Importe\n" + "\n".join(rows) + "\n").encode("utf-8")
+
+
+def test_mano_obra_resume_appends_only_missing_rows(fake_google, fail_after):
+    drive, sheets = fake_google
+    # Más filas que la muestra de tipos (cells.SAMPLE_ROWS): el corte llega a mitad de la descarga
+    drive.add_file("mo-cp", "Costos_07_2026.CSV", _csv(1500), "2026-08-01T00:00:00.000Z", "mo-cp")
+    fail_after(2)
+    with pytest.raises(WriteError):
+        sync_mano_obra(sheet_id="MO-cp", folder_id="mo-cp")
+    ws = sheets.open_by_key("MO-cp").worksheet("Mano de obra")
+    committed = len(ws.values) - 1
+    assert 0 < committed < 1500
+    # El spool incompleto se descartó: no queda contenido en el checkpoint
+    assert state.get_checkpoint("mano_obra", "MO-cp:07/2026")["content_ref"] == ""
+
+    result = sync_mano_obra(sheet_id="MO-cp", folder_id="mo-cp")
+    assert result["resumed"] and result["rows_already_appended"] == committed
+    assert result["rows_appended"] == 1500 - committed
+    legajos = Counter(row[4] for row in ws.values[1:])
+    assert len(legajos) == 1500 and max(legajos.values()) == 1
+    assert sync_mano_obra(sheet_id="MO-cp", folder_id="mo-cp")["skipped"]
+
+
+def test_mano_obra_resume_reads_csv_from_checkpoint(fake_google, fail_after):
+    drive, sheets = fake_google
+    # Archivo chico: la muestra de tipos lo lee completo antes del primer lote y el spool queda entero
+    drive.add_file("mo-cp2", "Costos_06_2026.CSV", _csv(200), "2026-07-01T00:00:00.000Z", "mo-cp2")
+    fail_after(2)
+    with pytest.raises(WriteError):
+        sync_mano_obra(sheet_id="MO-cp2", folder_id="mo-cp2")
+    downloads = drive.calls["get_media"]
+
+    result = sync_mano_obra(sheet_id="MO-cp2", folder_id="mo-cp2")
+    assert result["resumed"] and result["rows_appended"] + result["rows_already_appended"] == 200
+    assert drive.calls["get_media"] == downloads
+    ws = sheets.open_by_key("MO-cp2").worksheet("Mano de obra")
+    assert len(ws.values) == 1 + 200
@@ -0,0 +1,92 @@
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+
+from sync import drive_listing
+from sync.drive_listing import list_folder_files
+from sync.state import get_meta, set_meta
+
+
+def _names(files):
+    return sorted(f["name"] for f in files)
+
+
+def _key(folder):
+    return f"{folder}|text/csv"
+
+
+@pytest.fixture
+def folder(fake_google):
+    """(drive, carpeta con un CSV); carpeta distinta por test porque el listado cacheado persiste."""
+    drive, _ = fake_google
+    folder_id = f"dl-{uuid.uuid4().hex[:8]}"
+    drive.add_file(f"{folder_id}-1", "Costos_08_2026.CSV", b"a", folder_id=folder_id)
+    return drive, folder_id
+
+
+def test_changes_feed_after_first_listing(folder):
+    drive, f = folder
+    assert _names(list_folder_files(f)) == ["Costos_08_2026.CSV"]
+    assert drive.calls["files.list"] == 1 and drive.calls["changes.getStartPageToken"] == 1
+    token = get_meta(f"drive_changes_token:{_key(f)}")
+    assert token == str(len(drive.log))
+
+    # Sin cambios: una sola llamada al feed y el token se mantiene
+    assert _names(list_folder_files(f)) == ["Costos_08_2026.CSV"]
+    assert drive.calls["changes.list"] == 1 and drive.calls["files.list"] == 1
+
+    drive.add_file(f"{f}-2", "Costos_09_2026.CSV", b"b", folder_id=f)
+    drive.add_file(f"{f}-x", "Otro.CSV", b"c", folder_id="otra-carpeta")
+    assert _names(list_folder_files(f)) == ["Costos_08_2026.CSV", "Costos_09_2026.CSV"]
+    assert drive.calls["files.list"] == 1
+    assert get_meta(f"drive_changes_token:{_key(f)}") == str(len(drive.log))
+
+
+def test_removed_trashed_and_moved_files_leave_the_listing(folder):
+    drive, f = folder
+    for i in (2, 3, 4):
+        drive.add_file(f"{f}-{i}", f"Costos_0{i}_2026.CSV", b"x", folder_id=f)
+    assert len(list_folder_files(f)) == 4
+    drive.remove_file(f"{f}-2")
+    drive.remove_file(f"{f}-3", trashed=True)
+    drive.add_file(f"{f}-4", "Costos_04_2026.CSV", b"x", folder_id="otra-carpeta")
+    assert _names(list_folder_files(f)) == ["Costos_08_2026.CSV"]
+    assert drive.calls["files.list"] == 1
+
+
+def test_full_listing_after_max_age(folder):
+    drive, f = folder
+    list_folder_files(f)
+    old = (datetime.utcnow() - timedelta(hours=drive_listing.DRIVE_FULL_LISTING_HOURS + 1)).isoformat(timespec="seconds")
+    set_meta(f"drive_listed_at:{_key(f)}", old)
+    list_folder_files(f)
+    assert drive.calls["files.list"] == 2 and drive.calls["changes.list"] == 0
+    assert get_meta(f"drive_listed_at:{_key(f)}") > old
+    # Listado nuevo: vuelve a usar el feed
+    list_folder_files(f)
+    assert drive.calls["files.list"] == 2 and drive.calls["changes.list"] == 1
+
+
+def test_invalid_token_falls_back_to_full_listing(folder, monkeypatch):
+    import httplib2
+    from googleapiclient.errors import HttpError
+
+    drive, f = folder
+    list_folder_files(f)
+
+    def expired(self, pageToken, **kwargs):
+        raise HttpError(httplib2.Response({"status": 410}), b"token expired")
+
+    monkeypatch.setattr(type(drive.changes()), "list", expired)
+    drive.add_file(f"{f}-2", "Costos_09_2026.CSV", b"b", folder_id=f)
+    assert _names(list_folder_files(f)) == ["Costos_08_2026.CSV", "Costos_09_2026.CSV"]
+    assert drive.calls["files.list"] == 2
+
+
+def test_without_changes_feed_always_lists(folder, monkeypatch):
+    monkeypatch.setattr(drive_listing, "DRIVE_CHANGES_FEED", False)
+    drive, f = folder
+    list_folder_files(f)
+    list_folder_files(f)
+    assert drive.calls["files.list"] == 2 and drive.calls["changes.getStartPageToken"] == 0
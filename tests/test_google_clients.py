@@ -0,0 +1,19 @@
+from sync import google_clients
+
+DRIVE = "https://www.googleapis.com/auth/drive"
+
+
+def test_drive_is_read_only_except_for_archive():
+    assert DRIVE + ".readonly" in google_clients.SCOPES and DRIVE not in google_clients.SCOPES
+    assert DRIVE in google_clients.ARCHIVE_SCOPES
+
+
+def test_archive_client_defaults_to_installed_client():
+    client, writer = object(), object()
+    try:
+        google_clients.use_clients(object(), object(), client)
+        assert google_clients.get_archive_client() is client
+        google_clients.use_clients(object(), object(), client, archive_client=writer)
+        assert google_clients.get_archive_client() is writer and google_clients.get_gspread_client() is client
+    finally:
+        google_clients.reset_clients()
@@ -0,0 +1,91 @@
+import threading
+import time
+
+import pytest
+
+from main import app
+from sync import health, targets
+
+
+def _slow(release: threading.Event, calls: list):
+    def probe():
+        calls.append(1)
+        release.wait(5)
+        return "lento"
+
+    return probe
+
+
+@pytest.fixture
+def release():
+    event = threading.Event()
+    yield event
+    event.set()  # libera las sondas colgadas del pool
+
+
+def test_slow_probe_times_out_and_is_not_started_again(release):
+    calls = []
+    probes = {"h1/lenta": _slow(release, calls), "h1/rapida": lambda: "ok"}
+    start = time.monotonic()
+    results = health.run_probes(probes, timeout=0.2)
+    assert time.monotonic() - start < 1
+    assert results["h1/rapida"]["ok"] and results["h1/rapida"]["detail"] == "ok"
+    assert not results["h1/lenta"]["ok"] and results["h1/lenta"]["error"].startswith("timeout")
+
+    # Sigue colgada: se informa como timeout sin lanzar otra
+    assert not health.run_probes(probes, timeout=0.05)["h1/lenta"]["ok"]
+    assert len(calls) == 1 and "h1/lenta" in health._inflight
+
+    # Terminó: el chequeo siguiente la vuelve a correr
+    release.set()
+    health._inflight["h1/lenta"].result(timeout=5)
+    assert health.run_probes(probes, timeout=1)["h1/lenta"]["detail"] == "lento"
+    assert len(calls) == 2
+
+
+def test_failing_probe_reports_error():
+    def broken():
+        raise RuntimeError("sin conexión")
+
+    results = health.run_probes({"h2/rota": broken}, timeout=1)
+    assert results["h2/rota"]["ok"] is False and results["h2/rota"]["error"] == "sin conexión"
+
+
+@pytest.fixture
+def fake_probes(monkeypatch):
+    """deep_check con las sondas del test (sin targets reales) y sin resultado cacheado."""
+    probes = {}
+    monkeypatch.setattr(targets, "load_targets", lambda: [])
+    monkeypatch.setattr(health, "build_probes", lambda _: probes)
+    monkeypatch.setattr(health, "_cached", None)
+    return probes
+
+
+def test_deep_check_is_cached(fake_probes):
+    calls = []
+    fake_probes["h3/sheet"] = lambda: calls.append(1) or "Hoja"
+    first = health.deep_check()
+    second = health.deep_check()
+    assert first["ok"] and not first["cached"] and second["cached"] and len(calls) == 1
+    assert second["probes"] == first["probes"]
+    assert not health.deep_check(force=True)["cached"] and len(calls) == 2
+
+
+def test_slow_deep_check_does_not_block_health(fake_probes, monkeypatch, release):
+    calls = []
+    fake_probes["h4/lenta"] = _slow(release, calls)
+    run_probes = health.run_probes
+    monkeypatch.setattr(health, "run_probes", lambda probes: run_probes(probes, timeout=0.5))
+    client = app.test_client()
+    deep = {}
+    thread = threading.Thread(target=lambda: deep.update(resp=client.get("/health/deep?refresh=1")))
+    thread.start()
+    while not calls:
+        time.sleep(0.01)
+    start = time.monotonic()
+    assert client.get("/health").status_code == 200
+    assert time.monotonic() - start < 0.3
+    thread.join(5)
+    resp = deep["resp"]
+    assert resp.status_code == 503
+    assert resp.get_json()["probes"]["h4/lenta"]["error"].startswith("timeout")
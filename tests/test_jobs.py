@@ -0,0 +1,46 @@
+import threading
+import time
+
+import pytest
+
+from sync.jobs import JobConflict, JobRunner
+from sync.runner import check_cancelled, run_sources
+
+
+def _blocking(release):
+    return lambda job: (release.wait(5), {"ok": True})[1]
+
+
+def test_same_key_joins_and_overlapping_sheets_conflict():
+    runner, release = JobRunner(), threading.Event()
+    job, created = runner.submit("backfill:default:2026-01:2026-02", _blocking(release), ["M", "O"])
+    assert created
+    joined, created = runner.submit("backfill:default:2026-01:2026-02", _blocking(release), ["M", "O"])
+    assert joined is job and not created
+    with pytest.raises(JobConflict) as e:
+        runner.submit("default", _blocking(release), ["M"])
+    assert e.value.job is job
+    other, created = runner.submit("otro", _blocking(release), ["X"])
+    assert created
+    release.set()
+    job.wait(5)
+    other.wait(5)
+    assert runner.submit("default", lambda job: {"ok": True}, ["M"])[1]
+
+
+def test_run_sources_waits_for_expired_tasks():
+    steps = []
+
+    def slow(cancel):
+        for i in range(20):
+            time.sleep(0.05)
+            check_cancelled(cancel)
+            steps.append(i)
+        return {"ok": True}
+
+    results = run_sources({"lenta": (slow, 0.12), "rapida": (lambda cancel: {"ok": True}, 5)})
+    assert results["lenta"]["error"].startswith("timeout")
+    assert results["rapida"]["ok"]
+    done = len(steps)
+    time.sleep(0.15)
+    assert len(steps) == done < 20
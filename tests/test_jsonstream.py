@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+from sync.jsonstream import iter_array_items
+
+BODY = {
+    "total": 3,
+    "meta": {"documentos": ["no es este"]},
+    "documentos": [
+        {"NroDoc": 1, "Total": 12.5, "Cuenta": "Obra ñandú"},
+        {"NroDoc": 2, "Total": 1e3, "Items": [1, 2, {"a": None}]},
+        12345,
+    ],
+    "next": None,
+}
+
+
+def _chunks(data: bytes, size: int):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, 100000])
+def test_items_across_chunk_boundaries(size):
+    data = json.dumps(BODY, ensure_ascii=False).encode("utf-8")
+    assert list(iter_array_items(_chunks(data, size), "documentos")) == BODY["documentos"]
+
+
+def test_number_split_at_chunk_end():
+    assert list(iter_array_items([b'{"d": [12', b"34, 5", b"6]}"], "d")) == [1234, 56]
+
+
+@pytest.mark.parametrize("body", [b"{}", b'{"otro": [1]}', b'{"d": null}', b'{"d": []}'])
+def test_missing_or_empty_key(body):
+    assert list(iter_array_items([body], "d")) == []
+
+
+@pytest.mark.parametrize("body", [b"[1, 2]", b'{"d": [1 2]}', b'{"d": [1, 2}'])
+def test_invalid_json(body):
+    with pytest.raises(ValueError):
+        list(iter_array_items([body], "d"))
@@ -0,0 +1,152 @@
+from collections import Counter
+
+import pytest
+
+from bench.fakes import FakeWorksheet
+from sync import mano_obra
+from sync.mano_obra import SheetLayout, _locate, row_fingerprint, sync_mano_obra
+
+HEADER = "idObr,Obra,Fecha,Legajo,Horas,Importe\n"
+
+
+def test_fingerprint_matches_typed_rows_and_sheet_values():
+    assert row_fingerprint("10/2026", [1, "Obra", 8, 1234.5]) == row_fingerprint(
+        "10/2026", [1.0, "Obra", 8.0, 1234.5]
+    )
+    # El texto queda tal cual: un Legajo "0012" no es el número 12
+    assert row_fingerprint("10/2026", ["0012"]) != row_fingerprint("10/2026", [12])
+    assert row_fingerprint("10/2026", ["0012"]) != row_fingerprint("10/2026", ["012"])
+
+
+def test_fingerprint_ignores_trailing_empty_cells():
+    assert row_fingerprint("10/2026", ["a", "b", "", ""]) == row_fingerprint("10/2026", ["a", "b"])
+
+
+def test_fingerprint_depends_on_periodo_and_order():
+    base = row_fingerprint("10/2026", ["a", "b"])
+    assert base != row_fingerprint("11/2026", ["a", "b"])
+    assert base != row_fingerprint("10/2026", ["b", "a"])
+
+
+def test_locate_repeated_fingerprints():
+    located = [(2, "x"), (3, "y"), (4, "x"), (5, "z")]
+    assert _locate(located, Counter({"x": 2})) == [2, 4]
+    assert _locate(located, Counter({"x": 3})) is None
+    assert _locate(located, Counter()) == []
+
+
+def test_layout_delete_and_append():
+    layout = SheetLayout([["09/2026", 2, 5], ["10/2026", 6, 9], ["09/2026", 10, 11]], 11)
+    layout.delete([3, 7, 8])
+    assert layout.ranges == [["09/2026", 2, 4], ["10/2026", 5, 6], ["09/2026", 7, 8]] and layout.total == 8
+    layout.append("09/2026", 2)
+    layout.append("10/2026", 1)
+    assert layout.ranges[-2:] == [["09/2026", 7, 10], ["10/2026", 11, 11]] and layout.total == 11
+    assert layout.rows("10/2026") == [5, 6, 11]
+    layout.delete([2, 3, 4])
+    assert layout.ranges[0] == ["10/2026", 2, 3]
+
+
+def _csv(rows):
+    return (HEADER + "\n".join(rows) + "\n").encode("utf-8")
+
+
+def _rows(n):
+    return [f"{i % 3},Obra {i % 3},{i % 28 + 1:02d}/10/2026,{i:05d},8,\"{i}.234,50\"" for i in range(1, n + 1)]
+
+
+def test_second_run_writes_only_changed_rows(fake_google):
+    drive, sheets = fake_google
+    rows = _rows(40)
+    drive.add_file("mo-1", "Costos_10_2026.CSV", _csv(rows), "2026-10-01T00:00:00.000Z", "mo-delta")
+    first = sync_mano_obra(sheet_id="MO-delta", folder_id="mo-delta")
+    assert first["rows_appended"] == 40
+
+    rows[5] = rows[5].replace(",8,", ",9,")
+    del rows[10]
+    drive.add_file("mo-1", "Costos_10_2026.CSV", _csv(rows), "2026-10-02T00:00:00.000Z", "mo-delta")
+    second = sync_mano_obra(sheet_id="MO-delta", folder_id="mo-delta")
+    assert (second["rows_updated"], second["rows_appended"], second["rows_deleted"]) == (1, 0, 1)
+    assert second["rows_unchanged"] == 38
+
+    ws = sheets.open_by_key("MO-delta").worksheet("Mano de obra")
+    assert len(ws.values) == 1 + 39
+    # Legajo con ceros a la izquierda queda como texto; Importe con formato local, como número
+    assert ws.values[1][4] == "00001" and ws.values[1][6] == 1234.5
+
+
+def test_same_file_is_skipped(fake_google):
+    drive, _ = fake_google
+    drive.add_file("mo-2", "Costos_09_2026.CSV", _csv(_rows(5)), folder_id="mo-same")
+    sync_mano_obra(sheet_id="MO-same", folder_id="mo-same")
+    assert sync_mano_obra(sheet_id="MO-same", folder_id="mo-same")["skipped"]
+
+
+def test_leading_zero_change_is_detected(fake_google):
+    drive, sheets = fake_google
+    rows = _rows(10)
+    drive.add_file("mo-3", "Costos_10_2026.CSV", _csv(rows), "2026-10-01T00:00:00.000Z", "mo-zero")
+    sync_mano_obra(sheet_id="MO-zero", folder_id="mo-zero")
+    rows[0] = rows[0].replace(",00001,", ",0001,")
+    drive.add_file("mo-3", "Costos_10_2026.CSV", _csv(rows), "2026-10-02T00:00:00.000Z", "mo-zero")
+    second = sync_mano_obra(sheet_id="MO-zero", folder_id="mo-zero")
+    assert second["rows_updated"] == 1
+    ws = sheets.open_by_key("MO-zero").worksheet("Mano de obra")
+    assert [r[4] for r in ws.values[1:]].count("0001") == 1
+
+
+def test_layout_is_reused_without_reading_column_a(fake_google, monkeypatch):
+    drive, sheets = fake_google
+    scans = []
+    col_values = FakeWorksheet.col_values
+    monkeypatch.setattr(FakeWorksheet, "col_values", lambda self, col, **kw: scans.append(col) or col_values(self, col))
+    rows = _rows(30)
+    drive.add_file("mo-4", "Costos_10_2026.CSV", _csv(rows), "2026-10-01T00:00:00.000Z", "mo-layout")
+    sync_mano_obra(sheet_id="MO-layout", folder_id="mo-layout")
+    assert len(scans) == 1
+    rows[3] = rows[3].replace(",8,", ",7,")
+    del rows[20]
+    drive.add_file("mo-4", "Costos_10_2026.CSV", _csv(rows), "2026-10-02T00:00:00.000Z", "mo-layout")
+    sync_mano_obra(sheet_id="MO-layout", folder_id="mo-layout")
+    rows.append("4,Obra 4,01/10/2026,00099,8,\"1,00\"")
+    drive.add_file("mo-4", "Costos_10_2026.CSV", _csv(rows), "2026-10-03T00:00:00.000Z", "mo-layout")
+    third = sync_mano_obra(sheet_id="MO-layout", folder_id="mo-layout")
+    assert third["rows_appended"] == 1 and len(scans) == 1
+
+    # Una fila agregada a mano al final: los tramos no coinciden y se vuelve a leer la columna A
+    ws = sheets.open_by_key("MO-layout").worksheet("Mano de obra")
+    ws.values.append(["11/2026", "x"])
+    del rows[0]
+    drive.add_file("mo-4", "Costos_10_2026.CSV", _csv(rows), "2026-10-04T00:00:00.000Z", "mo-layout")
+    fourth = sync_mano_obra(sheet_id="MO-layout", folder_id="mo-layout")
+    assert fourth["rows_deleted"] == 1 and len(scans) == 2
+    assert ws.values[-1] == ["11/2026", "x"] and len(ws.values) == 1 + 29 + 1
+
+
+@pytest.mark.parametrize("checkpoints", [True, False])
+def test_mismatch_replaces_period_from_spooled_rows(fake_google, monkeypatch, checkpoints):
+    monkeypatch.setattr(mano_obra, "SYNC_CHECKPOINTS", checkpoints)
+    drive, sheets = fake_google
+    folder, sid = f"mo-replay-{checkpoints}", f"MO-replay-{checkpoints}"
+    rows = _rows(12)
+    drive.add_file("mo-5", "Costos_10_2026.CSV", _csv(rows), "2026-10-01T00:00:00.000Z", folder)
+    sync_mano_obra(sheet_id=sid, folder_id=folder)
+    ws = sheets.open_by_key(sid).worksheet("Mano de obra")
+    # Edición manual de la fila que después cambia en el CSV: las huellas no la ubican
+    ws.values[6][5] = 99
+    rows[5] = rows[5].replace(",8,", ",9,")
+    drive.add_file("mo-5", "Costos_10_2026.CSV", _csv(rows), "2026-10-02T00:00:00.000Z", folder)
+    downloads = drive.calls["get_media"]
+    second = sync_mano_obra(sheet_id=sid, folder_id=folder)
+    assert drive.calls["get_media"] == downloads + 1
+    assert second["rows_updated"] == 12 and second["rows_deleted"] == 0
+    assert [r[5] for r in ws.values[1:]] == [9 if i == 5 else 8 for i in range(12)]
+
+
+def test_identifier_columns_stay_text(fake_google):
+    drive, sheets = fake_google
+    drive.add_file("mo-6", "Costos_10_2026.CSV", _csv(_rows(6)), "2026-10-01T00:00:00.000Z", "mo-text")
+    sync_mano_obra(sheet_id="MO-text", folder_id="mo-text")
+    ws = sheets.open_by_key("MO-text").worksheet("Mano de obra")
+    assert all(isinstance(r[1], str) and isinstance(r[4], str) for r in ws.values[1:])
+    assert isinstance(ws.values[1][5], int)  # Horas sigue como número
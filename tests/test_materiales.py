@@ -0,0 +1,97 @@
+import json
+from collections import Counter
+
+import pytest
+
+from bench.data import documentos_by_day, generate_documentos
+from bench.fakes import FakeRemitosServer
+from sync import materiales, state
+from sync.materiales import _date_windows, _fecha_iso, _key_part, sync_materiales
+
+
+def test_date_windows_overlap_on_limit_day():
+    assert _date_windows("2026-01-01", "2026-01-20", 7) == [
+        ("2026-01-01", "2026-01-08"),
+        ("2026-01-08", "2026-01-15"),
+        ("2026-01-15", "2026-01-20"),
+    ]
+
+
+@pytest.mark.parametrize("days", [0, -1])
+def test_date_windows_without_split(days):
+    assert _date_windows("2026-01-01", "2026-01-20", days) == [("2026-01-01", "2026-01-20")]
+
+
+def test_date_windows_single_day():
+    assert _date_windows("2026-01-05", "2026-01-05", 7) == [("2026-01-05", "2026-01-05")]
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [(46023, "2026-01-01"), (46023.5, "2026-01-01"), ("2026-01-01T00:00:00", "2026-01-01"), ("01/01/2026", "2026-01-01")],
+)
+def test_fecha_iso(value, expected):
+    assert _fecha_iso(value) == expected
+
+
+@pytest.mark.parametrize("value, expected", [("000123", "123"), (123, "123"), (123.0, "123"), ("A", "A"), (None, ""), ("000", "0")])
+def test_key_part(value, expected):
+    assert _key_part(value) == expected
+
+
+@pytest.fixture
+def remitos():
+    docs = generate_documentos(300, "2026-09-01", "2026-09-30", seed=7)
+    server = FakeRemitosServer(documentos_by_day(docs)).start()
+    yield server, docs
+    server.stop()
+
+
+def _sync(server, sheet_id, **kwargs):
+    return sync_materiales("2026-09-01", "2026-09-30", sheet_id=sheet_id, api_url=server.url, token="t", **kwargs)
+
+
+def _sheet_keys(sheets, sheet_id):
+    ws = sheets.open_by_key(sheet_id).worksheet("Materiales")
+    return Counter(tuple(_key_part(v) for v in row[1:4]) for row in ws.values[1:])
+
+
+def test_incremental_writes_only_the_delta(fake_google, remitos):
+    _, sheets = fake_google
+    server, docs = remitos
+    assert _sync(server, "M-delta")["rows_written"] == 300
+
+    changed = dict(docs[-1], TOTAL=1.5)
+    server.by_day[changed["FECHA"][:10]][-1] = json.dumps(changed).encode("utf-8")
+    result = _sync(server, "M-delta")
+    assert result["incremental"] and result["rows_written"] == 1 and result["rows_updated"] == 1
+
+    keys = _sheet_keys(sheets, "M-delta")
+    assert len(keys) == 300 and max(keys.values()) == 1
+
+
+def test_unchanged_incremental_is_skipped(fake_google, remitos):
+    server, _ = remitos
+    _sync(server, "M-same")
+    result = _sync(server, "M-same")
+    assert result["skipped"] and result["rows_written"] == 0
+
+
+def test_empty_incremental_fetch_keeps_cached_rows(fake_google, remitos):
+    _, sheets = fake_google
+    server, _ = remitos
+    _sync(server, "M-empty")
+    server.by_day = {}
+    result = _sync(server, "M-empty")
+    assert result["skipped"] and result["documents_fetched"] == 0
+    assert sum(_sheet_keys(sheets, "M-empty").values()) == 300
+
+
+def test_backfill_does_not_lower_high_water_mark(fake_google, remitos):
+    server, _ = remitos
+    _sync(server, "M-hwm")
+    assert state.get_meta("remitos_hwm:M-hwm") == "2026-09-30"
+    materiales.run_sync_materiales_month(2026, 9, sheet_id="M-hwm", incremental=False, api_url=server.url, token="t")
+    server.by_day = {k: v for k, v in server.by_day.items() if k < "2026-09-10"}
+    sync_materiales("2026-09-01", "2026-09-09", sheet_id="M-hwm", incremental=False, api_url=server.url, token="t")
+    assert state.get_meta("remitos_hwm:M-hwm") == "2026-09-30"
@@ -0,0 +1,116 @@
+import json
+import sqlite3
+from collections import Counter
+
+import pytest
+
+from bench.data import documentos_by_day, generate_documentos
+from bench.fakes import FakeRemitosServer
+from sync import materiales, state
+from sync.materiales import _key_part
+from sync.partitions import partition_title, write_partitions
+
+HEADERS = ["Periodo", "Obra", "Valor"]
+
+
+def test_partition_title():
+    assert partition_title("Materiales", "10/20") == "Materiales - 10 20"
+    assert partition_title("Materiales", "") == "Materiales - sin obra"
+    assert len(partition_title("Materiales", "x" * 200)) == 100
+
+
+def test_write_partitions_replaces_matching_rows(fake_google):
+    _, sheets = fake_google
+    doc = sheets.open_by_key("P-unit")
+    periodo = lambda p: (lambda values: values[0] == p)
+    write_partitions(doc, "Base", HEADERS, {"a": [["09", "a", 1], ["10", "a", 2]], "b": [["10", "b", 3]]}, periodo("10"))
+    result = write_partitions(doc, "Base", HEADERS, {"a": [["10", "a", 4]]}, periodo("10"), scan_all=True)
+    assert result["rows_deleted"] == 2 and result["sheets_created"] == 0
+    assert doc.sheets["Base - a"].values == [HEADERS, ["09", "a", 1], ["10", "a", 4]]
+    assert doc.sheets["Base - b"].values == [HEADERS]
+
+
+def test_date_formats_only_for_new_sheets(fake_google, monkeypatch):
+    _, sheets = fake_google
+    doc = sheets.open_by_key("P-fmt")
+    batches = []
+    batch_update = type(doc).batch_update
+    monkeypatch.setattr(type(doc), "batch_update", lambda self, body: batches.append(body) or batch_update(self, body))
+    formats = lambda body: [r for r in body["requests"] if "repeatCell" in r]
+    write = lambda groups: write_partitions(
+        doc, "Base", HEADERS, groups, lambda values: False, date_patterns={0: "yyyy-mm-dd"}
+    )
+    write({"a": [["10", "a", 1]]})
+    assert len(formats(batches[-1])) == 1
+    write({"a": [["10", "a", 2]], "b": [["10", "b", 3]]})
+    assert [r["repeatCell"]["range"]["sheetId"] for r in formats(batches[-1])] == [doc.sheets["Base - b"].id]
+
+
+@pytest.fixture
+def partitioned(monkeypatch):
+    monkeypatch.setattr(materiales, "SHEETS_PARTITION_BY_OBRA", True)
+    docs = generate_documentos(120, "2026-09-01", "2026-09-30", obras=4, seed=5)
+    server = FakeRemitosServer(documentos_by_day(docs)).start()
+    yield server, docs
+    server.stop()
+
+
+def _partition_keys(doc):
+    out = {}
+    for title, ws in doc.sheets.items():
+        if title.startswith("Materiales - "):
+            out[title[len("Materiales - "):]] = Counter(tuple(_key_part(v) for v in row[1:4]) for row in ws.values[1:])
+    return out
+
+
+def test_materiales_partitions_get_only_the_delta(fake_google, partitioned):
+    _, sheets = fake_google
+    server, docs = partitioned
+    sync = lambda: materiales.sync_materiales(
+        "2026-09-01", "2026-09-30", sheet_id="P-mat", api_url=server.url, token="t"
+    )
+    first = sync()
+    assert first["partitions"]["sheets_created"] == 4
+    doc = sheets.open_by_key("P-mat")
+    assert sum(sum(c.values()) for c in _partition_keys(doc).values()) == 120
+
+    # Un documento cambia de importe, otro de obra y otro desaparece
+    changed, moved, gone = dict(docs[-1], TOTAL=1.5), dict(docs[-2], CUENTA="9999"), docs[-3]
+    server.by_day = documentos_by_day(docs[:-3] + [moved, changed])
+
+    second = sync()
+    parts = second["partitions"]
+    assert parts["sheets_created"] == 1  # la obra nueva se arma desde el cache
+    assert parts["rows_written"] == 2 and parts["rows_deleted"] == 3
+    keys = _partition_keys(doc)
+    key = lambda d: (d["TIPDOCUM"], _key_part(d["SERIEDOCUM"]), _key_part(d["NRODOCUM"]))
+    assert keys["9999"] == Counter({key(moved): 1})
+    assert all(key(gone) not in c for c in keys.values())
+    assert sum(sum(c.values()) for c in keys.values()) == 119
+    assert max(max(c.values()) for c in keys.values()) == 1
+    row = next(r for r in doc.sheets[f"Materiales - {changed['CUENTA']}"].values if _key_part(r[3]) == key(changed)[2])
+    assert row[7] == 1.5
+
+
+def test_cache_migration_adds_cuenta(tmp_path):
+    path = str(tmp_path / "old.sqlite3")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        """
+        CREATE TABLE remitos_cache (
+            sheet_id TEXT NOT NULL, tipdoc TEXT NOT NULL, serie TEXT NOT NULL, nrodoc TEXT NOT NULL,
+            fecha TEXT NOT NULL, row_json TEXT NOT NULL, row_hash TEXT NOT NULL, updated_at TEXT NOT NULL,
+            PRIMARY KEY (sheet_id, tipdoc, serie, nrodoc)
+        )
+        """
+    )
+    row = ["2026-09-01", "RM", "1", "10", "1042", "Obra", "", 1.0, "1"]
+    conn.execute("INSERT INTO remitos_cache VALUES ('S', 'RM', '1', '10', '2026-09-01', ?, 'h', 'x')", (json.dumps(row),))
+    conn.commit()
+    conn.close()
+    with state.connect(path) as conn:
+        assert conn.execute("SELECT cuenta FROM remitos_cache").fetchone()[0] == "1042"
+        plan = " ".join(r[3] for r in conn.execute(
+            "EXPLAIN QUERY PLAN SELECT row_json FROM remitos_cache WHERE sheet_id = 'S' AND cuenta = '1042'"
+        ))
+    assert "remitos_cache_cuenta" in plan
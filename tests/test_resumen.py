@@ -0,0 +1,127 @@
+from collections import defaultdict
+
+import pytest
+
+from bench.data import documentos_by_day, generate_documentos
+from bench.fakes import FakeRemitosServer
+from sync import mano_obra, materiales, state
+from sync.resumen import to_number
+
+HEADER = "idObr,Obra,Fecha,Legajo,Horas,Importe\n"
+
+
+@pytest.mark.parametrize(
+    "value, expected",
+    [
+        (1234.5, 1234.5),
+        (7, 7.0),
+        ("1234.5", 1234.5),
+        ("1.234,56", 1234.56),
+        ("1,234.56", 1234.56),
+        ("$ 1.234,56", 1234.56),
+        ("12,5", 12.5),
+        ("1,234,567", 1234567.0),
+        ("-10", -10.0),
+        ("abc", 0.0),
+        ("", 0.0),
+        (None, 0.0),
+        (True, 0.0),
+    ],
+)
+def test_to_number(value, expected):
+    assert to_number(value) == expected
+
+
+def _resumen(doc):
+    return {tuple(r[:4]): (r[4], r[5]) for r in doc.sheets["Resumen"].values[1:]}
+
+
+def _expected_materiales(docs):
+    totals = defaultdict(lambda: [0.0, 0])
+    for d in docs:
+        moneda = materiales.MONEDA_LABEL[d["MONEDA"]]
+        entry = totals[("materiales", d["CUENTA"], f"{d['FECHA'][5:7]}/{d['FECHA'][:4]}", moneda)]
+        entry[0] += d["TOTAL"]
+        entry[1] += 1
+    return {k: (pytest.approx(t, abs=0.011), n) for k, (t, n) in totals.items()}
+
+
+@pytest.fixture
+def remitos():
+    server = FakeRemitosServer({}).start()
+    yield server
+    server.stop()
+
+
+def test_materiales_delta_keeps_totals(fake_google, remitos):
+    _, sheets = fake_google
+    docs = generate_documentos(80, "2026-09-01", "2026-09-30", obras=5, seed=3)
+    remitos.by_day = documentos_by_day(docs)
+    sync = lambda: materiales.sync_materiales(
+        "2026-09-01", "2026-09-30", sheet_id="R-mat", incremental=False, api_url=remitos.url, token="t"
+    )
+    sync()
+    doc = sheets.open_by_key("R-mat")
+    assert _resumen(doc) == _expected_materiales(docs)
+
+    # Un importe cambia, un documento pasa a otra obra (nueva) y otro desaparece
+    docs = docs[:-3] + [dict(docs[-2], CUENTA="7777"), dict(docs[-1], TOTAL=10.0)]
+    remitos.by_day = documentos_by_day(docs)
+    result = sync()
+    assert result["resumen"]["ok"]
+    assert _resumen(doc) == _expected_materiales(docs)
+
+
+def test_materiales_first_resumen_is_built_from_the_sheet(fake_google, remitos, monkeypatch):
+    _, sheets = fake_google
+    september = generate_documentos(40, "2026-09-01", "2026-09-30", obras=3, seed=4)
+    october = generate_documentos(20, "2026-10-01", "2026-10-31", obras=3, seed=5)
+    for i, d in enumerate(october):
+        d["NRODOCUM"] = str(9000 + i).zfill(8)
+    remitos.by_day = documentos_by_day(september + october)
+    sync = lambda f, t: materiales.sync_materiales(
+        f, t, sheet_id="R-init", incremental=False, api_url=remitos.url, token="t"
+    )
+    monkeypatch.setattr(materiales, "SHEETS_RESUMEN", False)
+    sync("2026-09-01", "2026-09-30")
+    # Estado local nuevo: el cache no tiene lo que ya está en la hoja
+    with state.connect() as conn:
+        conn.execute("DELETE FROM remitos_cache WHERE sheet_id = 'R-init'")
+    monkeypatch.setattr(materiales, "SHEETS_RESUMEN", True)
+    sync("2026-10-01", "2026-10-31")
+    assert _resumen(sheets.open_by_key("R-init")) == _expected_materiales(september + october)
+
+
+def _csv(rows):
+    return (HEADER + "\n".join(rows) + "\n").encode("utf-8")
+
+
+def test_mano_obra_replaces_period_and_first_build_reads_the_sheet(fake_google, monkeypatch):
+    drive, sheets = fake_google
+    september = [f"{i % 2},Obra,01/09/2026,{i:05d},8,\"1.000,50\"" for i in range(4)]
+    drive.add_file("r-9", "Costos_09_2026.CSV", _csv(september), "2026-09-30T00:00:00.000Z", "r-mo")
+    monkeypatch.setattr(mano_obra, "SHEETS_RESUMEN", False)
+    mano_obra.sync_mano_obra(sheet_id="R-mo", folder_id="r-mo")
+
+    monkeypatch.setattr(mano_obra, "SHEETS_RESUMEN", True)
+    october = [f"{i % 3},Obra,01/10/2026,{i:05d},8,\"{i}00,00\"" for i in range(1, 7)]
+    drive.add_file("r-10", "Costos_10_2026.CSV", _csv(october), "2026-10-30T00:00:00.000Z", "r-mo")
+    mano_obra.sync_mano_obra(sheet_id="R-mo", folder_id="r-mo")
+    doc = sheets.open_by_key("R-mo")
+    assert _resumen(doc) == {
+        ("mano_obra", "0", "09/2026", ""): (2001.0, 2),
+        ("mano_obra", "1", "09/2026", ""): (2001.0, 2),
+        ("mano_obra", "0", "10/2026", ""): (900.0, 2),
+        ("mano_obra", "1", "10/2026", ""): (500.0, 2),
+        ("mano_obra", "2", "10/2026", ""): (700.0, 2),
+    }
+
+    # El periodo se reemplaza: la obra 2 desaparece y la 1 cambia
+    october = [r for r in october if not r.startswith("2,")]
+    october[0] = october[0].replace('"100,00"', '"150,00"')
+    drive.add_file("r-10", "Costos_10_2026.CSV", _csv(october), "2026-10-31T00:00:00.000Z", "r-mo")
+    mano_obra.sync_mano_obra(sheet_id="R-mo", folder_id="r-mo")
+    resumen = _resumen(doc)
+    assert ("mano_obra", "2", "10/2026", "") not in resumen
+    assert resumen[("mano_obra", "1", "10/2026", "")] == (550.0, 2)
+    assert resumen[("mano_obra", "0", "09/2026", "")] == (2001.0, 2)
@@ -0,0 +1,91 @@
+import pytest
+import requests
+
+from sync.sheets_writer import (
+    SheetsWriter,
+    contiguous_ranges,
+    delete_rows_request,
+    is_retryable,
+    spreadsheet_lock,
+)
+
+
+class ApiError(Exception):
+    def __init__(self, status):
+        super().__init__(status)
+        self.response = type("Response", (), {"status_code": status})()
+
+
+def test_contiguous_ranges():
+    assert contiguous_ranges([]) == []
+    assert contiguous_ranges([2, 3, 4, 7, 9, 10]) == [(2, 4), (7, 7), (9, 10)]
+
+
+def test_delete_rows_request_is_zero_based_half_open():
+    body = delete_rows_request(5, 2, 4)["deleteDimension"]["range"]
+    assert body == {"sheetId": 5, "dimension": "ROWS", "startIndex": 1, "endIndex": 4}
+
+
+@pytest.mark.parametrize(
+    "exc, idempotent, expected",
+    [
+        (ApiError(429), False, True),
+        (ApiError(503), False, False),
+        (requests.ConnectionError(), False, False),
+        (ApiError(503), True, True),
+        (requests.Timeout(), True, True),
+        (ApiError(400), True, False),
+    ],
+)
+def test_is_retryable(exc, idempotent, expected):
+    assert is_retryable(exc, idempotent) is expected
+
+
+def _failing(status, calls):
+    def fn(*args, **kwargs):
+        calls.append(args)
+        raise ApiError(status)
+
+    return fn
+
+
+def test_call_retries_5xx_only_when_idempotent():
+    writer = SheetsWriter(retries=2, backoff=0)
+    calls = []
+    with pytest.raises(ApiError):
+        writer.call(_failing(503, calls), {"requests": []})
+    assert len(calls) == 1
+    calls.clear()
+    with pytest.raises(ApiError):
+        writer.call(_failing(503, calls), idempotent=True)
+    assert len(calls) == 3
+
+
+def test_append_rows_is_not_retried_after_5xx():
+    writer = SheetsWriter(retries=3, backoff=0)
+    calls = []
+
+    class Sheet:
+        append_rows = staticmethod(_failing(500, calls))
+
+    with pytest.raises(ApiError):
+        writer.append_rows(Sheet(), [[1], [2]])
+    assert len(calls) == 1
+
+
+def test_update_ranges_in_chunks():
+    writer = SheetsWriter(batch_rows=50, backoff=0)
+    sent = []
+
+    class Sheet:
+        def batch_update(self, chunk, **kwargs):
+            sent.append(len(chunk))
+
+    data = [{"range": f"A{i}", "values": [[i]]} for i in range(120)]
+    assert writer.update_ranges(Sheet(), data) == 120
+    assert sum(sent) == 120
+
+
+def test_spreadsheet_lock_is_shared_per_id():
+    assert spreadsheet_lock("a") is spreadsheet_lock("a")
+    assert spreadsheet_lock("a") is not spreadsheet_lock("b")
@@ -0,0 +1,84 @@
+import pytest
+
+from main import app
+from sync import snapshot, state
+
+# RemitoRow: fecha, tipdoc, serie, nrodoc, cuenta, obra, direccion, total, moneda
+A = ["2026-09-03", "RM", "1", "10", "OB1", "Obra 1", "", 100.0, "ARS"]
+B = ["2026-09-04", "RM", "1", "11", "OB2", "Obra 2", "", 50.0, "ARS"]
+C = ["2026-10-01", "RM", "1", "12", "OB1", "Obra 1", "", 7.5, "USD"]
+
+
+def _cache(sheet_id, rows, deleted=()):
+    state.apply_remitos_delta(sheet_id, (((r[1], r[2], r[3]), r[0], r, str(r)) for r in rows), deleted)
+
+
+def _totals(sheet_id):
+    groups = snapshot.query(sheet_id=sheet_id, group_by=["obra", "periodo", "moneda"])["groups"]
+    return {(g["obra"], g["periodo"], g["moneda"]): (g["total"], g["filas"]) for g in groups}
+
+
+def test_materiales_first_load_and_delta():
+    _cache("S-mat", [A, B])
+    v0 = snapshot.version()
+    snapshot.update_materiales("S-mat", [A, B], [])
+    assert _totals("S-mat") == {("OB1", "09/2026", "ARS"): (100.0, 1), ("OB2", "09/2026", "ARS"): (50.0, 1)}
+
+    changed = A[:7] + [120.0, "ARS"]
+    _cache("S-mat", [changed, C], [("RM", "1", "11")])
+    snapshot.update_materiales("S-mat", [changed, C], [("RM", "1", "11")])
+    assert _totals("S-mat") == {("OB1", "09/2026", "ARS"): (120.0, 1), ("OB1", "10/2026", "USD"): (7.5, 1)}
+    assert snapshot.version() == v0 + 2
+
+
+def test_mano_obra_load_replaces_period_on_commit():
+    first = snapshot.ManoObraLoad("S-mo", "10/2026")
+    first.add(["1", "x"], "1", "ARS", 10.0)
+    first.add(["2", "y"], "2", "ARS", 5.0)
+    assert first.commit() == 2
+
+    second = snapshot.ManoObraLoad("S-mo", "10/2026")
+    second.add(["1", "z"], "1", "ARS", 3.0)
+    # Hasta el commit se sigue viendo la carga anterior
+    assert snapshot.query(sheet_id="S-mo")["count"] == 2
+    second.commit()
+    rows = snapshot.query(sheet_id="S-mo")["rows"]
+    assert [(r["obra"], r["importe"], r["fila"]) for r in rows] == [("1", 3.0, ["1", "z"])]
+
+
+def test_interrupted_load_is_discarded():
+    dead = snapshot.ManoObraLoad("S-mo2", "09/2026")
+    dead.add(["1"], "1", "ARS", 1.0)
+    dead._flush()
+    snapshot.ManoObraLoad("S-mo2", "09/2026").commit()
+    with snapshot.connect() as conn:
+        assert conn.execute("SELECT COUNT(*) FROM costos_staging WHERE sheet_id = 'S-mo2'").fetchone()[0] == 0
+    assert snapshot.query(sheet_id="S-mo2")["count"] == 0
+
+
+@pytest.mark.parametrize("kwargs", [{"group_by": ["fila"]}, {"desde": "2026-10"}])
+def test_query_rejects_invalid_filters(kwargs):
+    with pytest.raises(ValueError):
+        snapshot.query(**kwargs)
+
+
+def test_costos_endpoint_etag_and_304():
+    client = app.test_client()
+    first = client.get("/costos?group_by=obra&sheet_id=S-mat")
+    assert first.status_code == 200 and first.json["version"] == snapshot.version()
+    etag = first.headers["ETag"]
+
+    cached = client.get("/costos?group_by=obra&sheet_id=S-mat", headers={"If-None-Match": etag})
+    assert cached.status_code == 304
+    # Otra consulta con la misma versión no comparte el ETag
+    assert client.get("/costos?sheet_id=S-mat").headers["ETag"] != etag
+
+    snapshot.ManoObraLoad("S-etag", "08/2026").commit()
+    again = client.get("/costos?group_by=obra&sheet_id=S-mat", headers={"If-None-Match": etag})
+    assert again.status_code == 200 and again.headers["ETag"] != etag
+
+
+@pytest.mark.parametrize("query", ["group_by=obra,fila", "group_by=obra;DROP TABLE costos", "periodo=13-2026"])
+def test_costos_endpoint_rejects_invalid_query(query):
+    resp = app.test_client().get(f"/costos?{query}")
+    assert resp.status_code == 400 and "error" in resp.json